@@ -1,107 +1,76 @@
 import streamlit as st
-import fitz  # PyMuPDF
 import io
+import json
+import os
+import sys
+import tempfile
 from PIL import Image
-import zipfile
 import base64
-import streamlit.components.v1 as components
-
-
-def parse_pages_input(pages_str: str, total_pages: int):
-    """Converte entrada tipo "1-3,5" para um conjunto de índices de páginas (base 0)."""
-    if not pages_str:
-        return set(range(total_pages))
-    result = set()
-    try:
-        for part in pages_str.split(","):
-            part = part.strip()
-            if not part:
-                continue
-            if "-" in part:
-                a, b = part.split("-")
-                start = max(1, int(a))
-                end = min(total_pages, int(b))
-                result.update(range(start - 1, end))
-            else:
-                p = int(part)
-                if 1 <= p <= total_pages:
-                    result.add(p - 1)
-    except Exception:
-        # Se parsing falhar, retorna todas as páginas
-        return set(range(total_pages))
-    return result if result else set(range(total_pages))
-
-
-def extract_images_from_pdf_bytes(
-    file_name: str,
-    pdf_bytes: bytes,
-    *,
-    page_indices: set | None = None,
-    output_format: str = "auto",
-    jpeg_quality: int = 85,
-    deduplicate: bool = True,
-):
-    """
-    Extrai imagens de um PDF fornecido em bytes e retorna lista de
-    tuplas (nome_arquivo_imagem, conteudo_em_bytes).
-    """
-    imagens = []
+from cache import ExtractionCache
+from export import duplicates_for_export, write_zip_file
+from jobs import CANCELLED, DONE, FAILED, ExtractionJob, ingest_upload
+from extractor import BALANCED, DUPLICATE, ENCODE_PROFILE_LABELS, FALLBACK, METHOD_LABELS, ImageFilter
+from stats import STAGE_LABELS, ExtractionStats
+from store import ImageStore, sweep_stale_sessions
+
+
+# Lado maior das miniaturas da prévia, em pixels
+THUMBNAIL_SIZE = 400
+# Quantidades de imagens por página da prévia (cada imagem renderiza um botão)
+PAGE_SIZE_OPTIONS = [12, 24, 48, 96]
+# Threads de conversão por extração (os codificadores do Pillow liberam o GIL)
+CONVERSION_THREADS = min(4, os.cpu_count() or 1)
+# Espaços de cor oferecidos no filtro (nomes como em page.get_images)
+COLORSPACE_OPTIONS = ["DeviceRGB", "DeviceCMYK", "DeviceGray", "ICCBased", "Indexed", "Separation", "DeviceN", "Lab"]
+
+
+def make_thumbnail(image_bytes: bytes, max_size: int = THUMBNAIL_SIZE):
+    """Reduz uma imagem para a prévia e retorna (bytes, mime)."""
+    img = Image.open(io.BytesIO(image_bytes))
+    # Em JPEG, decodifica direto em escala reduzida (bem mais barato)
+    img.draft("RGB", (max_size, max_size))
+    img.thumbnail((max_size, max_size))
+    buf = io.BytesIO()
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img.convert("RGBA").save(buf, format="PNG")
+        return buf.getvalue(), "image/png"
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    img.save(buf, format="JPEG", quality=80)
+    return buf.getvalue(), "image/jpeg"
+
+
+@st.cache_resource
+def _get_extraction_cache():
+    """Cache de extrações compartilhado entre sessões (em disco, limitado por tamanho)."""
     try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        total_pages = len(doc)
-        pages_to_process = page_indices or set(range(total_pages))
-        xrefs_processadas = set()
-
-        for pagina_indice in range(total_pages):
-            if pagina_indice not in pages_to_process:
-                continue
-            pagina = doc[pagina_indice]
-            lista_imagens = pagina.get_images()
-
-            for indice_img, info_imagem in enumerate(lista_imagens):
-                xref = info_imagem[0]
-                if deduplicate and xref in xrefs_processadas:
-                    continue
-                xrefs_processadas.add(xref)
+        return ExtractionCache(os.path.join(tempfile.gettempdir(), "extractimg_cache"), max_bytes=1024 * 1024 * 1024)
+    except PermissionError as e:
+        # Pasta criada por outro usuário do servidor: extrai sem cache
+        print(f"Cache de extrações desativado: {e}", file=sys.stderr)
+        return None
 
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image.get("image")
-                image_ext = base_image.get("ext", "png")
-                if not image_bytes:
-                    continue
 
-                # Converte para formato escolhido se necessário
-                chosen_ext = image_ext if output_format == "auto" else output_format.lower()
-                try:
-                    pil_img = Image.open(io.BytesIO(image_bytes))
-                    buf = io.BytesIO()
-                    save_kwargs = {}
-                    if chosen_ext in {"jpg", "jpeg"}:
-                        save_kwargs["format"] = "JPEG"
-                        save_kwargs["quality"] = jpeg_quality
-                        save_kwargs["optimize"] = True
-                    elif chosen_ext == "png":
-                        save_kwargs["format"] = "PNG"
-                    else:
-                        save_kwargs["format"] = pil_img.format or "PNG"
-                    pil_img.save(buf, **save_kwargs)
-                    buf.seek(0)
-                    final_bytes = buf.getvalue()
-                    final_ext = "jpeg" if save_kwargs.get("format") == "JPEG" else "png" if save_kwargs.get("format") == "PNG" else (pil_img.format or image_ext)
-                except Exception:
-                    # Se conversão falhar, usa bytes originais
-                    final_bytes = image_bytes
-                    final_ext = image_ext
+# Pasta com as imagens de cada sessão e limite de bytes por sessão
+IMAGE_STORE_ROOT = os.path.join(tempfile.gettempdir(), "extractimg_sessoes")
+IMAGE_STORE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# Pastas de sessão sem uso há mais que isso são de um servidor encerrado sem limpeza
+IMAGE_STORE_MAX_AGE = 24 * 60 * 60
 
-                nome_base = file_name[:-4] if file_name.lower().endswith(".pdf") else file_name
-                nome_imagem_saida = f"{nome_base}_p{pagina_indice+1}_img{indice_img+1}.{final_ext}"
-                imagens.append((nome_imagem_saida, final_bytes))
 
-        doc.close()
-    except Exception as e:
-        st.error(f"Erro ao processar {file_name}: {e}")
+@st.cache_resource
+def _sweep_image_stores():
+    """Na primeira sessão do servidor, apaga pastas de sessão abandonadas."""
+    return sweep_stale_sessions(IMAGE_STORE_ROOT, IMAGE_STORE_MAX_AGE)
 
-    return imagens
+
+def _new_image_store():
+    """Substitui o armazenamento de imagens da sessão por um novo, vazio."""
+    anterior = st.session_state.get("image_store")
+    if anterior is not None:
+        anterior.close()
+    st.session_state["image_store"] = ImageStore(IMAGE_STORE_ROOT, max_bytes=IMAGE_STORE_MAX_BYTES)
+    return st.session_state["image_store"]
 
 
 st.set_page_config(page_title="Extrator de Imagens de PDFs", page_icon="🖼️", layout="wide")
@@ -109,51 +78,334 @@ st.set_page_config(page_title="Extrator de Imagens de PDFs", page_icon="🖼️"
 if "hide_header" not in st.session_state:
     st.session_state["hide_header"] = False
 if "images_by_file" not in st.session_state:
+    # Nomes das imagens por PDF; o conteúdo fica em "image_store"
     st.session_state["images_by_file"] = {}
+if "image_store" not in st.session_state:
+    _sweep_image_stores()
+    _new_image_store()
 if "removed_images" not in st.session_state:
     st.session_state["removed_images"] = set()
+if "removed_count_by_file" not in st.session_state:
+    # Contagem de removidas por PDF, mantida pelos callbacks (evita varrer as listas)
+    st.session_state["removed_count_by_file"] = {}
 if "pending_delete_pdfs" not in st.session_state:
     st.session_state["pending_delete_pdfs"] = set()
-if "scroll_to_top" not in st.session_state:
-    st.session_state["scroll_to_top"] = False
-
-# Callbacks para ações imediatas (evitam necessidade de duplo clique)
-def _remove_image(image_id: str):
-    st.session_state["removed_images"].add(image_id)
-    st.session_state["scroll_to_top"] = True
-
-def _restore_image(image_id: str):
-    st.session_state["removed_images"].discard(image_id)
-    st.session_state["scroll_to_top"] = True
+if "duplicate_map" not in st.session_state:
+    # Repetições por conteúdo omitidas, por PDF: {ocorrência omitida -> imagem mantida}
+    st.session_state["duplicate_map"] = {}
+if "thumbnails" not in st.session_state:
+    # Miniaturas da prévia por image_id ("arquivo.pdf:nome_imagem")
+    st.session_state["thumbnails"] = {}
+if "zip_export" not in st.session_state:
+    # ZIP da seleção atual (montado em "Preparar ZIP") e métricas da última montagem
+    st.session_state["zip_export"] = {"path": None, "stats": None}
+if "stats_by_file" not in st.session_state:
+    # Métricas de desempenho da última extração, por PDF
+    st.session_state["stats_by_file"] = {}
+if "job" not in st.session_state:
+    # Extração em segundo plano do último envio
+    st.session_state["job"] = None
+if "job_synced" not in st.session_state:
+    # PDFs do job já copiados para a sessão
+    st.session_state["job_synced"] = set()
+
+# Callbacks para ações imediatas (evitam necessidade de duplo clique).
+# Rodam antes de reexecutar só a aba do PDF: se descartarem um ZIP já
+# montado, a aba pede uma execução da página inteira (ver `_discard_zip`).
+def _remove_image(fname: str, image_id: str):
+    if image_id not in st.session_state["removed_images"]:
+        st.session_state["removed_images"].add(image_id)
+        counts = st.session_state["removed_count_by_file"]
+        counts[fname] = counts.get(fname, 0) + 1
+        _discard_zip()
+
+def _restore_image(fname: str, image_id: str):
+    if image_id in st.session_state["removed_images"]:
+        st.session_state["removed_images"].discard(image_id)
+        counts = st.session_state["removed_count_by_file"]
+        counts[fname] = max(0, counts.get(fname, 0) - 1)
+        _discard_zip()
 
 # Callbacks para exclusão de PDF inteiro
 def _mark_pdf_for_delete(fname: str):
-    pend = set(st.session_state.get("pending_delete_pdfs", set()))
-    pend.add(fname)
-    st.session_state["pending_delete_pdfs"] = pend
-    st.session_state["scroll_to_top"] = True
+    st.session_state["pending_delete_pdfs"].add(fname)
 
 def _cancel_pdf_delete(fname: str):
-    pend = set(st.session_state.get("pending_delete_pdfs", set()))
-    if fname in pend:
-        pend.remove(fname)
-    st.session_state["pending_delete_pdfs"] = pend
-    st.session_state["scroll_to_top"] = True
+    st.session_state["pending_delete_pdfs"].discard(fname)
 
 def _confirm_pdf_delete(fname: str):
-    # Remove do dicionário principal
-    base = dict(st.session_state.get("images_by_file", {}))
-    if fname in base:
-        del base[fname]
-    st.session_state["images_by_file"] = base
-    # Limpa remoções vinculadas a este arquivo
-    removed = set(st.session_state.get("removed_images", set()))
-    st.session_state["removed_images"] = {rid for rid in removed if not rid.startswith(f"{fname}:")}
-    # Retira pendência
-    pend = set(st.session_state.get("pending_delete_pdfs", set()))
-    pend.discard(fname)
-    st.session_state["pending_delete_pdfs"] = pend
-    st.session_state["scroll_to_top"] = True
+    prefixo = f"{fname}:"
+    st.session_state["images_by_file"].pop(fname, None)
+    # Limpa remoções e miniaturas vinculadas a este arquivo
+    removed = st.session_state["removed_images"]
+    removed.difference_update([rid for rid in removed if rid.startswith(prefixo)])
+    st.session_state["removed_count_by_file"].pop(fname, None)
+    # As repetições encontradas neste PDF saem do duplicatas.json
+    st.session_state["duplicate_map"].pop(fname, None)
+    st.session_state["image_store"].discard_prefix(prefixo)
+    thumbs = st.session_state["thumbnails"]
+    for tid in [tid for tid in thumbs if tid.startswith(prefixo)]:
+        del thumbs[tid]
+    st.session_state["pending_delete_pdfs"].discard(fname)
+    _discard_zip()
+
+def _get_thumbnail(image_id: str):
+    thumbs = st.session_state["thumbnails"]
+    if image_id not in thumbs:
+        thumbs[image_id] = make_thumbnail(st.session_state["image_store"].get(image_id))
+    return thumbs[image_id]
+
+def _preview_page(fname: str, total_imgs: int, page_size: int) -> range:
+    """Mostra o seletor de página da prévia de um PDF e retorna os índices visíveis."""
+    n_pages = max(1, -(-total_imgs // page_size))
+    page = 1
+    if n_pages > 1:
+        key = f"preview_page_{fname}"
+        # Ajusta a página guardada se o total de páginas diminuiu
+        if st.session_state.get(key, 1) > n_pages:
+            st.session_state[key] = n_pages
+        page = st.number_input(
+            f"Página da prévia (de {n_pages})",
+            min_value=1,
+            max_value=n_pages,
+            step=1,
+            key=key,
+        )
+    start = (page - 1) * page_size
+    return range(start, min(start + page_size, total_imgs))
+
+# ZIP gerado sob demanda e reaproveitado enquanto a seleção não muda
+def _build_zip():
+    base_dict = st.session_state["images_by_file"]
+    removed = st.session_state["removed_images"]
+    duplicate_map = st.session_state["duplicate_map"]
+    store = st.session_state["image_store"]
+
+    def _items():
+        exportadas = set()
+        # Lê uma imagem por vez do armazenamento da sessão
+        for fname, imgs in base_dict.items():
+            for nome_img in imgs:
+                image_id = f"{fname}:{nome_img}"
+                if image_id in removed:
+                    continue
+                exportadas.add(nome_img)
+                yield nome_img, store.get(image_id)
+        # Mapa das ocorrências repetidas para as imagens mantidas que estão no ZIP
+        duplicatas = duplicates_for_export(duplicate_map, exportadas)
+        if duplicatas:
+            yield "duplicatas.json", json.dumps(duplicatas, indent=2, ensure_ascii=False).encode("utf-8")
+
+    _discard_zip()
+    stats = ExtractionStats()
+    with stats.stage("zip"):
+        # O ZIP fica na pasta da sessão e é apagado com ela
+        path = write_zip_file(_items(), directory=store.directory)
+    stats.add_bytes("zip", os.path.getsize(path))
+    export = st.session_state["zip_export"]
+    export["path"] = path
+    export["stats"] = stats
+
+def _discard_zip():
+    """
+    Descarta o ZIP montado (a seleção mudou). O botão de download fica fora
+    das abas: `zip_stale` pede à aba reexecutada uma execução da página inteira.
+    """
+    export = st.session_state["zip_export"]
+    if export["path"] is None:
+        return
+    if os.path.exists(export["path"]):
+        os.remove(export["path"])
+    export["path"] = None
+    st.session_state["zip_stale"] = True
+
+def _render_zip_download():
+    path = st.session_state["zip_export"]["path"]
+    if path is not None and os.path.exists(path):
+        with open(path, "rb") as f:
+            st.download_button(
+                label="Baixar todas as imagens (ZIP)",
+                data=f,
+                file_name="imagens_extraidas.zip",
+                mime="application/zip",
+                # O download não precisa reexecutar a página
+                on_click="ignore",
+            )
+    else:
+        st.button("Preparar ZIP para download", key="build_zip", on_click=_build_zip)
+
+def _sync_job():
+    """Copia para a sessão os PDFs que o job já concluiu (e ainda não foram copiados)."""
+    job = st.session_state.get("job")
+    if job is None:
+        return
+    synced = st.session_state["job_synced"]
+    novos = [fname for fname in list(job.results) if fname not in synced]
+    if not novos:
+        return
+    base = st.session_state["images_by_file"]
+    for fname in novos:
+        base[fname] = job.results[fname]
+        st.session_state["stats_by_file"][fname] = job.progress[fname].stats
+        prefixo = f"{fname}:"
+        st.session_state["thumbnails"].update(
+            {tid: t for tid, t in list(job.thumbnails.items()) if tid.startswith(prefixo)}
+        )
+        if fname in job.duplicates:
+            st.session_state["duplicate_map"][fname] = dict(job.duplicates[fname])
+        synced.add(fname)
+    _discard_zip()
+
+@st.fragment(run_every=0.5)
+def _render_job_progress():
+    """Progresso do job por PDF, atualizado sem rodar a página inteira."""
+    job = st.session_state.get("job")
+    if job is None:
+        return
+    # Um PDF concluído (ou o fim do job) atualiza a página para exibir os resultados
+    if len(job.results) > len(st.session_state["job_synced"]) or not job.running:
+        st.rerun()
+    for progresso in job.progress.values():
+        if progresso.status == DONE:
+            fracao = 1.0
+        elif progresso.total_pages:
+            fracao = min(1.0, progresso.pages_done / progresso.total_pages)
+        else:
+            fracao = 0.0
+        detalhe = ""
+        if progresso.total_pages:
+            detalhe = f" · página {progresso.pages_done} de {progresso.total_pages} · {progresso.images} imagem(ns)"
+        st.progress(fracao, text=f"{progresso.name}: {progresso.status}{detalhe}")
+    st.button("Cancelar extração", key="cancel_job", on_click=job.cancel, disabled=job.cancelled)
+
+def _render_job_summary(job):
+    """Resumo do job concluído ou cancelado."""
+    total_imgs = sum(len(v) for v in job.results.values())
+    for progresso in job.progress.values():
+        if progresso.status == FAILED:
+            st.error(f"Erro ao processar {progresso.name}: {progresso.error}")
+    cancelados = [p.name for p in job.progress.values() if p.status == CANCELLED]
+    if cancelados:
+        st.warning(f"Extração cancelada. Não processado(s): {', '.join(cancelados)}")
+    if total_imgs:
+        st.success(f"Extração concluída. {total_imgs} imagem(ns) encontrada(s) em {len(job.results)} arquivo(s).")
+        st.caption(" · ".join(f"{n} {METHOD_LABELS[m]}" for m, n in job.conversion_stats.items()))
+        if job.duplicates:
+            linhas = [
+                {"PDF": fname, "Ocorrência ignorada": k, "Imagem mantida": v}
+                for fname, duplicatas in job.duplicates.items()
+                for k, v in duplicatas.items()
+            ]
+            with st.expander(f"{len(linhas)} imagem(ns) repetida(s) ignorada(s)"):
+                st.table(linhas)
+    elif not cancelados:
+        st.warning("Nenhuma imagem foi encontrada nos PDFs enviados.")
+
+def _render_stats_panel():
+    """Painel com o tempo e os bytes de cada etapa da última extração, por PDF."""
+    stats_by_file = st.session_state.get("stats_by_file", {})
+    zip_stats = st.session_state["zip_export"]["stats"]
+    if not stats_by_file and zip_stats is None:
+        return
+    with st.expander("Métricas de desempenho"):
+        linhas = []
+        for fname, stats in stats_by_file.items():
+            linha = {"PDF": fname, "Total (s)": round(stats.total_seconds(), 3)}
+            for etapa, rotulo in STAGE_LABELS.items():
+                if etapa in stats.seconds:
+                    linha[f"{rotulo} (s)"] = round(stats.seconds[etapa], 3)
+            linha["Bytes extraídos (MB)"] = round(stats.bytes["extrair"] / (1024 * 1024), 2)
+            linha["Páginas"] = stats.counts["paginas"]
+            linha["Xrefs repetidos"] = stats.counts["xref_repetidas"]
+            linha["Filtradas"] = stats.counts["filtradas"]
+            linha["Repetidas (conteúdo)"] = stats.counts[DUPLICATE]
+            linha["Falhas de conversão"] = stats.counts[FALLBACK]
+            linha["Do cache"] = "sim" if stats.counts["cache_acertos"] else "não"
+            linhas.append(linha)
+        if linhas:
+            st.dataframe(linhas, hide_index=True)
+        if zip_stats is not None:
+            st.write(
+                f"ZIP: {zip_stats.seconds['zip']:.3f} s, {zip_stats.bytes['zip'] / (1024 * 1024):.2f} MB"
+            )
+        st.caption("Com páginas divididas entre processos, os tempos das etapas são somados entre eles.")
+
+@st.fragment
+def _render_pdf_preview(fname: str, page_size: int):
+    """
+    Prévia de um PDF. Remover/restaurar imagens e excluir o PDF reexecutam só
+    este trecho, que desenha no máximo `page_size` miniaturas (já em cache).
+    """
+    if st.session_state.get("zip_stale"):
+        # O ZIP pronto deixou de valer: atualiza também o botão de download
+        st.rerun()
+    imgs = st.session_state["images_by_file"].get(fname)
+    if imgs is None:
+        # A aba some na próxima execução da página inteira
+        st.info(f"{fname} foi removido.")
+        return
+    removed = st.session_state["removed_images"]
+    # Barra de título com botão de remoção do PDF
+    hdr_cols = st.columns([0.85, 0.15])
+    hdr_cols[0].markdown(f"**{fname}**")
+    pending = fname in st.session_state["pending_delete_pdfs"]
+    if not pending:
+        hdr_cols[1].button(
+            "❌",
+            key=f"del_pdf_persist_{fname}",
+            help="Remover este PDF e todas as imagens",
+            on_click=_mark_pdf_for_delete,
+            args=(fname,),
+        )
+    else:
+        hdr_cols[1].button(
+            "Cancelar",
+            key=f"cancel_del_persist_{fname}",
+            on_click=_cancel_pdf_delete,
+            args=(fname,),
+        )
+
+    if pending:
+        st.warning("Remover este PDF e todas as imagens?")
+        st.button(
+            "Confirmar exclusão",
+            key=f"confirm_del_persist_{fname}",
+            type="primary",
+            on_click=_confirm_pdf_delete,
+            args=(fname,),
+        )
+
+    visible_count = len(imgs) - st.session_state["removed_count_by_file"].get(fname, 0)
+    st.write(f"{visible_count} imagem(ns) em {fname}")
+    # Renderiza apenas a página atual da prévia
+    visible_range = _preview_page(fname, len(imgs), page_size)
+    cols = st.columns(3)
+    for idx in visible_range:
+        nome_img = imgs[idx]
+        image_id = f"{fname}:{nome_img}"
+        try:
+            slot = cols[idx % 3].container()
+            if image_id in removed:
+                # Exibe a miniatura com overlay vermelho indicando remoção
+                try:
+                    thumb, mime = _get_thumbnail(image_id)
+                    b64 = base64.b64encode(thumb).decode("utf-8")
+                    html = f"""
+                        <div class=\"img-removed\">
+                            <img src=\"data:{mime};base64,{b64}\" alt=\"{nome_img}\" style=\"width:100%; border-radius:8px;\" />
+                            <div class=\"img-removed-overlay\">Removida</div>
+                        </div>
+                    """
+                    slot.markdown(html, unsafe_allow_html=True)
+                except Exception:
+                    slot.write(f"Imagem removida: {nome_img}")
+                slot.button("↩️ Restaurar", key=f"restore_persist_{image_id}", on_click=_restore_image, args=(fname, image_id))
+            else:
+                thumb, _ = _get_thumbnail(image_id)
+                slot.image(thumb, caption=nome_img, use_container_width=True)
+                slot.button("🗑️ Remover", key=f"remove_persist_{image_id}", on_click=_remove_image, args=(fname, image_id))
+        except Exception:
+            cols[idx % 3].write(f"Não foi possível exibir: {nome_img}")
 
 # Moldura suave envolvendo imagem + ações no mesmo bloco
 st.markdown(
@@ -199,21 +451,6 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-# Rola automaticamente para o topo após ações que provocam rerun
-if st.session_state.get("scroll_to_top"):
-    components.html(
-        """
-        <script>
-        setTimeout(function(){
-          const root = window.parent.document.documentElement;
-          if (root) { root.scrollTo({top: 0, behavior: 'auto'}); }
-        }, 10);
-        </script>
-        """,
-        height=0,
-    )
-    st.session_state["scroll_to_top"] = False
-
 # Placeholder para poder remover o cabeçalho dinamicamente
 header = st.empty()
 if not st.session_state.get("hide_header", False):
@@ -227,152 +464,114 @@ with st.sidebar:
     output_format = st.radio("Formato de saída", ["auto", "png", "jpeg"], index=0, help="Auto mantém formato original quando possível")
     # Qualidade JPEG fixa (removido o controle da UI)
     jpeg_quality = 95
+    encode_profile = BALANCED
+    if output_format != "auto":
+        encode_profile = st.selectbox(
+            "Perfil de codificação",
+            list(ENCODE_PROFILE_LABELS),
+            index=list(ENCODE_PROFILE_LABELS).index(BALANCED),
+            format_func=ENCODE_PROFILE_LABELS.get,
+            help="Rápido: arquivos alguns por cento maiores, conversão bem mais rápida; compacto: o inverso",
+        )
     # Removido controle de páginas na UI; processa todas por padrão
     pages_str = ""
     deduplicate = st.checkbox("Evitar duplicatas (xref)", value=True)
+    content_dedup = st.checkbox(
+        "Evitar duplicatas por conteúdo (entre PDFs)",
+        value=False,
+        help="Compara o conteúdo das imagens e ignora repetições em qualquer página ou PDF do envio",
+    )
+    with st.expander("Filtros de imagens"):
+        st.caption("Imagens recusadas nem chegam a ser extraídas (ícones, máscaras, fios de 1 pixel...).")
+        min_width = st.number_input("Largura mínima (px)", min_value=0, value=0, step=10)
+        min_height = st.number_input("Altura mínima (px)", min_value=0, value=0, step=10)
+        min_area = st.number_input("Área mínima (px²)", min_value=0, value=0, step=1000)
+        skip_masks = st.checkbox("Ignorar máscaras", value=False, help="Máscaras de transparência (/SMask) e de estêncil")
+        colorspaces = st.multiselect("Espaços de cor aceitos", COLORSPACE_OPTIONS, help="Vazio aceita todos")
+        max_per_page = st.number_input("Máximo por página (0 = sem limite)", min_value=0, value=0, step=1)
+    image_filter = ImageFilter(
+        min_width=int(min_width),
+        min_height=int(min_height),
+        min_area=int(min_area),
+        skip_masks=skip_masks,
+        colorspaces=frozenset(colorspaces) if colorspaces else None,
+        max_per_page=int(max_per_page),
+    )
+    xref_scan = st.checkbox(
+        "Varredura rápida (tabela de xrefs)",
+        value=False,
+        help="Encontra as imagens sem carregar cada página; cada imagem é extraída uma única vez",
+    )
+    map_pages = True
+    if xref_scan:
+        map_pages = st.checkbox(
+            "Nomear imagens pela página",
+            value=True,
+            help="Lê os recursos de cada página para manter os nomes _p{página}_img{n}; desmarcado, usa o xref no nome",
+        )
+    shards = st.number_input(
+        "Processos por PDF",
+        min_value=1,
+        max_value=os.cpu_count() or 1,
+        value=1,
+        help="Divide as páginas de cada PDF entre vários processos (útil para PDFs muito grandes)",
+    )
     show_preview = st.checkbox("Mostrar prévia das imagens", value=True)
+    page_size = st.selectbox("Imagens por página da prévia", PAGE_SIZE_OPTIONS, index=1)
     start_btn = st.button("Extrair Imagens")
 
-if uploaded_files:
-    pass
-
 if uploaded_files and start_btn:
     # Oculta cabeçalho ao iniciar a extração
     st.session_state["hide_header"] = True
     header.empty()
-    # Processamento com progresso
-    todas_por_arquivo: dict[str, list[tuple[str, bytes]]] = {}
-    progress = st.progress(0, text="Iniciando...")
-    status = st.empty()
-    total = len(uploaded_files)
-    for i, uf in enumerate(uploaded_files, start=1):
-        status.write(f"Processando: {uf.name} ({i}/{total})")
-        pdf_bytes = uf.read()
-        # descobrir páginas e converter
-        try:
-            tmp_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-            total_pages = len(tmp_doc)
-            tmp_doc.close()
-        except Exception:
-            total_pages = 1
-        page_indices = parse_pages_input(pages_str, total_pages)
-
-        imagens = extract_images_from_pdf_bytes(
-            uf.name,
-            pdf_bytes,
-            page_indices=page_indices,
-            output_format=output_format,
-            jpeg_quality=jpeg_quality,
-            deduplicate=deduplicate,
-        )
-        todas_por_arquivo[uf.name] = imagens
-        progress.progress(i / total, text=f"{int(100 * i / total)}% concluído")
-
-    # Agrega e informa
-    total_imgs = sum(len(v) for v in todas_por_arquivo.values())
-    if total_imgs:
-        st.success(f"Extração concluída. {total_imgs} imagem(ns) encontrada(s) em {len(todas_por_arquivo)} arquivo(s).")
-
-        # Persiste resultado e reseta remoções
-        st.session_state["images_by_file"] = todas_por_arquivo
-        st.session_state["removed_images"] = set()
-
-        # Exibe por arquivo em abas
-        if show_preview:
-            tabs = st.tabs(list(st.session_state["images_by_file"].keys()))
-            for tab, fname in zip(tabs, st.session_state["images_by_file"].keys()):
-                with tab:
-                    imgs = st.session_state["images_by_file"][fname]
-                    # Barra de título com botão de remoção do PDF
-                    hdr_cols = st.columns([0.85, 0.15])
-                    hdr_cols[0].markdown(f"**{fname}**")
-                    pending = fname in st.session_state.get("pending_delete_pdfs", set())
-                    if not pending:
-                        hdr_cols[1].button(
-                            "❌",
-                            key=f"del_pdf_{fname}",
-                            help="Remover este PDF e todas as imagens",
-                            on_click=_mark_pdf_for_delete,
-                            args=(fname,),
-                        )
-                    else:
-                        hdr_cols[1].button(
-                            "Cancelar",
-                            key=f"cancel_del_{fname}",
-                            on_click=_cancel_pdf_delete,
-                            args=(fname,),
-                        )
-
-                    if pending:
-                        st.warning("Remover este PDF e todas as imagens?")
-                        st.button(
-                            "Confirmar exclusão",
-                            key=f"confirm_del_{fname}",
-                            type="primary",
-                            on_click=_confirm_pdf_delete,
-                            args=(fname,),
-                        )
-
-                    removed_set = st.session_state.get("removed_images", set())
-                    visible_count = sum(1 for nome_img, _ in imgs if f"{fname}:{nome_img}" not in removed_set)
-                    st.write(f"{visible_count} imagem(ns) em {fname}")
-                    cols = st.columns(3)
-                    for idx, (nome_img, conteudo) in enumerate(imgs):
-                        image_id = f"{fname}:{nome_img}"
-                        try:
-                            slot = cols[idx % 3].container()
-                            if image_id in st.session_state["removed_images"]:
-                                # Exibe a imagem com overlay vermelho ao hover indicando remoção
-                                try:
-                                    try:
-                                        pil_img = Image.open(io.BytesIO(conteudo))
-                                        fmt = (pil_img.format or "PNG").lower()
-                                    except Exception:
-                                        fmt = "png"
-                                    mime = "image/png" if fmt == "png" else "image/jpeg" if fmt in ("jpg", "jpeg") else "image/png"
-                                    b64 = base64.b64encode(conteudo).decode("utf-8")
-                                    html = f"""
-                                        <div class=\"img-removed\">
-                                            <img src=\"data:{mime};base64,{b64}\" alt=\"{nome_img}\" style=\"width:100%; border-radius:8px;\" />
-                                            <div class=\"img-removed-overlay\">Removida</div>
-                                        </div>
-                                    """
-                                    slot.markdown(html, unsafe_allow_html=True)
-                                except Exception:
-                                    slot.write(f"Imagem removida: {nome_img}")
-                                slot.button("↩️ Restaurar", key=f"restore_{image_id}", on_click=_restore_image, args=(image_id,))
-                            else:
-                                img = Image.open(io.BytesIO(conteudo))
-                                slot.image(img, caption=nome_img, use_container_width=True)
-                                slot.button("🗑️ Remover", key=f"remove_{image_id}", on_click=_remove_image, args=(image_id,))
-                        except Exception:
-                            cols[idx % 3].write(f"Não foi possível exibir: {nome_img}")
-
-        # Botão para baixar todas as imagens em um arquivo ZIP
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-            base_dict = st.session_state.get("images_by_file", todas_por_arquivo)
-            removed = st.session_state.get("removed_images", set())
-            for fname, imgs in base_dict.items():
-                for nome_img, conteudo in imgs:
-                    if f"{fname}:{nome_img}" in removed:
-                        continue
-                    zf.writestr(nome_img, conteudo)
-        zip_buffer.seek(0)
-
-        st.download_button(
-            label="Baixar todas as imagens (ZIP)",
-            data=zip_buffer,
-            file_name="imagens_extraidas.zip",
-            mime="application/zip",
-        )
-    else:
-        st.warning("Nenhuma imagem foi encontrada nos PDFs enviados.")
-
+    # Um novo envio substitui o job anterior (e o interrompe, se ainda estiver rodando)
+    anterior = st.session_state.get("job")
+    if anterior is not None:
+        anterior.cancel()
+    store = _new_image_store()
+    st.session_state["job"] = ExtractionJob(
+        # Envios grandes vão para a pasta da sessão, apagados após a extração
+        [(uf.name, ingest_upload(uf, store.directory)) for uf in uploaded_files],
+        store,
+        delete_sources=True,
+        cache=_get_extraction_cache(),
+        content_dedup=content_dedup,
+        thumbnailer=make_thumbnail if show_preview else None,
+        # Seleção de páginas (vazia: todas são processadas)
+        pages=pages_str,
+        output_format=output_format,
+        jpeg_quality=jpeg_quality,
+        encode_profile=encode_profile,
+        conversion_threads=CONVERSION_THREADS,
+        deduplicate=deduplicate,
+        shards=int(shards),
+        xref_scan=xref_scan,
+        map_pages=map_pages,
+        image_filter=image_filter if image_filter.is_active() else None,
+    ).start()
+    # Resultados anteriores dão lugar aos PDFs que o job for concluindo
+    st.session_state["job_synced"] = set()
+    st.session_state["images_by_file"] = {}
+    st.session_state["removed_images"] = set()
+    st.session_state["removed_count_by_file"] = {}
+    st.session_state["duplicate_map"] = {}
+    st.session_state["thumbnails"] = {}
+    st.session_state["stats_by_file"] = {}
+    _discard_zip()
+    st.session_state["zip_export"]["stats"] = None
+
+_sync_job()
+job = st.session_state.get("job")
+if job is not None and (job.running or len(job.results) > len(st.session_state["job_synced"])):
+    _render_job_progress()
+elif job is not None:
+    _render_job_summary(job)
+
+# Execução da página inteira: o botão do ZIP é redesenhado abaixo
+st.session_state["zip_stale"] = False
 # Renderização persistente de resultados (mantém preview sem nova extração)
-if st.session_state.get("images_by_file") and not start_btn:
+if st.session_state.get("images_by_file"):
     base_dict = st.session_state["images_by_file"]
-    removed = st.session_state.get("removed_images", set())
     total_imgs = sum(len(v) for v in base_dict.values())
     if total_imgs:
         # Preview
@@ -380,86 +579,10 @@ if st.session_state.get("images_by_file") and not start_btn:
             tabs = st.tabs(list(base_dict.keys()))
             for tab, fname in zip(tabs, base_dict.keys()):
                 with tab:
-                    imgs = base_dict[fname]
-                    # Barra de título com botão de remoção do PDF (persistente)
-                    hdr_cols = st.columns([0.85, 0.15])
-                    hdr_cols[0].markdown(f"**{fname}**")
-                    pending = fname in st.session_state.get("pending_delete_pdfs", set())
-                    if not pending:
-                        hdr_cols[1].button(
-                            "❌",
-                            key=f"del_pdf_persist_{fname}",
-                            help="Remover este PDF e todas as imagens",
-                            on_click=_mark_pdf_for_delete,
-                            args=(fname,),
-                        )
-                    else:
-                        hdr_cols[1].button(
-                            "Cancelar",
-                            key=f"cancel_del_persist_{fname}",
-                            on_click=_cancel_pdf_delete,
-                            args=(fname,),
-                        )
-
-                    if pending:
-                        st.warning("Remover este PDF e todas as imagens?")
-                        st.button(
-                            "Confirmar exclusão",
-                            key=f"confirm_del_persist_{fname}",
-                            type="primary",
-                            on_click=_confirm_pdf_delete,
-                            args=(fname,),
-                        )
-
-                    visible_count = sum(1 for nome_img, _ in imgs if f"{fname}:{nome_img}" not in removed)
-                    st.write(f"{visible_count} imagem(ns) em {fname}")
-                    cols = st.columns(3)
-                    for idx, (nome_img, conteudo) in enumerate(imgs):
-                        image_id = f"{fname}:{nome_img}"
-                        try:
-                            slot = cols[idx % 3].container()
-                            if image_id in removed:
-                                # Exibe a imagem com overlay vermelho ao hover indicando remoção (persistente)
-                                try:
-                                    try:
-                                        pil_img = Image.open(io.BytesIO(conteudo))
-                                        fmt = (pil_img.format or "PNG").lower()
-                                    except Exception:
-                                        fmt = "png"
-                                    mime = "image/png" if fmt == "png" else "image/jpeg" if fmt in ("jpg", "jpeg") else "image/png"
-                                    b64 = base64.b64encode(conteudo).decode("utf-8")
-                                    html = f"""
-                                        <div class=\"img-removed\">
-                                            <img src=\"data:{mime};base64,{b64}\" alt=\"{nome_img}\" style=\"width:100%; border-radius:8px;\" />
-                                            <div class=\"img-removed-overlay\">Removida</div>
-                                        </div>
-                                    """
-                                    slot.markdown(html, unsafe_allow_html=True)
-                                except Exception:
-                                    slot.write(f"Imagem removida: {nome_img}")
-                                slot.button("↩️ Restaurar", key=f"restore_persist_{image_id}", on_click=_restore_image, args=(image_id,))
-                            else:
-                                img = Image.open(io.BytesIO(conteudo))
-                                slot.image(img, caption=nome_img, use_container_width=True)
-                                slot.button("🗑️ Remover", key=f"remove_persist_{image_id}", on_click=_remove_image, args=(image_id,))
-                        except Exception:
-                            cols[idx % 3].write(f"Não foi possível exibir: {nome_img}")
+                    _render_pdf_preview(fname, page_size)
 
+        _render_stats_panel()
         # ZIP respeitando remoções
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-            for fname, imgs in base_dict.items():
-                for nome_img, conteudo in imgs:
-                    if f"{fname}:{nome_img}" in removed:
-                        continue
-                    zf.writestr(nome_img, conteudo)
-        zip_buffer.seek(0)
-
-        st.download_button(
-            label="Baixar todas as imagens (ZIP)",
-            data=zip_buffer,
-            file_name="imagens_extraidas.zip",
-            mime="application/zip",
-        )
+        _render_zip_download()
 
 st.caption("Feito com ❤️ usando PyMuPDF (fitz), Pillow e Streamlit")
\ No newline at end of file
@@ -0,0 +1,372 @@
+"""
+Benchmark reproduzível da extração, sobre um corpus sintético de PDFs.
+
+Gera (ou reaproveita) PDFs com quantidade de páginas e imagens, formatos,
+tamanhos e taxa de repetição controlados, mede o caminho do main.py e o
+job de extração do app (`jobs.py`), cada cenário em um processo próprio, e grava
+o resultado em JSON para comparar versões:
+
+    python benchmark.py --saida antes.json
+    (aplica a mudança)
+    python benchmark.py --saida depois.json --comparar antes.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from extractor import BALANCED, ENCODE_PROFILES
+
+try:
+    import resource
+except ImportError:  # Windows: pico de memória não é medido
+    resource = None
+
+FORMATOS = ("jpeg", "png", "jpx", "cmyk")
+CENARIOS = ("cli", "app")
+CORPUS_SPEC = "corpus.json"
+
+
+# --- Corpus sintético ---
+
+def _gerar_imagem(rng: random.Random, formato: str, largura: int, altura: int) -> bytes:
+    """Imagem de conteúdo único: ruído em baixa resolução ampliado (comprime como uma foto)."""
+    pequena = (max(1, largura // 8), max(1, altura // 8))
+    modo = "CMYK" if formato == "cmyk" else "RGB"
+    bandas = len(modo)
+    base = Image.frombytes(modo, pequena, rng.randbytes(pequena[0] * pequena[1] * bandas))
+    img = base.resize((largura, altura), Image.BILINEAR)
+    buf = io.BytesIO()
+    if formato == "png":
+        img.save(buf, "PNG")
+    elif formato == "jpx":
+        img.save(buf, "JPEG2000")
+    else:
+        img.save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+def gerar_corpus(
+    pasta: str,
+    *,
+    pdfs: int = 4,
+    paginas: int = 20,
+    imagens_por_pagina: int = 4,
+    formatos=("jpeg", "png"),
+    tamanho: int = 800,
+    duplicacao: float = 0.2,
+    semente: int = 0,
+) -> dict:
+    """
+    Gera `pdfs` PDFs em `pasta` e retorna a especificação usada.
+
+    Os formatos se alternam entre as imagens; o lado maior de cada imagem
+    fica entre `tamanho`/2 e `tamanho` pixels. Com probabilidade `duplicacao`,
+    uma imagem repete o conteúdo de outra já inserida no corpus (no mesmo
+    PDF ou em outro). Com a mesma especificação, o corpus é sempre o mesmo.
+    """
+    spec = {
+        "pdfs": pdfs, "paginas": paginas, "imagens_por_pagina": imagens_por_pagina,
+        "formatos": list(formatos), "tamanho": tamanho, "duplicacao": duplicacao, "semente": semente,
+    }
+    os.makedirs(pasta, exist_ok=True)
+    rng = random.Random(semente)
+    geradas = []
+    n = 0
+    for k in range(pdfs):
+        doc = fitz.open()
+        for _ in range(paginas):
+            page = doc.new_page()
+            for i in range(imagens_por_pagina):
+                if geradas and rng.random() < duplicacao:
+                    stream = rng.choice(geradas)
+                else:
+                    formato = formatos[n % len(formatos)]
+                    lado = rng.randint(tamanho // 2, tamanho)
+                    stream = _gerar_imagem(rng, formato, lado, lado * 3 // 4)
+                    geradas.append(stream)
+                    n += 1
+                y = 20 + i * (760 // imagens_por_pagina)
+                page.insert_image(fitz.Rect(20, y, 300, y + 760 // imagens_por_pagina - 10), stream=stream)
+        doc.save(os.path.join(pasta, f"bench_{k:03d}.pdf"))
+        doc.close()
+    with open(os.path.join(pasta, CORPUS_SPEC), "w", encoding="utf-8") as f:
+        json.dump(spec, f, indent=2)
+    return spec
+
+
+def _preparar_corpus(pasta: str, spec: dict) -> None:
+    """Reaproveita o corpus de `pasta` se ele foi gerado com a mesma especificação."""
+    try:
+        with open(os.path.join(pasta, CORPUS_SPEC), encoding="utf-8") as f:
+            if json.load(f) == spec:
+                return
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    if os.path.isdir(pasta):
+        for nome in os.listdir(pasta):
+            if nome.startswith("bench_") and nome.endswith(".pdf"):
+                os.remove(os.path.join(pasta, nome))
+    print(f"Gerando corpus em {pasta}...", file=sys.stderr)
+    gerar_corpus(pasta, **spec)
+
+
+# --- Execução de um cenário (em processo próprio) ---
+
+def _pico_rss_mb(externo: int = 0):
+    """
+    Pico de memória residente do processo atual e dos filhos, em MB, mais
+    `externo` bytes de processos que não são filhos deste (ex.: o do job do app).
+    """
+    if resource is None:
+        return None
+    escala = 1 if sys.platform == "darwin" else 1024  # bytes no macOS, KB no Linux
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round((pico * escala + externo) / (1024 * 1024), 1)
+
+
+def _executar_cli(pdfs, opcoes):
+    from main import extrair_imagens_de_pdfs
+
+    pasta_pdfs = os.path.dirname(pdfs[0])
+    metricas = io.StringIO()
+    with tempfile.TemporaryDirectory() as pasta_saida:
+        inicio = time.perf_counter()
+        # A saída de log do main.py não entra na medição
+        with open(os.devnull, "w") as nulo:
+            stdout, sys.stdout = sys.stdout, nulo
+            try:
+                extrair_imagens_de_pdfs(
+                    pasta_pdfs, pasta_saida,
+                    num_processos=opcoes["processos"],
+                    paginas_em_paralelo=opcoes["paginas_em_paralelo"],
+                    dedup_conteudo=opcoes["dedup_conteudo"],
+                    incremental=False,
+                    metricas=metricas,
+                )
+            finally:
+                sys.stdout = stdout
+        total = time.perf_counter() - inicio
+        nomes = [n for n in os.listdir(pasta_saida) if not n.startswith(".") and n != "duplicatas.json"]
+        bytes_saida = sum(os.path.getsize(os.path.join(pasta_saida, n)) for n in nomes)
+    # A última linha das métricas traz as etapas somadas de todo o lote
+    lote = json.loads(metricas.getvalue().splitlines()[-1])
+    return len(nomes), bytes_saida, total, lote["segundos"], 0
+
+
+def _executar_app(pdfs, opcoes):
+    # O mesmo caminho do app (job em processo próprio, imagens no armazenamento
+    # da sessão, ZIP a partir dele), sem importar a página do Streamlit
+    from export import write_zip_file
+    from jobs import FAILED, ExtractionJob
+    from stats import ExtractionStats
+    from store import ImageStore
+
+    stats = ExtractionStats()
+    inicio = time.perf_counter()
+    arquivos = []
+    for caminho in pdfs:
+        with stats.stage("leitura"):
+            with open(caminho, "rb") as f:
+                arquivos.append((os.path.basename(caminho), f.read()))
+    store = ImageStore()
+    try:
+        job = ExtractionJob(
+            arquivos,
+            store,
+            content_dedup=opcoes["dedup_conteudo"],
+            output_format=opcoes["formato"],
+            encode_profile=opcoes["perfil"],
+            conversion_threads=opcoes["threads_conversao"],
+            shards=opcoes["paginas_em_paralelo"],
+        ).start()
+        job.wait()
+        for progresso in job.progress.values():
+            if progresso.status == FAILED:
+                raise RuntimeError(f"erro ao processar {progresso.name}: {progresso.error}")
+            stats.merge(progresso.stats)
+        imagens = [(img, f"{nome}:{img}") for nome, nomes in job.results.items() for img in nomes]
+        with stats.stage("zip"):
+            itens = ((img, store.get(chave)) for img, chave in imagens)
+            os.remove(write_zip_file(itens, directory=store.directory))
+        total = time.perf_counter() - inicio
+        return len(imagens), store.used_bytes, total, stats.as_dict()["segundos"], job.peak_rss or 0
+    finally:
+        store.close()
+
+
+def _executar_cenario(cenario: str, pasta_corpus: str, opcoes: dict) -> dict:
+    pdfs = sorted(
+        os.path.join(pasta_corpus, n) for n in os.listdir(pasta_corpus)
+        if n.startswith("bench_") and n.endswith(".pdf")
+    )
+    executar = _executar_cli if cenario == "cli" else _executar_app
+    # O tempo total não inclui a importação dos módulos
+    imagens, bytes_saida, total, etapas, pico_externo = executar(pdfs, opcoes)
+    bytes_entrada = sum(os.path.getsize(p) for p in pdfs)
+    return {
+        "segundos": total,
+        "imagens": imagens,
+        "bytes_entrada": bytes_entrada,
+        "bytes_saida": bytes_saida,
+        "imagens_por_s": imagens / total if total else None,
+        "mb_entrada_por_s": bytes_entrada / (1024 * 1024) / total if total else None,
+        "pico_rss_mb": _pico_rss_mb(pico_externo),
+        "etapas": etapas,
+    }
+
+
+def _rodar_em_subprocesso(cenario: str, pasta_corpus: str, opcoes: dict) -> dict:
+    """Cada repetição roda em um processo novo: o pico de memória não vaza entre medições."""
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--_cenario", cenario, pasta_corpus, json.dumps(opcoes)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _resumir(medicoes: list) -> dict:
+    """Mediana das repetições (mais estável que a média em máquinas com ruído)."""
+    resumo = {
+        "repeticoes": len(medicoes),
+        "imagens": medicoes[0]["imagens"],
+        "bytes_entrada": medicoes[0]["bytes_entrada"],
+        "bytes_saida": medicoes[0]["bytes_saida"],
+    }
+    for campo in ("segundos", "imagens_por_s", "mb_entrada_por_s", "pico_rss_mb"):
+        valores = [m[campo] for m in medicoes if m[campo] is not None]
+        resumo[campo] = statistics.median(valores) if valores else None
+    resumo["etapas"] = {
+        etapa: statistics.median(m["etapas"].get(etapa, 0.0) for m in medicoes)
+        for etapa in medicoes[0]["etapas"]
+    }
+    resumo["segundos_por_repeticao"] = [m["segundos"] for m in medicoes]
+    return resumo
+
+
+def _versao_git():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _comparar(base: dict, atual: dict) -> None:
+    """Mostra a variação de cada cenário em relação a um resultado anterior."""
+    print(f"\nComparação com {base.get('versao') or 'resultado anterior'}:")
+    for cenario, res in atual["resultados"].items():
+        anterior = base.get("resultados", {}).get(cenario)
+        if anterior is None:
+            continue
+        print(f"  {cenario}:")
+        for campo in ("segundos", "imagens_por_s", "mb_entrada_por_s", "pico_rss_mb"):
+            antes, depois = anterior.get(campo), res.get(campo)
+            if not antes or depois is None:
+                continue
+            print(f"    {campo:<18} {antes:>10.2f} -> {depois:>10.2f} ({(depois - antes) / antes:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da extração sobre um corpus sintético de PDFs.")
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "extractimg_bench"),
+                        help="Pasta do corpus (reaproveitado se a especificação for a mesma)")
+    parser.add_argument("--pdfs", type=int, default=4)
+    parser.add_argument("--paginas", type=int, default=20, help="Páginas por PDF")
+    parser.add_argument("--imagens-por-pagina", type=int, default=4)
+    parser.add_argument("--formatos", default="jpeg,png,jpx,cmyk",
+                        help=f"Formatos das imagens, separados por vírgula ({', '.join(FORMATOS)})")
+    parser.add_argument("--tamanho", type=int, default=800, help="Lado maior máximo das imagens, em pixels")
+    parser.add_argument("--duplicacao", type=float, default=0.2, help="Fração de imagens repetidas (0 a 1)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--cenarios", default=",".join(CENARIOS), help="cli, app ou ambos")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("-p", "--processos", type=int, default=1, help="PDFs em paralelo no cenário cli")
+    parser.add_argument("--paginas-em-paralelo", type=int, default=1)
+    parser.add_argument("--formato-saida", default="auto", choices=["auto", "png", "jpeg"],
+                        help="Formato de saída no cenário app")
+    parser.add_argument("--perfil", default=BALANCED, choices=list(ENCODE_PROFILES),
+                        help="Perfil de codificação das conversões no cenário app")
+    parser.add_argument("--threads-conversao", type=int, default=1, help="Threads de conversão no cenário app")
+    parser.add_argument("--dedup-conteudo", action="store_true")
+    parser.add_argument("--saida", help="Arquivo JSON com o resultado (padrão: só imprime)")
+    parser.add_argument("--comparar", help="Resultado JSON anterior para comparar")
+    parser.add_argument("--_cenario", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._cenario:
+        cenario, pasta_corpus, opcoes = args._cenario
+        print(json.dumps(_executar_cenario(cenario, pasta_corpus, json.loads(opcoes))))
+        return
+
+    formatos = [f.strip() for f in args.formatos.split(",") if f.strip()]
+    cenarios = [c.strip() for c in args.cenarios.split(",") if c.strip()]
+    for valor, validos in ((formatos, FORMATOS), (cenarios, CENARIOS)):
+        invalidos = set(valor) - set(validos)
+        if invalidos:
+            parser.error(f"valor inválido: {', '.join(sorted(invalidos))}")
+
+    spec = {
+        "pdfs": args.pdfs, "paginas": args.paginas, "imagens_por_pagina": args.imagens_por_pagina,
+        "formatos": formatos, "tamanho": args.tamanho, "duplicacao": args.duplicacao, "semente": args.semente,
+    }
+    _preparar_corpus(args.corpus, spec)
+
+    opcoes = {
+        "processos": args.processos,
+        "paginas_em_paralelo": args.paginas_em_paralelo,
+        "formato": args.formato_saida,
+        "perfil": args.perfil,
+        "threads_conversao": args.threads_conversao,
+        "dedup_conteudo": args.dedup_conteudo,
+    }
+    resultado = {
+        "versao": _versao_git(),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "pymupdf": fitz.VersionBind,
+            "pillow": Image.__version__,
+        },
+        "corpus": spec,
+        "opcoes": opcoes,
+        "resultados": {},
+    }
+    for cenario in cenarios:
+        medicoes = []
+        for _ in range(args.repeticoes):
+            medicoes.append(_rodar_em_subprocesso(cenario, args.corpus, opcoes))
+        resumo = _resumir(medicoes)
+        resultado["resultados"][cenario] = resumo
+        rss = f"{resumo['pico_rss_mb']:.0f} MB" if resumo["pico_rss_mb"] is not None else "n/d"
+        print(
+            f"{cenario}: {resumo['imagens']} imagens em {resumo['segundos']:.2f}s "
+            f"({resumo['imagens_por_s']:.1f} img/s, {resumo['mb_entrada_por_s']:.1f} MB/s, pico {rss})"
+        )
+        for etapa, segundos in resumo["etapas"].items():
+            print(f"    {etapa}: {segundos:.3f}s")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            _comparar(json.load(f), resultado)
+
+
+if __name__ == "__main__":
+    main()
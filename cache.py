@@ -0,0 +1,300 @@
+"""Cache em disco dos resultados de extração, com descarte LRU por tamanho."""
+import hashlib
+import json
+import os
+import pickle
+import stat
+import tempfile
+import time
+from dataclasses import replace
+
+from extractor import BALANCED, ImageFilter, document_source, image_name, iter_images, open_document, register_content
+from stats import ExtractionStats
+
+# Versão do formato das entradas; mudar invalida o cache existente
+CACHE_VERSION = 3
+# Idade (s) a partir da qual um .tmp é sobra de uma gravação interrompida
+# (processo morto): os em andamento são atualizados a cada imagem gravada
+STALE_TMP_SECONDS = 60 * 60
+
+
+def pdf_digest(source) -> str:
+    """Hash SHA-256 do conteúdo de um PDF (bytes, caminho no disco ou documento aberto)."""
+    source = document_source(source)
+    h = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        h.update(source)
+    else:
+        with open(source, "rb") as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(bloco)
+    return h.hexdigest()
+
+
+def _private_directory(directory: str) -> None:
+    """
+    Cria `directory` acessível só ao usuário atual ou confere que a pasta
+    existente é dele. As entradas são lidas com pickle: quem pode gravar na
+    pasta pode executar código no processo que usa o cache.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"o cache {directory} não é uma pasta (link simbólico?)")
+    if not hasattr(os, "getuid"):
+        # Windows: a pasta temporária já é do usuário
+        return
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"a pasta do cache {directory} pertence a outro usuário")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        # Criada por uma versão anterior, com as permissões padrão
+        os.chmod(directory, 0o700)
+
+
+class ExtractionCache:
+    """
+    Guarda as imagens extraídas de cada PDF em um arquivo por entrada, como
+    uma sequência de objetos serializados (lida e gravada uma imagem por vez).
+    A chave combina o hash do PDF com as opções que alteram o resultado; o
+    horário de modificação do arquivo marca o último uso e, quando o total
+    passa de `max_bytes`, as entradas menos usadas recentemente são apagadas.
+    A pasta fica restrita ao usuário atual; `PermissionError` se ela for de outro.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        _private_directory(directory)
+
+    @staticmethod
+    def make_key(digest: str, *, page_indices=None, output_format="auto", jpeg_quality=85,
+                 deduplicate=True, content_dedup=False, xref_scan=False, map_pages=True,
+                 image_filter: ImageFilter | None = None, encode_profile=BALANCED) -> str:
+        opcoes = {
+            "v": CACHE_VERSION,
+            "pdf": digest,
+            "pages": sorted(page_indices) if page_indices else "all",
+            "format": output_format,
+            "quality": jpeg_quality,
+            "dedup": deduplicate,
+            "content_dedup": content_dedup,
+            "scan": ("xref" if map_pages else "xref_sem_paginas") if xref_scan else "paginas",
+            "filter": image_filter.as_dict() if image_filter is not None else None,
+        }
+        if output_format != "auto":
+            # O perfil só altera imagens recodificadas; com "auto" as entradas são as mesmas
+            opcoes["encode"] = encode_profile
+        return hashlib.sha256(json.dumps(opcoes, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key: str):
+        """Retorna um iterador sobre as imagens guardadas para `key` ou None se não houver entrada."""
+        path = self._path(key)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            # Entrada ausente ou removida por outro processo
+            return None
+        try:
+            os.utime(path)  # marca como usada recentemente
+        except OSError:
+            pass
+        return self._read(f)
+
+    @staticmethod
+    def _read(f):
+        with f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def record(self, key: str, imagens):
+        """
+        Repassa as imagens de `imagens` gravando cada uma na entrada. A entrada
+        só é publicada (de forma atômica) se a iteração chegar ao fim; depois
+        disso, as entradas mais antigas são descartadas se preciso.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for img in imagens:
+                    pickle.dump(img, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    yield img
+            os.replace(tmp_path, self._path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._evict()
+
+    def _evict(self) -> None:
+        entradas = []
+        total = 0
+        limite_tmp = time.time() - STALE_TMP_SECONDS
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith((".pkl", ".tmp")):
+                continue
+            try:
+                info = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith(".tmp"):
+                if info.st_mtime < limite_tmp:
+                    try:
+                        os.remove(entry.path)
+                        continue
+                    except OSError:
+                        pass
+                # Gravações em andamento ocupam espaço, mas não são descartadas aqui
+                total += info.st_size
+                continue
+            entradas.append((info.st_mtime, info.st_size, entry.path))
+            total += info.st_size
+        # Mantém ao menos a entrada mais recente, mesmo que sozinha exceda o limite
+        for _, size, path in sorted(entradas)[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Já removida por outro processo ou ainda aberta para leitura
+                continue
+            total -= size
+
+
+def _rename(imagens, nome_base: str):
+    """Ajusta os nomes de uma entrada do cache ao nome do PDF atual."""
+    novos = {}
+    for img in imagens:
+        novos[img.name] = image_name(nome_base, img.page, img.index, img.ext)
+        yield replace(img, name=novos[img.name], duplicate_of=novos.get(img.duplicate_of, img.duplicate_of))
+
+
+def _iter_opened(source, stats: ExtractionStats, on_open, **options):
+    """`iter_images` com o documento aberto aqui, para que `on_open(doc)` o veja antes da extração."""
+    with stats.stage("abrir"):
+        doc = open_document(source)
+    try:
+        if on_open is not None:
+            on_open(doc)
+        yield from iter_images(doc, stats=stats, **options)
+    finally:
+        if doc is not source:
+            doc.close()
+
+
+def iter_images_cached(
+    source,
+    *,
+    cache: ExtractionCache | None = None,
+    nome_base: str = "imagem",
+    page_indices: set | None = None,
+    output_format: str = "auto",
+    jpeg_quality: int = 85,
+    deduplicate: bool = True,
+    content_index: dict | None = None,
+    shards: int = 1,
+    digest: str | None = None,
+    stats: ExtractionStats | None = None,
+    xref_scan: bool = False,
+    map_pages: bool = True,
+    image_filter: ImageFilter | None = None,
+    encode_profile: str = BALANCED,
+    conversion_threads: int = 1,
+    page_counter=None,
+    on_open=None,
+):
+    """
+    Igual a `iter_images`, mas reaproveita resultados do `cache` quando o
+    mesmo PDF já foi extraído com as mesmas opções. A entrada guardada não
+    depende dos outros PDFs do lote: a deduplicação por conteúdo entre PDFs
+    é aplicada depois, sobre o resultado (vindo do cache ou não).
+    `digest` evita recalcular o hash do PDF quando o chamador já o tem.
+    `stats` recebe as métricas da extração, os acertos e faltas do cache e
+    a contagem de imagens por método (inclusive repetidas).
+
+    A chave vem do hash dos bytes ou do arquivo: o documento só é aberto
+    (uma vez, e passado a `on_open(doc)`, ex.: para exibir o total de
+    páginas) quando é preciso extrair.
+    """
+    if stats is None:
+        stats = ExtractionStats()
+    if cache is None:
+        imagens = _iter_opened(
+            source,
+            stats,
+            on_open,
+            nome_base=nome_base,
+            page_indices=page_indices,
+            output_format=output_format,
+            jpeg_quality=jpeg_quality,
+            deduplicate=deduplicate,
+            content_index=content_index,
+            shards=shards,
+            xref_scan=xref_scan,
+            map_pages=map_pages,
+            image_filter=image_filter,
+            encode_profile=encode_profile,
+            conversion_threads=conversion_threads,
+            page_counter=page_counter,
+        )
+        for img in imagens:
+            stats.count(img.method)
+            yield img
+        return
+
+    if digest is None:
+        with stats.stage("hash_pdf"):
+            digest = pdf_digest(source)
+    key = cache.make_key(
+        digest,
+        page_indices=page_indices,
+        output_format=output_format,
+        jpeg_quality=jpeg_quality,
+        deduplicate=deduplicate,
+        content_dedup=content_index is not None,
+        xref_scan=xref_scan,
+        map_pages=map_pages,
+        image_filter=image_filter,
+        encode_profile=encode_profile,
+    )
+    imagens = cache.get(key)
+    if imagens is None:
+        stats.count("cache_faltas")
+        imagens = cache.record(key, _iter_opened(
+            source,
+            stats,
+            on_open,
+            nome_base=nome_base,
+            page_indices=page_indices,
+            output_format=output_format,
+            jpeg_quality=jpeg_quality,
+            deduplicate=deduplicate,
+            # Índice próprio do PDF: calcula os hashes e deduplica só dentro dele
+            content_index={} if content_index is not None else None,
+            shards=shards,
+            xref_scan=xref_scan,
+            map_pages=map_pages,
+            image_filter=image_filter,
+            encode_profile=encode_profile,
+            conversion_threads=conversion_threads,
+            page_counter=page_counter,
+        ))
+    else:
+        stats.count("cache_acertos")
+        # O mesmo conteúdo pode ter chegado com outro nome de arquivo
+        imagens = _rename(imagens, nome_base)
+
+    for img in imagens:
+        if content_index is not None and img.digest:
+            img = register_content(img, content_index)
+        stats.count(img.method)
+        yield img
+
+
+def extract_images_cached(source, **options):
+    """Versão em lista de `iter_images_cached`."""
+    return list(iter_images_cached(source, **options))
@@ -0,0 +1,119 @@
+"""Catálogo SQLite das imagens extraídas pelo main.py, para consultas sem percorrer a pasta de saída."""
+import sqlite3
+
+from extractor import DUPLICATE
+
+# Nome do arquivo do catálogo dentro da pasta de saída
+CATALOG_NAME = ".catalogo.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pdfs (
+    nome TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    imagens INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS imagens (
+    caminho TEXT PRIMARY KEY,  -- relativo à pasta de saída (ou nome da ocorrência repetida)
+    pdf TEXT NOT NULL REFERENCES pdfs(nome) ON DELETE CASCADE,
+    pagina INTEGER,            -- base 1; NULL na varredura sem páginas
+    indice INTEGER NOT NULL,
+    xref INTEGER NOT NULL,
+    largura INTEGER NOT NULL,
+    altura INTEGER NOT NULL,
+    formato TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    metodo TEXT NOT NULL,
+    duplicata_de TEXT          -- imagem mantida, se for uma ocorrência repetida
+);
+CREATE INDEX IF NOT EXISTS imagens_pdf ON imagens(pdf);
+CREATE INDEX IF NOT EXISTS imagens_sha256 ON imagens(sha256);
+"""
+
+# Colunas devolvidas por `ImageCatalog.query`, na ordem
+COLUMNS = (
+    "caminho", "pdf", "pagina", "indice", "xref", "largura", "altura", "formato", "bytes", "sha256", "metodo",
+    "duplicata_de",
+)
+
+
+class ImageCatalog:
+    """
+    Índice das imagens da pasta de saída: PDF de origem, página, xref,
+    dimensões, formato, tamanho e hash de cada imagem gravada, além das
+    ocorrências repetidas (que apontam para a imagem mantida).
+
+    É um índice secundário do manifesto (`BatchManifest`): cada PDF é
+    gravado ou apagado por inteiro, em uma transação. A conexão pode ser
+    usada por várias threads, desde que uma de cada vez.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.executescript(_SCHEMA)
+
+    def has_pdf(self, pdf: str) -> bool:
+        return self._db.execute("SELECT 1 FROM pdfs WHERE nome = ?", (pdf,)).fetchone() is not None
+
+    def pdfs(self) -> set:
+        return {nome for (nome,) in self._db.execute("SELECT nome FROM pdfs")}
+
+    def record_pdf(self, pdf: str, sha256: str, imagens) -> None:
+        """
+        Substitui as imagens de `pdf` pelas de `imagens`, pares
+        (ExtractedImage, bytes gravados); repetidas entram com 0 bytes.
+        """
+        linhas = [
+            (
+                img.name, pdf, img.page + 1 if img.page >= 0 else None, img.index, img.xref, img.width,
+                img.height, img.ext, tamanho, img.digest, img.method,
+                img.duplicate_of if img.method == DUPLICATE else None,
+            )
+            for img, tamanho in imagens
+        ]
+        with self._db:
+            self._db.execute("DELETE FROM pdfs WHERE nome = ?", (pdf,))
+            self._db.execute("INSERT INTO pdfs VALUES (?, ?, ?)", (pdf, sha256, len(linhas)))
+            # Sem REPLACE: uma imagem de mesmo caminho de outro PDF é um erro (IntegrityError), não uma troca
+            self._db.executemany(f"INSERT INTO imagens VALUES ({', '.join('?' * len(COLUMNS))})", linhas)
+
+    def forget_pdf(self, pdf: str) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM pdfs WHERE nome = ?", (pdf,))
+
+    def retain(self, pdfs) -> None:
+        """Apaga os PDFs que não estão em `pdfs` (ex.: removidos em uma execução sem o catálogo)."""
+        sobrando = self.pdfs() - set(pdfs)
+        with self._db:
+            self._db.executemany("DELETE FROM pdfs WHERE nome = ?", [(n,) for n in sobrando])
+
+    def query(self, *, pdf: str | None = None, sha256: str | None = None, ext: str | None = None,
+              min_width: int = 0, min_height: int = 0, min_bytes: int = 0, include_duplicates: bool = False):
+        """
+        Gera as imagens (dicionários com as colunas de `COLUMNS`) que atendem
+        aos critérios, ordenadas por PDF, página e índice. Sem
+        `include_duplicates`, só as imagens gravadas em disco.
+        """
+        condicoes, valores = [], []
+        for coluna, valor in (("pdf", pdf), ("sha256", sha256), ("formato", ext)):
+            if valor is not None:
+                condicoes.append(f"{coluna} = ?")
+                valores.append(valor)
+        for coluna, minimo in (("largura", min_width), ("altura", min_height), ("bytes", min_bytes)):
+            if minimo:
+                condicoes.append(f"{coluna} >= ?")
+                valores.append(minimo)
+        if not include_duplicates:
+            condicoes.append("duplicata_de IS NULL")
+        sql = f"SELECT {', '.join(COLUMNS)} FROM imagens"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        sql += " ORDER BY pdf, pagina, indice, xref"
+        for linha in self._db.execute(sql, valores):
+            yield dict(zip(COLUMNS, linha))
+
+    def close(self) -> None:
+        self._db.close()
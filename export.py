@@ -0,0 +1,82 @@
+"""Geração de ZIP em fluxo, sem montar o arquivo inteiro na memória."""
+import os
+import tempfile
+import zipfile
+
+# Formatos já comprimidos: deflate gasta CPU e praticamente não reduz o tamanho
+STORED_EXTS = {"jpeg", "jpg", "png", "jpx", "jp2", "j2k", "gif", "webp", "jb2", "jbig2"}
+
+
+def compression_for(name: str) -> int:
+    """Método de compressão do ZIP adequado ao tipo do arquivo."""
+    ext = os.path.splitext(name)[1].lstrip(".").lower()
+    return zipfile.ZIP_STORED if ext in STORED_EXTS else zipfile.ZIP_DEFLATED
+
+
+class _ChunkSink:
+    """Destino não posicionável que acumula o que o zipfile escreve até ser drenado."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def duplicates_for_export(duplicates_by_file, exported) -> dict:
+    """
+    Conteúdo do `duplicatas.json` de um ZIP: as ocorrências omitidas dos
+    PDFs de `duplicates_by_file` (PDF -> {omitida -> mantida}) cuja imagem
+    mantida está em `exported`. As repetições de uma imagem removida saem
+    junto com ela (o conteúdo só foi guardado na imagem mantida).
+    """
+    return {
+        omitida: mantida
+        for duplicatas in duplicates_by_file.values()
+        for omitida, mantida in duplicatas.items()
+        if mantida in exported
+    }
+
+
+def iter_zip_chunks(items):
+    """
+    Gera o ZIP de `items` (pares nome, bytes) em pedaços, à medida que cada
+    entrada é escrita. Só a entrada atual fica na memória.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w") as zf:
+        for nome, conteudo in items:
+            zf.writestr(nome, conteudo, compress_type=compression_for(nome))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+
+def write_zip_file(items, directory: str | None = None) -> str:
+    """Grava o ZIP de `items` em um arquivo temporário, em fluxo, e retorna o caminho."""
+    fd, path = tempfile.mkstemp(suffix=".zip", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in iter_zip_chunks(items):
+                f.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
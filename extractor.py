@@ -0,0 +1,745 @@
+"""Núcleo de extração de imagens de PDFs, compartilhado por app.py e main.py."""
+import hashlib
+import io
+import re
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from stats import ExtractionStats
+
+
+# Como cada imagem chegou ao formato de saída
+PASSTHROUGH = "passthrough"  # bytes nativos do PDF gravados sem decodificar
+CONVERTED = "converted"  # decodificada e recodificada pelo PIL
+FALLBACK = "fallback"  # conversão falhou; bytes nativos mantidos
+DUPLICATE = "duplicate"  # conteúdo idêntico já extraído; nada é gravado
+
+METHOD_LABELS = {
+    PASSTHROUGH: "sem conversão",
+    CONVERTED: "convertida",
+    FALLBACK: "conversão falhou, original mantida",
+    DUPLICATE: "repetida",
+}
+
+# Perfis de esforço dos codificadores na conversão: "fast" troca alguns por
+# cento de tamanho por várias vezes mais velocidade; "balanced" é o padrão
+FAST = "fast"
+BALANCED = "balanced"
+SMALL = "small"
+
+ENCODE_PROFILES = {
+    FAST: {"JPEG": {}, "PNG": {"compress_level": 1}},
+    BALANCED: {"JPEG": {"optimize": True}, "PNG": {}},
+    SMALL: {"JPEG": {"optimize": True, "progressive": True}, "PNG": {"optimize": True}},
+}
+
+ENCODE_PROFILE_LABELS = {
+    FAST: "rápido",
+    BALANCED: "equilibrado",
+    SMALL: "compacto",
+}
+
+# Extensões equivalentes ao comparar formato nativo e formato de saída
+_EXT_ALIASES = {"jpg": "jpeg"}
+
+
+def _normalize_ext(ext: str) -> str:
+    ext = (ext or "").lower()
+    return _EXT_ALIASES.get(ext, ext)
+
+
+def _target_ext(image_ext: str, output_format: str) -> str:
+    native_ext = _normalize_ext(image_ext)
+    return native_ext if output_format == "auto" else _normalize_ext(output_format)
+
+
+def image_name(nome_base: str, page: int, index: int, ext: str) -> str:
+    """
+    Nome do arquivo de saída de uma imagem (página e índice em base 0). Sem
+    página (`page` < 0, varredura da tabela de xrefs sem mapear as páginas),
+    `index` é o xref da imagem.
+    """
+    if page < 0:
+        return f"{nome_base}_xref{index}.{ext}"
+    return f"{nome_base}_p{page+1}_img{index+1}.{ext}"
+
+
+def sharded_name(name: str, levels: int) -> str:
+    """
+    Caminho relativo de uma imagem em uma saída dividida em `levels` níveis
+    de subpastas (256 por nível, pelo hash do nome), para que nenhuma pasta
+    acumule milhões de arquivos. Com 0 níveis, o próprio nome.
+    """
+    if levels <= 0:
+        return name
+    h = hashlib.sha1(name.encode("utf-8")).hexdigest()
+    return "/".join([h[2 * i:2 * i + 2] for i in range(levels)] + [name])
+
+
+def content_digest(image_bytes: bytes) -> str:
+    """Hash do fluxo bruto extraído do PDF, usado na deduplicação por conteúdo."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+@dataclass
+class ExtractedImage:
+    """Imagem extraída de um PDF, já no formato de saída."""
+
+    name: str  # nome do arquivo de saída
+    page: int  # índice da página (base 0)
+    index: int  # posição na lista de imagens da página (base 0)
+    xref: int
+    ext: str
+    data: bytes
+    method: str = PASSTHROUGH  # PASSTHROUGH, CONVERTED, FALLBACK ou DUPLICATE
+    digest: str = ""  # preenchido apenas com deduplicação por conteúdo
+    duplicate_of: str | None = None  # nome da imagem mantida, se DUPLICATE
+    width: int = 0  # dimensões em pixels, como no PDF
+    height: int = 0
+
+
+@dataclass(frozen=True)
+class ImageFilter:
+    """
+    Critérios avaliados sobre os metadados de cada imagem (a tupla de
+    `page.get_images`) antes de extraí-la: imagens recusadas não são
+    extraídas, decodificadas nem convertidas.
+    """
+
+    min_width: int = 0
+    min_height: int = 0
+    min_area: int = 0  # largura x altura, em pixels
+    skip_masks: bool = False  # máscaras de outra imagem (/SMask) e máscaras de estêncil (1 bit, sem cor)
+    colorspaces: frozenset | None = None  # espaços de cor aceitos (ex.: "DeviceRGB", "ICCBased"); None = todos
+    max_per_page: int = 0  # máximo de imagens aceitas por página (0 = sem limite)
+
+    def is_active(self) -> bool:
+        return self != ImageFilter()
+
+    def accepts(self, width: int, height: int, bpc: int, colorspace: str, is_mask: bool = False) -> bool:
+        if width < self.min_width or height < self.min_height or width * height < self.min_area:
+            return False
+        if self.skip_masks and (is_mask or (bpc == 1 and not colorspace)):
+            return False
+        return self.colorspaces is None or colorspace in self.colorspaces
+
+    def as_dict(self) -> dict:
+        """Representação serializável em JSON (chave de cache e manifesto)."""
+        return {
+            "min_width": self.min_width,
+            "min_height": self.min_height,
+            "min_area": self.min_area,
+            "skip_masks": self.skip_masks,
+            "colorspaces": sorted(self.colorspaces) if self.colorspaces is not None else None,
+            "max_per_page": self.max_per_page,
+        }
+
+
+def _filter_page(lista_imagens, image_filter: ImageFilter | None, stats, ja_aceitos=(), recusados=None):
+    """
+    Aplica o filtro às imagens de uma página (tuplas de `get_images`) e
+    retorna o conjunto dos xrefs aceitos. `ja_aceitos` são xrefs já extraídos
+    em páginas anteriores, que não contam para o limite por página;
+    `recusados` evita contar a mesma imagem recusada em várias páginas.
+    """
+    if image_filter is None:
+        return {info[0] for info in lista_imagens}
+    mascaras = {info[1] for info in lista_imagens if info[1]}
+    aceitos = set()
+    for info in lista_imagens:
+        xref, _, largura, altura, bpc, colorspace = info[:6]
+        if xref in aceitos or xref in ja_aceitos:
+            continue
+        if not image_filter.accepts(largura, altura, bpc, colorspace, xref in mascaras) or (
+            image_filter.max_per_page and len(aceitos) >= image_filter.max_per_page
+        ):
+            if recusados is None or xref not in recusados:
+                stats.count("filtradas")
+                if recusados is not None:
+                    recusados.add(xref)
+            continue
+        aceitos.add(xref)
+    return aceitos
+
+
+def register_content(img: ExtractedImage, content_index: dict) -> ExtractedImage:
+    """
+    Registra o hash da imagem em `content_index` (hash -> nome mantido). Se o
+    conteúdo já pertence a outra imagem, devolve a ocorrência como DUPLICATE,
+    sem bytes, apontando para a imagem mantida.
+    """
+    kept = content_index.setdefault(img.digest, img.name)
+    if kept == img.name:
+        return img
+    return replace(img, data=b"", method=DUPLICATE, duplicate_of=kept)
+
+
+def parse_pages_input(pages_str: str, total_pages: int):
+    """Converte entrada tipo "1-3,5" para um conjunto de índices de páginas (base 0)."""
+    if not pages_str:
+        return set(range(total_pages))
+    result = set()
+    try:
+        for part in pages_str.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if "-" in part:
+                a, b = part.split("-")
+                start = max(1, int(a))
+                end = min(total_pages, int(b))
+                result.update(range(start - 1, end))
+            else:
+                p = int(part)
+                if 1 <= p <= total_pages:
+                    result.add(p - 1)
+    except Exception:
+        # Se parsing falhar, retorna todas as páginas
+        return set(range(total_pages))
+    return result if result else set(range(total_pages))
+
+
+def open_document(source):
+    """
+    Abre um PDF a partir de bytes ou de um caminho no disco. Um documento já
+    aberto é devolvido como está: quem o abriu continua responsável por fechá-lo.
+    """
+    if isinstance(source, fitz.Document):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def document_source(source):
+    """
+    Caminho ou bytes de onde veio `source` (ver `open_document`), para abrir
+    handles próprios em outros processos ou calcular o hash do PDF.
+    """
+    if isinstance(source, fitz.Document):
+        return source.name or source.stream
+    return source
+
+
+def convert_image(image_bytes: bytes, image_ext: str, output_format: str = "auto", jpeg_quality: int = 85,
+                  encode_profile: str = BALANCED):
+    """
+    Converte os bytes de uma imagem para o formato escolhido e retorna
+    (bytes, extensão, método). Quando o formato nativo já atende ("auto" ou
+    igual ao pedido), os bytes são devolvidos sem passar pelo PIL. Se a
+    conversão falhar, devolve os bytes originais. `encode_profile` escolhe
+    o esforço do codificador (ver `ENCODE_PROFILES`).
+    """
+    chosen_ext = _target_ext(image_ext, output_format)
+    if chosen_ext == _normalize_ext(image_ext):
+        return image_bytes, image_ext, PASSTHROUGH
+
+    try:
+        pil_img = Image.open(io.BytesIO(image_bytes))
+        buf = io.BytesIO()
+        if chosen_ext == "jpeg":
+            formato = "JPEG"
+            save_kwargs = {"quality": jpeg_quality}
+        else:
+            formato = "PNG"
+            chosen_ext = "png"
+            save_kwargs = {}
+        save_kwargs.update(ENCODE_PROFILES[encode_profile][formato])
+        pil_img.save(buf, format=formato, **save_kwargs)
+        return buf.getvalue(), chosen_ext, CONVERTED
+    except Exception:
+        # Se conversão falhar, usa bytes originais
+        return image_bytes, image_ext, FALLBACK
+
+
+def iter_pages(
+    source,
+    pages,
+    *,
+    nome_base: str = "imagem",
+    output_format: str = "auto",
+    jpeg_quality: int = 85,
+    deduplicate: bool = True,
+    content_index: dict | None = None,
+    stats: ExtractionStats | None = None,
+    image_filter: ImageFilter | None = None,
+    encode_profile: str = BALANCED,
+    conversion_threads: int = 1,
+    page_counter=None,
+):
+    """
+    Gera as imagens das páginas indicadas (base 0; None = todas), uma a uma,
+    à medida que as páginas são lidas. Abre um handle próprio do documento,
+    fechado ao fim da iteração (ou quando o gerador é descartado), a menos
+    que `source` já seja um documento aberto.
+
+    Com `content_index` (hash -> nome mantido, compartilhável entre PDFs),
+    imagens cujo conteúdo já foi extraído não são convertidas: voltam como
+    DUPLICATE apontando para a imagem mantida.
+    `stats` acumula o tempo e os bytes de cada etapa (abrir, listar, extrair,
+    hash, converter) e conta páginas e xrefs repetidos. Imagens recusadas
+    por `image_filter` são descartadas antes de `doc.extract_image`.
+    Com `conversion_threads` > 1, as conversões (perfil `encode_profile`)
+    rodam em threads enquanto as páginas seguintes são lidas.
+    `page_counter` (um `multiprocessing.Value`) é incrementado a cada página
+    lida, para que outro processo acompanhe o andamento.
+    """
+    if stats is None:
+        stats = ExtractionStats()
+    with stats.stage("abrir"):
+        doc = open_document(source)
+    conversoes = _Conversions(
+        nome_base=nome_base, output_format=output_format, jpeg_quality=jpeg_quality,
+        encode_profile=encode_profile, content_index=content_index, stats=stats, threads=conversion_threads,
+    )
+    try:
+        total_pages = len(doc)
+        pages_to_process = sorted(p for p in (pages or range(total_pages)) if 0 <= p < total_pages)
+        xrefs_processadas = set()
+        recusados = set()
+        for pagina_indice in pages_to_process:
+            with stats.stage("listar"):
+                lista_imagens = doc[pagina_indice].get_images()
+            _count_page(stats, page_counter)
+            aceitos = _filter_page(
+                lista_imagens, image_filter, stats, xrefs_processadas if deduplicate else (), recusados,
+            )
+
+            for indice_img, info_imagem in enumerate(lista_imagens):
+                xref = info_imagem[0]
+                if deduplicate and xref in xrefs_processadas:
+                    stats.count("xref_repetidas")
+                    continue
+                if xref not in aceitos:
+                    continue
+                xrefs_processadas.add(xref)
+                yield from conversoes.read(doc, xref, pagina_indice, indice_img)
+        yield from conversoes.drain()
+    finally:
+        conversoes.close()
+        if doc is not source:
+            doc.close()
+
+
+def _count_page(stats, page_counter) -> None:
+    stats.count("paginas")
+    if page_counter is not None:
+        with page_counter.get_lock():
+            page_counter.value += 1
+
+
+def _timed_convert(image_bytes, image_ext, output_format, jpeg_quality, encode_profile):
+    """`convert_image` com o tempo gasto (medido aqui, pois pode rodar em outra thread)."""
+    inicio = time.perf_counter()
+    resultado = convert_image(image_bytes, image_ext, output_format, jpeg_quality, encode_profile)
+    return resultado, time.perf_counter() - inicio
+
+
+class _Conversions:
+    """
+    Lê as imagens do documento aberto e as entrega convertidas, na ordem de
+    leitura. Com `threads` > 1, as conversões rodam em um pool de threads (os
+    codificadores do Pillow liberam o GIL) enquanto o PyMuPDF continua lendo
+    na thread atual; no máximo `2 * threads` imagens ficam pendentes.
+    O registro no `content_index` acontece na entrega, na ordem de leitura,
+    para que a imagem mantida seja sempre a primeira, como na execução serial.
+    """
+
+    def __init__(self, *, nome_base, output_format, jpeg_quality, encode_profile, content_index, stats,
+                 threads: int = 1):
+        self.nome_base = nome_base
+        self.output_format = output_format
+        self.jpeg_quality = jpeg_quality
+        self.encode_profile = encode_profile
+        self.content_index = content_index
+        self.stats = stats
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="conversao") if threads > 1 else None
+        self._limite = 2 * threads
+        self._pendentes = deque()  # ExtractedImage prontas ou (página, índice, xref, hash, dimensões, conversão)
+
+    def read(self, doc, xref, page, index):
+        """Lê uma imagem e agenda sua conversão; gera as imagens anteriores que já ficaram prontas."""
+        stats = self.stats
+        with stats.stage("extrair"):
+            base_image = doc.extract_image(xref)
+        image_bytes = base_image.get("image")
+        image_ext = base_image.get("ext", "png")
+        if not image_bytes:
+            return
+        stats.add_bytes("extrair", len(image_bytes))
+        dimensoes = {"width": base_image.get("width", 0), "height": base_image.get("height", 0)}
+
+        digest = ""
+        if self.content_index is not None:
+            with stats.stage("hash"):
+                digest = content_digest(image_bytes)
+            kept = self.content_index.get(digest)
+            if kept is not None:
+                ext = _target_ext(image_ext, self.output_format)
+                nome = image_name(self.nome_base, page, index, ext)
+                self._pendentes.append(
+                    ExtractedImage(nome, page, index, xref, ext, b"", DUPLICATE, digest, kept, **dimensoes)
+                )
+                yield from self._entregar(self._limite)
+                return
+
+        argumentos = (image_bytes, image_ext, self.output_format, self.jpeg_quality, self.encode_profile)
+        if self._pool is not None:
+            conversao = self._pool.submit(_timed_convert, *argumentos)
+        else:
+            conversao = _timed_convert(*argumentos)
+        self._pendentes.append((page, index, xref, digest, dimensoes, conversao))
+        yield from self._entregar(self._limite)
+
+    def drain(self):
+        """Gera as imagens ainda pendentes, aguardando as conversões."""
+        yield from self._entregar(0)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    def _entregar(self, limite: int):
+        # Entrega em ordem: para na primeira conversão em andamento, a menos que haja pendentes demais
+        while self._pendentes:
+            item = self._pendentes[0]
+            if isinstance(item, tuple) and isinstance(item[-1], Future):
+                if len(self._pendentes) <= limite and not item[-1].done():
+                    return
+            self._pendentes.popleft()
+            yield self._concluir(item)
+
+    def _concluir(self, item) -> ExtractedImage:
+        if isinstance(item, ExtractedImage):
+            return item
+        page, index, xref, digest, dimensoes, conversao = item
+        if isinstance(conversao, Future):
+            conversao = conversao.result()
+        (final_bytes, final_ext, method), segundos = conversao
+        self.stats.add_seconds("converter", segundos)
+        self.stats.add_bytes("converter", len(final_bytes))
+        nome = image_name(self.nome_base, page, index, final_ext)
+        img = ExtractedImage(nome, page, index, xref, final_ext, final_bytes, method, digest, **dimensoes)
+        if self.content_index is not None:
+            img = register_content(img, self.content_index)
+        return img
+
+
+def _colorspace_name(doc, xref: int) -> str:
+    """Nome do espaço de cor de uma imagem, como em `get_images` (ex.: "DeviceRGB", "ICCBased")."""
+    tipo, valor = doc.xref_get_key(xref, "ColorSpace")
+    if tipo == "xref":
+        valor = doc.xref_object(int(valor.split()[0]), compressed=True)
+    encontrado = re.search(r"/(\w+)", valor)
+    return encontrado.group(1) if encontrado else ""
+
+
+def _image_int(doc, xref: int, chave: str) -> int:
+    tipo, valor = doc.xref_get_key(xref, chave)
+    return int(valor) if tipo == "int" else 0
+
+
+def scan_image_xrefs(doc, pages=None, map_pages: bool = True, stats: ExtractionStats | None = None,
+                     image_filter: ImageFilter | None = None, page_counter=None):
+    """
+    Enumera as imagens do documento sem carregar as páginas e retorna
+    entradas (página, índice, xref), uma por xref, na ordem de extração.
+
+    Com `map_pages`, lê apenas os recursos de cada página (sem interpretar
+    o conteúdo) para associar cada xref à primeira página e posição em que
+    aparece: os nomes `_p{página}_img{n}` ficam iguais aos da leitura por
+    páginas com deduplicação por xref. Sem `map_pages`, percorre a tabela de
+    xrefs em busca de objetos de imagem, ignorando os usados como máscara
+    (/SMask, /Mask) de outra imagem; a página fica -1 e o índice é o xref.
+    Nesse caso também entram imagens que nenhuma página usa, e o limite
+    por página de `image_filter` não se aplica.
+    """
+    if stats is None:
+        stats = ExtractionStats()
+    with stats.stage("listar"):
+        if map_pages:
+            total_pages = len(doc)
+            primeira = {}
+            recusados = set()
+            for pagina in sorted(p for p in (pages or range(total_pages)) if 0 <= p < total_pages):
+                _count_page(stats, page_counter)
+                lista_imagens = doc.get_page_images(pagina)
+                aceitos = _filter_page(lista_imagens, image_filter, stats, primeira, recusados)
+                for indice, info in enumerate(lista_imagens):
+                    if info[0] in primeira:
+                        stats.count("xref_repetidas")
+                    elif info[0] in aceitos:
+                        primeira[info[0]] = (pagina, indice)
+            return sorted((pagina, indice, xref) for xref, (pagina, indice) in primeira.items())
+
+        imagens = []
+        mascaras = set()
+        for xref in range(1, doc.xref_length()):
+            if not doc.xref_is_image(xref):
+                continue
+            imagens.append(xref)
+            for chave in ("SMask", "Mask"):
+                tipo, valor = doc.xref_get_key(xref, chave)
+                if tipo == "xref":
+                    mascaras.add(int(valor.split()[0]))
+        entries = []
+        for xref in imagens:
+            if xref in mascaras:
+                continue
+            if image_filter is not None and not image_filter.accepts(
+                _image_int(doc, xref, "Width"), _image_int(doc, xref, "Height"),
+                _image_int(doc, xref, "BitsPerComponent"), _colorspace_name(doc, xref),
+                doc.xref_get_key(xref, "ImageMask")[1] == "true",
+            ):
+                stats.count("filtradas")
+                continue
+            entries.append((-1, xref, xref))
+        return entries
+
+
+def iter_xrefs(
+    source,
+    entries,
+    *,
+    nome_base: str = "imagem",
+    output_format: str = "auto",
+    jpeg_quality: int = 85,
+    content_index: dict | None = None,
+    stats: ExtractionStats | None = None,
+    encode_profile: str = BALANCED,
+    conversion_threads: int = 1,
+):
+    """
+    Gera as imagens das entradas (página, índice, xref) de `scan_image_xrefs`,
+    uma a uma (conversões como em `iter_pages`).
+    """
+    if stats is None:
+        stats = ExtractionStats()
+    with stats.stage("abrir"):
+        doc = open_document(source)
+    conversoes = _Conversions(
+        nome_base=nome_base, output_format=output_format, jpeg_quality=jpeg_quality,
+        encode_profile=encode_profile, content_index=content_index, stats=stats, threads=conversion_threads,
+    )
+    try:
+        for pagina, indice, xref in entries:
+            yield from conversoes.read(doc, xref, pagina, indice)
+        yield from conversoes.drain()
+    finally:
+        conversoes.close()
+        if doc is not source:
+            doc.close()
+
+
+def extract_pages(source, pages, **options) -> list[ExtractedImage]:
+    """Versão em lista de `iter_pages`."""
+    return list(iter_pages(source, pages, **options))
+
+
+# Contador de páginas recebido de `_iter_shards`, nos processos das faixas
+_shard_page_counter = None
+
+
+def _init_shard(page_counter) -> None:
+    global _shard_page_counter
+    _shard_page_counter = page_counter
+
+
+def _extract_shard(source, pages, **options):
+    """Worker de uma faixa de páginas: devolve as imagens e as métricas da faixa."""
+    stats = ExtractionStats()
+    return extract_pages(source, pages, stats=stats, page_counter=_shard_page_counter, **options), stats
+
+
+def _extract_xref_shard(source, entries, **options):
+    """Worker de uma faixa de entradas da varredura de xrefs."""
+    stats = ExtractionStats()
+    return list(iter_xrefs(source, entries, stats=stats, **options)), stats
+
+
+def split_pages(pages, shards: int) -> list[list[int]]:
+    """Divide as páginas (ordenadas) em até `shards` faixas contíguas de tamanho equilibrado."""
+    pages = sorted(pages)
+    shards = max(1, min(shards, len(pages)))
+    tamanho, resto = divmod(len(pages), shards)
+    faixas = []
+    inicio = 0
+    for i in range(shards):
+        fim = inicio + tamanho + (1 if i < resto else 0)
+        faixas.append(pages[inicio:fim])
+        inicio = fim
+    return [f for f in faixas if f]
+
+
+def merge_shards(resultados, deduplicate: bool = True, content_index: dict | None = None,
+                 stats: ExtractionStats | None = None):
+    """
+    Junta os resultados das faixas (na ordem das páginas) descartando xrefs
+    já vistos em faixas anteriores, reproduzindo o resultado de uma execução serial.
+    Com `content_index`, ocorrências cujo conteúdo apareceu em faixas
+    anteriores passam a apontar para a primeira delas. É um gerador: cada
+    faixa é consumida assim que fica disponível.
+    """
+    xrefs_vistos = set()
+    for faixa in resultados:
+        for img in faixa:
+            if deduplicate and img.xref in xrefs_vistos:
+                if stats is not None:
+                    stats.count("xref_repetidas")
+                continue
+            xrefs_vistos.add(img.xref)
+            if content_index is not None and img.digest:
+                if img.method == DUPLICATE:
+                    img = replace(img, duplicate_of=content_index.get(img.digest, img.duplicate_of))
+                else:
+                    img = register_content(img, content_index)
+            yield img
+
+
+def _iter_shards(worker, source, faixas, deduplicate, content_index, stats, options, page_counter=None):
+    """
+    Extrai cada faixa com `worker(origem, faixa, **options)` em um processo
+    próprio e junta os resultados na ordem das faixas (ver `merge_shards`),
+    somando as métricas de cada uma em `stats`. `page_counter` é repassado
+    aos processos das faixas (ver `iter_pages`).
+    """
+    # Cada faixa recebe uma cópia do índice de conteúdo; a junção resolve o restante
+    shard_index = None if content_index is None else dict(content_index)
+    # Os processos abrem o PDF pelo caminho (ou pelos bytes), não pelo handle deste
+    origem = document_source(source)
+    executor = ProcessPoolExecutor(max_workers=len(faixas), initializer=_init_shard, initargs=(page_counter,))
+    try:
+        futuros = [executor.submit(worker, origem, faixa, content_index=shard_index, **options) for faixa in faixas]
+
+        def _resultados():
+            for futuro in futuros:
+                imagens, shard_stats = futuro.result()
+                stats.merge(shard_stats)
+                yield imagens
+
+        yield from merge_shards(_resultados(), deduplicate, content_index, stats)
+    except BaseException:
+        # Interrompida (consumidor parou antes do fim, erro ou cancelamento do
+        # processo): as faixas não iniciadas são canceladas e as em andamento
+        # não são esperadas; se foram encerradas no meio do envio do
+        # resultado, o pool não perceberia o fim delas
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    else:
+        executor.shutdown()
+
+
+def iter_images(
+    source,
+    *,
+    nome_base: str = "imagem",
+    page_indices: set | None = None,
+    output_format: str = "auto",
+    jpeg_quality: int = 85,
+    deduplicate: bool = True,
+    content_index: dict | None = None,
+    shards: int = 1,
+    stats: ExtractionStats | None = None,
+    xref_scan: bool = False,
+    map_pages: bool = True,
+    image_filter: ImageFilter | None = None,
+    encode_profile: str = BALANCED,
+    conversion_threads: int = 1,
+    page_counter=None,
+):
+    """
+    Gera as imagens de um PDF (bytes, caminho ou documento já aberto, que é
+    reaproveitado) uma a uma, sem acumular o documento inteiro na memória.
+    Com `shards` > 1, as páginas são divididas em faixas processadas em
+    paralelo, cada uma com seu próprio handle do documento; nomes e
+    deduplicação por xref permanecem iguais aos de uma execução serial
+    (nesse caso, cada faixa é entregue de uma vez).
+
+    `content_index` ativa a deduplicação por conteúdo (ver `iter_pages`)
+    e é atualizado com as imagens mantidas deste PDF. `stats` recebe as
+    métricas de todas as faixas.
+
+    Com `xref_scan`, as imagens são enumeradas por `scan_image_xrefs` em vez
+    de página a página, e cada xref é extraído uma única vez (`deduplicate`
+    não se aplica). Sem `map_pages`, as imagens são nomeadas pelo xref;
+    uma seleção de páginas sempre exige o mapeamento.
+
+    `image_filter` recusa imagens pelos metadados antes da extração. Com
+    faixas e `deduplicate`, o filtro é aplicado pela varredura ao documento
+    inteiro antes da divisão, como na execução serial.
+    `encode_profile` e `conversion_threads` controlam a conversão (ver
+    `iter_pages`); com faixas, cada processo tem seu próprio pool de threads.
+    `page_counter` conta as páginas lidas, inclusive nas faixas (ver `iter_pages`).
+    """
+    options = dict(
+        nome_base=nome_base, output_format=output_format, jpeg_quality=jpeg_quality, deduplicate=deduplicate,
+        encode_profile=encode_profile, conversion_threads=conversion_threads,
+    )
+    if stats is None:
+        stats = ExtractionStats()
+    # O filtro depende das páginas anteriores (xrefs já aceitos não contam no
+    # limite por página): com faixas, a varredura filtra o documento inteiro
+    # antes de dividi-lo, e os nomes são os mesmos da leitura por páginas
+    filtro_com_faixas = shards > 1 and deduplicate and image_filter is not None
+    if xref_scan or filtro_com_faixas:
+        del options["deduplicate"]
+        yield from _iter_xref_scan(
+            source, page_indices, map_pages or bool(page_indices) or not xref_scan, shards, content_index, stats,
+            options, image_filter, page_counter,
+        )
+        return
+    options["image_filter"] = image_filter
+    if shards <= 1:
+        yield from iter_pages(
+            source, page_indices, content_index=content_index, stats=stats, page_counter=page_counter, **options,
+        )
+        return
+
+    with stats.stage("abrir"):
+        doc = open_document(source)
+    try:
+        total_pages = len(doc)
+        pages = [p for p in (page_indices or range(total_pages)) if 0 <= p < total_pages]
+        faixas = split_pages(pages, shards)
+        if len(faixas) <= 1:
+            # Uma faixa só: segue com o mesmo handle
+            yield from iter_pages(
+                doc, pages, content_index=content_index, stats=stats, page_counter=page_counter, **options,
+            )
+            return
+    finally:
+        if doc is not source:
+            doc.close()
+
+    yield from _iter_shards(
+        _extract_shard, source, faixas, deduplicate, content_index, stats, options, page_counter,
+    )
+
+
+def _iter_xref_scan(source, page_indices, map_pages, shards, content_index, stats, options, image_filter=None,
+                    page_counter=None):
+    """Modo `xref_scan` de `iter_images`: varre uma vez e divide as entradas entre as faixas."""
+    with stats.stage("abrir"):
+        doc = open_document(source)
+    try:
+        entries = scan_image_xrefs(doc, page_indices, map_pages, stats, image_filter, page_counter)
+        faixas = split_pages(entries, shards) if shards > 1 else [entries]
+        if len(faixas) <= 1:
+            # Extrai com o mesmo handle da varredura
+            yield from iter_xrefs(doc, entries, content_index=content_index, stats=stats, **options)
+            return
+    finally:
+        if doc is not source:
+            doc.close()
+
+    yield from _iter_shards(_extract_xref_shard, source, faixas, False, content_index, stats, options)
+
+
+def extract_images(source, **options) -> list[ExtractedImage]:
+    """Extrai todas as imagens de um PDF em uma lista (ver `iter_images`)."""
+    return list(iter_images(source, **options))
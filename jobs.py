@@ -0,0 +1,377 @@
+"""
+Extração em segundo plano para o app: cada envio roda em um processo
+próprio, com progresso por página e cancelamento imediato.
+"""
+import atexit
+import functools
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+from cache import iter_images_cached
+from extractor import open_document, parse_pages_input
+from stats import ExtractionStats
+
+try:
+    import resource
+except ImportError:  # Windows: pico de memória não é medido
+    resource = None
+
+# Situação de cada PDF de um job
+PENDING = "aguardando"
+RUNNING = "extraindo"
+DONE = "concluído"
+FAILED = "erro"
+CANCELLED = "cancelado"
+
+# Contexto dos processos de extração (também usado pelo server.py): o PyMuPDF
+# não suporta várias threads no mesmo processo, e os processos não herdam as
+# threads do Streamlit ou do servidor (o forkserver já traz o núcleo importado)
+if "forkserver" in multiprocessing.get_all_start_methods():
+    PROCESS_CONTEXT = multiprocessing.get_context("forkserver")
+    PROCESS_CONTEXT.set_forkserver_preload(["cache", "extractor"])
+else:
+    PROCESS_CONTEXT = multiprocessing.get_context("spawn")
+
+# Envios acima deste tamanho são copiados para o disco e abertos pelo caminho
+UPLOAD_SPOOL_BYTES = 32 * 1024 * 1024
+
+# Processos dos jobs em andamento. Não são daemon (precisam criar os
+# processos das faixas): são encerrados aqui quando o app termina
+_PROCESSOS = set()
+
+
+@atexit.register
+def _encerrar_jobs():
+    for processo in list(_PROCESSOS):
+        processo.terminate()
+
+
+def iter_pdf_images(file_name: str, pdf_bytes, *, conversion_stats=None, duplicates=None, on_image=None,
+                    **options):
+    """
+    Gera as tuplas (nome_arquivo_imagem, conteudo_em_bytes) de um PDF em
+    bytes (ou caminho, ou documento já aberto), uma a uma. Ocorrências
+    repetidas por conteúdo não são geradas: vão para `duplicates` (nome
+    omitido -> nome mantido). `conversion_stats` conta as imagens por
+    método e `on_image(n)` recebe a quantidade processada até o momento.
+    As demais opções vão para `iter_images_cached`.
+    """
+    nome_base = file_name[:-4] if file_name.lower().endswith(".pdf") else file_name
+    processadas = 0
+    for img in iter_images_cached(pdf_bytes, nome_base=nome_base, **options):
+        processadas += 1
+        if on_image is not None:
+            on_image(processadas)
+        if conversion_stats is not None:
+            conversion_stats[img.method] += 1
+        if img.duplicate_of:
+            if duplicates is not None:
+                duplicates[img.name] = img.duplicate_of
+            continue
+        yield img.name, img.data
+
+
+def _encerrar_processo(signum, frame):
+    # Encerra também as faixas em andamento e sai pelo caminho normal do
+    # Python, para que os `finally` rodem (ex.: o cache apaga a entrada incompleta)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    for filho in multiprocessing.active_children():
+        filho.terminate()
+    raise SystemExit(1)
+
+
+def _peak_rss():
+    """Pico de memória residente deste processo mais o das faixas já encerradas, em bytes."""
+    if resource is None:
+        return None
+    escala = 1 if sys.platform == "darwin" else 1024  # bytes no macOS, KB no Linux
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return pico * escala
+
+
+def worker_process(target):
+    """
+    Alvo de um processo de extração (job do app ou requisição do servidor):
+    Ctrl+C fica com o processo principal, e o SIGTERM do cancelamento
+    encerra as faixas e sai com `SystemExit`. Depois dos `finally`, o
+    processo termina sem esperar o pool das faixas, cuja thread pode ter
+    ficado presa no resultado de uma faixa encerrada no meio do envio.
+    """
+
+    @functools.wraps(target)
+    def _executar(*args):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, _encerrar_processo)
+        try:
+            target(*args)
+        except SystemExit as e:
+            os._exit(e.code if isinstance(e.code, int) else 1)
+
+    return _executar
+
+
+@worker_process
+def _executar_job(conn, files, page_counter, content_dedup, pages, options):
+    """
+    Processo de um job: extrai os PDFs de `files` em ordem e envia pela `conn`
+    ("inicio", pdf), ("paginas", pdf, total) quando o documento é aberto,
+    ("imagem", pdf, nome, bytes) para cada imagem e ("fim", pdf, métricas,
+    conversões, duplicatas, erro, pico_de_memória). Um ("pular", pdf)
+    recebido do job descarta o restante daquele PDF.
+    """
+    content_index = {} if content_dedup else None
+    for nome, origem in files:
+        stats = ExtractionStats()
+        conversoes = Counter()
+        duplicatas = {}
+        erro = None
+        with page_counter.get_lock():
+            page_counter.value = 0
+        doc = None
+        try:
+            conn.send(("inicio", nome))
+            page_indices = None
+            if pages:
+                # A seleção depende do total de páginas (e entra na chave do cache)
+                with stats.stage("abrir"):
+                    doc = open_document(origem)
+                page_indices = parse_pages_input(pages, len(doc))
+            # Sem seleção, o documento só é aberto se não estiver no cache
+            for nome_img, conteudo in iter_pdf_images(
+                nome, origem if doc is None else doc,
+                page_indices=page_indices,
+                content_index=content_index,
+                conversion_stats=conversoes,
+                duplicates=duplicatas,
+                stats=stats,
+                page_counter=page_counter,
+                on_open=lambda aberto, nome=nome: conn.send(("paginas", nome, len(aberto))),
+                **options,
+            ):
+                if conn.poll() and conn.recv() == ("pular", nome):
+                    break
+                conn.send(("imagem", nome, nome_img, conteudo))
+        except Exception as e:
+            erro = str(e)
+        finally:
+            if doc is not None:
+                doc.close()
+        conn.send(("fim", nome, stats, conversoes, duplicatas, erro, _peak_rss()))
+    conn.close()
+
+
+def join_or_kill(processo, timeout: float = 5) -> None:
+    """Espera o fim de um processo encerrado; se a limpeza não terminar em `timeout` segundos, mata-o."""
+    processo.join(timeout)
+    if processo.is_alive():
+        processo.kill()
+        processo.join()
+
+
+class PdfProgress:
+    """Andamento de um PDF do job (lido pela interface enquanto a thread escreve)."""
+
+    def __init__(self, name: str, page_counter=None):
+        self.name = name
+        self.status = PENDING
+        self.total_pages = 0
+        self.images = 0
+        self.error = None
+        self.stats = ExtractionStats()
+        self._page_counter = page_counter
+
+    @property
+    def pages_done(self) -> int:
+        # Durante a extração, o contador do processo (inclusive das faixas)
+        if self.status == RUNNING and self._page_counter is not None:
+            return self._page_counter.value
+        return self.stats.counts["paginas"]
+
+
+def ingest_upload(upload, directory: str):
+    """
+    Origem de um PDF enviado para o job (`upload` com `size`, `getvalue`,
+    `seek` e `read`, como o arquivo do `st.file_uploader`). Envios grandes
+    são copiados em blocos para `directory` e abertos pelo caminho (o MuPDF
+    lê do disco sob demanda, e as faixas em processos recebem só o caminho);
+    os pequenos seguem em bytes.
+    """
+    if upload.size <= UPLOAD_SPOOL_BYTES:
+        return upload.getvalue()
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+    upload.seek(0)
+    with os.fdopen(fd, "wb") as destino:
+        shutil.copyfileobj(upload, destino, 1024 * 1024)
+    return path
+
+
+class ExtractionJob:
+    """
+    Extrai os PDFs de um envio em um processo próprio, na ordem recebida,
+    sem bloquear a interface nem as extrações de outras sessões. Uma thread
+    recebe as imagens: o conteúdo de cada uma vai para `store` (um
+    `ImageStore`, sob a chave "arquivo.pdf:nome_imagem") assim que chega.
+    Cada PDF concluído vai para `results` (nomes das imagens, e suas
+    miniaturas para `thumbnails`) assim que termina, podendo ser exibido
+    enquanto os outros ainda são extraídos. `cancel` encerra o processo
+    (e suas faixas) na hora e descarta os PDFs que não terminaram, com as
+    imagens e miniaturas que já tinham chegado.
+
+    Cada PDF de `files` (pares nome, bytes ou caminho) é aberto no máximo
+    uma vez: só quando não está no cache ou quando a seleção `pages`
+    ("1-3,5") precisa do total de páginas. Com `delete_sources`, os
+    caminhos recebidos (ex.: envios copiados para o disco) são apagados
+    assim que o PDF termina.
+    `thumbnailer(bytes)` gera as miniaturas da prévia.
+    """
+
+    def __init__(self, files, store, *, content_dedup: bool = False, thumbnailer=None, pages: str = "",
+                 delete_sources: bool = False, **options):
+        self._files = list(files)  # pares (nome, bytes ou caminho), entregues ao processo no início
+        self.store = store
+        self.options = options
+        self.content_dedup = content_dedup
+        self.thumbnailer = thumbnailer
+        self.pages = pages
+        self.delete_sources = delete_sources
+        self._page_counter = PROCESS_CONTEXT.Value("q", 0)
+        self.progress = {nome: PdfProgress(nome, self._page_counter) for nome, _ in self._files}
+        self.results = {}  # nome do PDF -> lista de nomes das imagens, na ordem de conclusão
+        self.thumbnails = {}  # "arquivo.pdf:nome_imagem" -> (bytes, mime)
+        self.duplicates = {}  # nome do PDF -> {ocorrência omitida -> imagem mantida}
+        self.conversion_stats = Counter()
+        # Pico de memória do processo do job (e das faixas), em bytes; o
+        # processo vem do forkserver e não aparece no getrusage de quem o criou
+        self.peak_rss = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()  # início do processo x cancelamento
+        self._process = None
+        self._thread = threading.Thread(target=self._run, name="extracao", daemon=True)
+
+    def start(self) -> "ExtractionJob":
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancel.set()
+            if self._process is not None:
+                self._process.terminate()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Espera o fim do job (ou `timeout` segundos); retorna se terminou."""
+        self._thread.join(timeout)
+        return not self.running
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def _run(self) -> None:
+        conn, conn_filho = PROCESS_CONTEXT.Pipe()
+        with self._lock:
+            if not self._cancel.is_set():
+                self._process = PROCESS_CONTEXT.Process(
+                    target=_executar_job,
+                    args=(conn_filho, self._files, self._page_counter, self.content_dedup, self.pages, self.options),
+                    name="extracao",
+                )
+                self._process.start()
+                _PROCESSOS.add(self._process)
+        # A outra ponta fica só com o filho: o fim do processo encerra a leitura
+        conn_filho.close()
+        origens = dict(self._files)
+        self._files = []
+        try:
+            if self._process is not None:
+                self._receive(conn, origens)
+        finally:
+            conn.close()
+            if self._process is not None:
+                join_or_kill(self._process)
+                _PROCESSOS.discard(self._process)
+            # PDFs que não chegaram ao fim (cancelados ou interrompidos)
+            for nome, progresso in self.progress.items():
+                if progresso.status in (PENDING, RUNNING):
+                    if self._cancel.is_set():
+                        progresso.status = CANCELLED
+                    else:
+                        progresso.status = FAILED
+                        progresso.error = "o processo da extração terminou inesperadamente"
+                if nome not in self.results:
+                    # Imagens já gravadas de um PDF que não vai para a prévia nem
+                    # para o ZIP: liberam o espaço da sessão
+                    self._discard_images(nome)
+                self._delete_source(origens.pop(nome, None))
+
+    def _discard_images(self, nome: str) -> None:
+        prefixo = f"{nome}:"
+        self.store.discard_prefix(prefixo)
+        for chave in [c for c in list(self.thumbnails) if c.startswith(prefixo)]:
+            del self.thumbnails[chave]
+
+    def _receive(self, conn, origens) -> None:
+        imagens = []
+        while True:
+            try:
+                mensagem = conn.recv()
+            except (EOFError, OSError):
+                return
+            tipo, nome = mensagem[:2]
+            progresso = self.progress[nome]
+            if tipo == "inicio":
+                progresso.status = RUNNING
+            elif tipo == "paginas":
+                progresso.total_pages = mensagem[2]
+            elif tipo == "imagem":
+                if progresso.status != RUNNING:
+                    continue  # restante de um PDF que falhou ao gravar
+                nome_img, conteudo = mensagem[2:]
+                try:
+                    self.store.put(f"{nome}:{nome_img}", conteudo)
+                except Exception as e:
+                    progresso.status = FAILED
+                    progresso.error = str(e)
+                    conn.send(("pular", nome))
+                    continue
+                imagens.append(nome_img)
+                progresso.images += 1
+                if self.thumbnailer is not None:
+                    # Miniatura já a partir dos bytes em mãos, sem reler do disco
+                    with progresso.stats.stage("miniaturas"):
+                        try:
+                            self.thumbnails[f"{nome}:{nome_img}"] = self.thumbnailer(conteudo)
+                        except Exception:
+                            pass
+            elif tipo == "fim":
+                stats, conversoes, duplicatas, erro, self.peak_rss = mensagem[2:]
+                progresso.stats.merge(stats)
+                self.conversion_stats.update(conversoes)
+                if duplicatas:
+                    self.duplicates[nome] = duplicatas
+                if erro is not None and progresso.status != FAILED:
+                    progresso.status = FAILED
+                    progresso.error = erro
+                # Em caso de erro, mantém as imagens extraídas até a falha
+                self.results[nome] = imagens
+                imagens = []
+                if progresso.status in (PENDING, RUNNING):
+                    progresso.status = DONE
+                self._delete_source(origens.pop(nome, None))
+
+    def _delete_source(self, origem) -> None:
+        if self.delete_sources and isinstance(origem, str):
+            try:
+                os.remove(origem)
+            except OSError:
+                pass
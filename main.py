@@ -1,89 +1,739 @@
-import fitz  # PyMuPDF
 import os
-import io
-from PIL import Image
+import sys
+import json
+import time
+import queue
+import signal
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from cache import ExtractionCache, iter_images_cached, pdf_digest
+from catalog import CATALOG_NAME, ImageCatalog
+from extractor import DUPLICATE, METHOD_LABELS, ImageFilter, content_digest, register_content, sharded_name
+from manifest import BatchManifest
+from stats import ExtractionStats
 
-def extrair_imagens_de_pdfs(pasta_pdfs, pasta_saida):
+# Modos de enumeração das imagens: opções de `iter_images` de cada um
+VARREDURAS = {
+    "paginas": {},
+    "xref": {"xref_scan": True},
+    "xref-sem-paginas": {"xref_scan": True, "map_pages": False},
+}
+
+def _processar_pdf(caminho_pdf, pasta_saida, paginas_em_paralelo=1, content_index=None, cache=None,
+                   opcoes_extracao=None, subpastas=0, catalogar=False):
+    """
+    Extrai as imagens de um único PDF e grava cada uma assim que é produzida,
+    sem acumular o documento na memória.
+
+    Executa de forma isolada (abre o próprio documento), podendo rodar em um
+    processo separado. Em vez de imprimir diretamente, devolve registros leves
+    para que o processo principal exiba os logs em ordem e aplique a
+    deduplicação por conteúdo entre PDFs.
+
+    Args:
+        caminho_pdf (str): Caminho do arquivo PDF.
+        pasta_saida (str): Caminho para a pasta onde as imagens serão salvas.
+        paginas_em_paralelo (int): Quantidade de processos entre os quais as
+            páginas do PDF são divididas (1 = sequencial).
+        content_index (dict | None): Índice hash -> imagem mantida; se informado,
+            ativa a deduplicação por conteúdo.
+        cache (ExtractionCache | None): Cache de extrações já feitas.
+        opcoes_extracao (dict | None): Opções adicionais de `iter_images`
+            (ex.: `xref_scan`, `map_pages`).
+        subpastas (int): Níveis de subpastas da saída (ver `sharded_name`);
+            o nome de cada imagem passa a ser o caminho relativo.
+        catalogar (bool): Calcula o hash de todas as imagens, para o catálogo.
+
+    Returns:
+        tuple[str, list[tuple[ExtractedImage, str | None, int]], ExtractionStats]: Hash
+            do PDF, para cada imagem (sem os bytes) a mensagem de erro de gravação
+            ou None e os bytes gravados, e as métricas de cada etapa.
+    """
+    # Remove a extensão .pdf para usar como parte do nome da imagem
+    nome_base = os.path.splitext(os.path.basename(caminho_pdf))[0]
+    stats = ExtractionStats()
+    with stats.stage("hash_pdf"):
+        sha256 = pdf_digest(caminho_pdf)
+
+    registros = []
+    # Com subpastas, o índice recebido guarda os nomes finais (caminhos): a
+    # extração deduplica só dentro do PDF, com os nomes sem subpastas, e cada
+    # imagem é registrada no índice recebido depois de renomeada
+    indice_extracao = content_index
+    if subpastas and content_index is not None:
+        indice_extracao = {}
+    # XREFs repetidos são ignorados, inclusive entre faixas de páginas
+    for imagem in iter_images_cached(
+        caminho_pdf,
+        cache=cache,
+        nome_base=nome_base,
+        deduplicate=True,
+        content_index=indice_extracao,
+        shards=paginas_em_paralelo,
+        digest=sha256,
+        stats=stats,
+        **(opcoes_extracao or {}),
+    ):
+        if subpastas:
+            imagem = replace(
+                imagem,
+                name=sharded_name(imagem.name, subpastas),
+                duplicate_of=sharded_name(imagem.duplicate_of, subpastas) if imagem.duplicate_of else None,
+            )
+            if indice_extracao is not content_index and imagem.digest:
+                if imagem.duplicate_of:
+                    # A imagem mantida no PDF pode ter virado repetição de um PDF anterior
+                    imagem = replace(imagem, duplicate_of=content_index.get(imagem.digest, imagem.duplicate_of))
+                else:
+                    imagem = register_content(imagem, content_index)
+        if catalogar and not imagem.digest:
+            with stats.stage("hash"):
+                imagem.digest = content_digest(imagem.data)
+        erro = None
+        if not imagem.duplicate_of:
+            try:
+                # Salva a imagem
+                with stats.stage("gravar"):
+                    caminho_imagem = os.path.join(pasta_saida, imagem.name)
+                    if subpastas:
+                        os.makedirs(os.path.dirname(caminho_imagem), exist_ok=True)
+                    with open(caminho_imagem, "wb") as f:
+                        f.write(imagem.data)
+                stats.add_bytes("gravar", len(imagem.data))
+            except Exception as e:
+                # Captura erros de gravação (raros, mas podem ocorrer)
+                erro = str(e)
+        registros.append((replace(imagem, data=b""), erro, len(imagem.data)))
+    return sha256, registros, stats
+
+def _registrar_pdf(nome_arquivo, registros, pasta_saida, content_index=None, duplicatas=None):
+    """
+    Gera os logs de um PDF já processado e resolve repetições de conteúdo
+    entre PDFs: uma imagem gravada por um worker cujo conteúdo já pertence a
+    um PDF anterior (na ordem alfabética) é apagada e vira ocorrência repetida.
+
+    Args:
+        nome_arquivo (str): Nome do PDF de origem (usado nos logs).
+        registros (list): Registros retornados por `_processar_pdf`.
+        pasta_saida (str): Caminho para a pasta onde as imagens foram salvas.
+        content_index (dict | None): Índice global hash -> imagem mantida.
+        duplicatas (dict | None): Recebe o mapa ocorrência ignorada -> imagem mantida.
+
+    Returns:
+        tuple[list[str], dict, list]: Linhas de log do PDF, imagens salvas
+            (nome -> hash) e pares (imagem, bytes gravados) salvos ou repetidos.
+    """
+    logs = [f"Processando PDF: {nome_arquivo}..."]
+    salvas = {}
+    detalhes = []
+
+    for imagem, erro, tamanho in registros:
+        if content_index is not None and imagem.digest and erro is None:
+            resolvida = register_content(imagem, content_index)
+            if resolvida.duplicate_of and not imagem.duplicate_of:
+                # Gravada pelo worker, mas o conteúdo já foi salvo por um PDF anterior
+                try:
+                    os.remove(os.path.join(pasta_saida, imagem.name))
+                except FileNotFoundError:
+                    pass
+            imagem = resolvida
+        if imagem.duplicate_of:
+            if duplicatas is not None:
+                duplicatas[imagem.name] = imagem.duplicate_of
+            detalhes.append((imagem, 0))
+            logs.append(f"  -> Imagem repetida: {imagem.name} (igual a {imagem.duplicate_of})")
+        elif erro:
+            logs.append(f"  -> ERRO ao salvar imagem {imagem.xref} do PDF {nome_arquivo}: {erro}")
+        else:
+            salvas[imagem.name] = imagem.digest
+            detalhes.append((imagem, tamanho))
+            logs.append(f"  -> Imagem salva: {imagem.name} ({METHOD_LABELS[imagem.method]})")
+
+    logs.append(f"Processamento de {nome_arquivo} concluído.\n")
+    return logs, salvas, detalhes
+
+def _descartar_pdf(manifesto, nome_arquivo, pasta_saida):
+    """Apaga as imagens geradas por um PDF registrado no manifesto e o retira dele."""
+    for nome_imagem in manifesto.entries[nome_arquivo]["imagens"]:
+        try:
+            os.remove(os.path.join(pasta_saida, nome_imagem))
+        except FileNotFoundError:
+            pass
+    manifesto.forget(nome_arquivo)
+
+def _descartar_orfaos(manifesto, pasta_saida):
+    """
+    Descarta PDFs cujas repetições apontam para imagens que não existem mais
+    (o PDF dono do conteúdo foi removido ou alterado) e retorna seus nomes,
+    para que sejam reprocessados.
+    """
+    descartados = set()
+    while True:
+        mantidas = {n for e in manifesto.entries.values() for n in e["imagens"]}
+        orfaos = [
+            nome for nome, e in manifesto.entries.items()
+            if any(mantida not in mantidas for mantida in e["duplicatas"].values())
+        ]
+        if not orfaos:
+            return descartados
+        for nome in orfaos:
+            _descartar_pdf(manifesto, nome, pasta_saida)
+            descartados.add(nome)
+
+def _recusar_conflitos(nomes_pdfs, registrados, avisados=None):
+    """
+    Retira de `nomes_pdfs` os PDFs cujo nome sem extensão (sem diferenciar
+    maiúsculas) repete o de outro, como `a.pdf` e `a.PDF`: as imagens de um
+    sobrescreveriam as do outro. Fica o já registrado em `registrados` ou,
+    entre os novos, o primeiro em ordem alfabética. Cada PDF recusado é
+    informado uma vez por chamada ou, com o conjunto `avisados`, uma vez
+    enquanto continuar em conflito.
+    """
+    mantidos = {}
+    recusados = set()
+    for nome in sorted(nomes_pdfs, key=lambda n: (n not in registrados, n)):
+        base = os.path.splitext(nome)[0].casefold()
+        if base not in mantidos:
+            mantidos[base] = nome
+            continue
+        recusados.add(nome)
+        if avisados is None or nome not in avisados:
+            print(f"ERRO: {nome} ignorado: as imagens teriam os mesmos nomes que as de {mantidos[base]} "
+                  "(renomeie um dos dois)", flush=True)
+    if avisados is not None:
+        avisados.intersection_update(recusados)
+        avisados.update(recusados)
+    return [n for n in nomes_pdfs if n not in recusados]
+
+def _preparar_incremental(manifesto, nomes_pdfs, pasta_pdfs, pasta_saida, dedup_conteudo, forcar=False):
+    """
+    Compara a pasta de PDFs com o manifesto: apaga as saídas de PDFs removidos
+    ou alterados e retorna os PDFs que precisam ser (re)processados (todos, com `forcar`).
+    """
+    atuais = set(nomes_pdfs)
+    opcoes_mudaram = manifesto.options_changed
+    for nome in sorted(manifesto.entries):
+        if opcoes_mudaram or nome not in atuais:
+            _descartar_pdf(manifesto, nome, pasta_saida)
+            if nome not in atuais:
+                print(f"PDF removido da pasta: {nome} (imagens apagadas)")
+
+    pendentes = set()
+    for nome in nomes_pdfs:
+        if forcar or not manifesto.is_unchanged(nome, os.path.join(pasta_pdfs, nome)):
+            pendentes.add(nome)
+    for nome in pendentes & set(manifesto.entries):
+        _descartar_pdf(manifesto, nome, pasta_saida)
+
+    # Repetições que apontam para imagens apagadas obrigam a reprocessar o PDF
+    if dedup_conteudo:
+        pendentes |= _descartar_orfaos(manifesto, pasta_saida)
+
+    ignorados = len(nomes_pdfs) - len(pendentes)
+    if ignorados:
+        print(f"{ignorados} PDF(s) sem alterações desde a última execução ignorado(s).\n")
+    return [n for n in nomes_pdfs if n in pendentes]
+
+def _indice_do_manifesto(manifesto):
+    """Índice hash -> imagem mantida com as imagens dos PDFs já registrados."""
+    content_index = {}
+    for entrada in manifesto.entries.values():
+        for nome_imagem, digest in entrada["imagens"].items():
+            content_index.setdefault(digest, nome_imagem)
+    return content_index
+
+def _concluir_pdf(manifesto, nome_arquivo, info, resultado, pasta_saida, content_index=None, metricas=None):
+    """
+    Resolve as repetições de um PDF processado, registra-o no manifesto e
+    retorna os logs. Com `metricas` (arquivo aberto), acrescenta a ele uma
+    linha JSON com o tempo e os bytes de cada etapa e os contadores do PDF.
+    """
+    sha256, registros, stats = resultado
+    dups_pdf = {}
+    logs, salvas, detalhes = _registrar_pdf(nome_arquivo, registros, pasta_saida, content_index, dups_pdf)
+    manifesto.record(
+        nome_arquivo, size=info.st_size, mtime=info.st_mtime, sha256=sha256,
+        imagens=salvas, duplicatas=dups_pdf, detalhes=detalhes,
+    )
+    if metricas is not None:
+        # Inclui as repetições entre PDFs resolvidas aqui, fora do worker
+        stats.counts[DUPLICATE] = len(dups_pdf)
+        _emitir_metricas(metricas, {"tipo": "pdf", "pdf": nome_arquivo, "bytes_pdf": info.st_size}, stats)
+    return logs
+
+def _emitir_metricas(metricas, registro, stats):
+    """Acrescenta uma linha JSON de métricas ao arquivo `metricas`."""
+    registro = {"data": time.strftime("%Y-%m-%dT%H:%M:%S"), **registro}
+    registro["segundos_total"] = round(stats.total_seconds(), 6)
+    registro.update(stats.as_dict())
+    metricas.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    metricas.flush()
+
+def _gravar_duplicatas(manifesto, pasta_saida, dedup_conteudo):
+    """Grava `duplicatas.json` com as repetições de todos os PDFs registrados e retorna o mapa."""
+    duplicatas = manifesto.duplicates()
+    caminho_duplicatas = os.path.join(pasta_saida, "duplicatas.json")
+    if dedup_conteudo:
+        with open(caminho_duplicatas, "w", encoding="utf-8") as f:
+            json.dump(duplicatas, f, indent=2, ensure_ascii=False)
+    elif os.path.exists(caminho_duplicatas):
+        # Mapa de uma execução anterior com deduplicação, que não vale mais
+        os.remove(caminho_duplicatas)
+    return duplicatas
+
+def _opcoes_do_manifesto(dedup_conteudo, opcoes_extracao, subpastas=0):
+    """Opções que alteram o resultado, na forma gravada (JSON) no manifesto."""
+    opcoes = {"dedup_conteudo": dedup_conteudo}
+    for chave, valor in (opcoes_extracao or {}).items():
+        opcoes[chave] = valor.as_dict() if isinstance(valor, ImageFilter) else valor
+    if subpastas:
+        opcoes["subpastas"] = subpastas
+    return opcoes
+
+def _abrir_manifesto(pasta_saida, dedup_conteudo, opcoes_extracao, subpastas, catalogo):
+    """Manifesto da pasta de saída, acompanhado do catálogo SQLite se `catalogo`."""
+    catalog = ImageCatalog(os.path.join(pasta_saida, CATALOG_NAME)) if catalogo else None
+    return BatchManifest(pasta_saida, _opcoes_do_manifesto(dedup_conteudo, opcoes_extracao, subpastas), catalog)
+
+def extrair_imagens_de_pdfs(
+    pasta_pdfs, pasta_saida, num_processos=1, paginas_em_paralelo=1, dedup_conteudo=False, cache=None,
+    incremental=True, metricas=None, opcoes_extracao=None, subpastas=0, catalogo=False,
+):
     """
     Extrai todas as imagens de arquivos PDF em uma pasta e as salva em outra pasta.
 
     Args:
         pasta_pdfs (str): Caminho para a pasta que contém os arquivos PDF.
         pasta_saida (str): Caminho para a pasta onde as imagens extraídas serão salvas.
+        num_processos (int): Quantidade de processos que extraem PDFs em paralelo.
+            Com 1 (padrão), os PDFs são processados em sequência no processo atual.
+        paginas_em_paralelo (int): Quantidade de processos entre os quais as páginas
+            de cada PDF são divididas. Útil para documentos muito grandes.
+        dedup_conteudo (bool): Ignora imagens de conteúdo idêntico a outra já salva,
+            em qualquer página ou PDF do lote. O mapa das ocorrências ignoradas é
+            gravado em `duplicatas.json` na pasta de saída.
+        cache (ExtractionCache | None): Reaproveita extrações de PDFs idênticos
+            feitas em execuções anteriores com as mesmas opções.
+        incremental (bool): Usa o manifesto da pasta de saída para ignorar PDFs
+            inalterados, processar novos ou modificados, apagar as imagens de PDFs
+            removidos e retomar uma execução interrompida. Com False, todos os
+            PDFs são reprocessados e o manifesto é refeito.
+        metricas (file | None): Arquivo aberto onde são acrescentadas as
+            métricas (JSON Lines): uma linha por PDF e uma com o total do lote.
+        opcoes_extracao (dict | None): Opções adicionais de `iter_images`, como
+            a varredura da tabela de xrefs (ver `VARREDURAS`) ou o filtro de
+            imagens (`image_filter`). Mudá-las faz o modo incremental
+            reprocessar todos os PDFs.
+        subpastas (int): Divide a saída em subpastas com esse número de níveis
+            (256 pastas por nível), em vez de gravar tudo em uma só pasta.
+        catalogo (bool): Mantém `.catalogo.sqlite` na pasta de saída, com
+            origem, página, xref, dimensões, formato, tamanho e hash de cada
+            imagem (consultável com `query.py`).
+
+    Returns:
+        dict: Mapa ocorrência ignorada -> imagem mantida (vazio sem `dedup_conteudo`).
     """
-    
+
     # 1. Cria a pasta de saída se ela não existir
     os.makedirs(pasta_saida, exist_ok=True)
-    
-    # 2. Percorre todos os arquivos na pasta de PDFs
-    for nome_arquivo in os.listdir(pasta_pdfs):
-        if nome_arquivo.lower().endswith(".pdf"):
-            caminho_pdf = os.path.join(pasta_pdfs, nome_arquivo)
-            print(f"Processando PDF: {nome_arquivo}...")
-            
-            # Remove a extensão .pdf para usar como parte do nome da imagem
-            nome_base = os.path.splitext(nome_arquivo)[0]
-            
+
+    # 2. Lista os PDFs da pasta em ordem alfabética (saída determinística)
+    nomes_pdfs = sorted(n for n in os.listdir(pasta_pdfs) if n.lower().endswith(".pdf"))
+
+    # 3. No modo incremental, só processa o que mudou desde a última execução
+    manifesto = _abrir_manifesto(pasta_saida, dedup_conteudo, opcoes_extracao, subpastas, catalogo)
+    nomes_pdfs = _recusar_conflitos(nomes_pdfs, manifesto.entries)
+    nomes_pdfs = _preparar_incremental(
+        manifesto, nomes_pdfs, pasta_pdfs, pasta_saida, dedup_conteudo, forcar=not incremental,
+    )
+    # Imagens mantidas de PDFs inalterados continuam sendo as de referência
+    content_index = _indice_do_manifesto(manifesto) if dedup_conteudo else None
+    caminhos_pdfs = [os.path.join(pasta_pdfs, n) for n in nomes_pdfs]
+    totais = ExtractionStats()
+    inicio = time.perf_counter()
+
+    # 4. Processa os PDFs em sequência ou distribuídos entre processos
+    if num_processos <= 1 or len(caminhos_pdfs) <= 1:
+        for nome_arquivo, caminho_pdf in zip(nomes_pdfs, caminhos_pdfs):
             try:
-                # Abre o documento PDF
-                doc = fitz.open(caminho_pdf)
-                
-                # Armazena XREFs (referências) de imagens já processadas para evitar duplicatas
-                xrefs_processadas = set()
-                
-                for pagina_indice in range(len(doc)):
-                    pagina = doc[pagina_indice]
-                    
-                    # Obtém a lista de imagens na página
-                    lista_imagens = pagina.get_images()
-                    
-                    for indice_img, info_imagem in enumerate(lista_imagens):
-                        xref = info_imagem[0] # A XREF é a referência única da imagem no PDF
-                        
-                        # Verifica se a imagem já foi processada
-                        if xref in xrefs_processadas:
-                            continue
-                        
-                        xrefs_processadas.add(xref)
-                        
-                        # Extrai a imagem
-                        base_image = doc.extract_image(xref)
-                        image_bytes = base_image["image"]
-                        image_ext = base_image["ext"]
-                        
-                        # Verifica se os bytes da imagem foram extraídos com sucesso
-                        if not image_bytes:
-                            continue
-
-                        # Converte os bytes para um objeto PIL Image para manipulação e salvamento
-                        try:
-                            imagem = Image.open(io.BytesIO(image_bytes))
-                            
-                            # Cria um nome único para a imagem
-                            nome_imagem_saida = f"{nome_base}_p{pagina_indice+1}_img{indice_img+1}.{image_ext}"
-                            caminho_imagem_saida = os.path.join(pasta_saida, nome_imagem_saida)
-                            
-                            # Salva a imagem
-                            imagem.save(caminho_imagem_saida)
-                            print(f"  -> Imagem salva: {nome_imagem_saida}")
-                            
-                        except Exception as e:
-                            # Captura erros de formato de imagem (raros, mas podem ocorrer)
-                            print(f"  -> ERRO ao salvar imagem {xref} do PDF {nome_arquivo}: {e}")
-
-                doc.close()
-                print(f"Processamento de {nome_arquivo} concluído.\n")
+                info = os.stat(caminho_pdf)
+                # O índice global é usado direto: repetições nem chegam a ser gravadas
+                resultado = _processar_pdf(
+                    caminho_pdf, pasta_saida, paginas_em_paralelo, content_index, cache, opcoes_extracao,
+                    subpastas, catalogo,
+                )
+                logs = _concluir_pdf(manifesto, nome_arquivo, info, resultado, pasta_saida, content_index, metricas)
+                totais.merge(resultado[2])
+            except Exception as e:
+                logs = [f"ERRO FATAL ao processar {nome_arquivo}: {e}\n"]
+            print("\n".join(logs))
+    else:
+        # Cada worker deduplica dentro do próprio PDF; entre PDFs, a ordem dos arquivos decide
+        worker_index = {} if dedup_conteudo else None
+        with ProcessPoolExecutor(max_workers=num_processos) as executor:
+            trabalhos = []
+            for nome_arquivo, caminho_pdf in zip(nomes_pdfs, caminhos_pdfs):
+                # Data e tamanho lidos antes da extração: uma alteração durante o processamento é detectada na próxima execução
+                try:
+                    info = os.stat(caminho_pdf)
+                except OSError as e:
+                    # Removido depois da listagem: o erro é informado só para este PDF, abaixo
+                    trabalhos.append((nome_arquivo, e, None))
+                    continue
+                futuro = executor.submit(
+                    _processar_pdf, caminho_pdf, pasta_saida, paginas_em_paralelo, worker_index, cache,
+                    opcoes_extracao, subpastas, catalogo,
+                )
+                trabalhos.append((nome_arquivo, info, futuro))
+            # Os logs são exibidos na ordem dos arquivos, à medida que cada um termina
+            for nome_arquivo, info, futuro in trabalhos:
+                try:
+                    if futuro is None:
+                        raise info
+                    resultado = futuro.result()
+                    logs = _concluir_pdf(manifesto, nome_arquivo, info, resultado, pasta_saida, content_index, metricas)
+                    totais.merge(resultado[2])
+                except Exception as e:
+                    logs = [f"ERRO FATAL ao processar {nome_arquivo}: {e}\n"]
+                print("\n".join(logs))
+
+    manifesto.compact()
+    if manifesto.catalog is not None:
+        manifesto.catalog.close()
+    if metricas is not None:
+        # Tempos das etapas somados entre processos; `segundos_lote` é o tempo real do lote
+        _emitir_metricas(metricas, {
+            "tipo": "lote", "pdfs": len(nomes_pdfs),
+            "segundos_lote": round(time.perf_counter() - inicio, 6),
+        }, totais)
+    # Inclui as repetições registradas em execuções anteriores
+    return _gravar_duplicatas(manifesto, pasta_saida, dedup_conteudo)
+
+def observar_pasta(
+    pasta_pdfs, pasta_saida, num_processos=1, paginas_em_paralelo=1, dedup_conteudo=False, cache=None,
+    intervalo=2.0, tamanho_fila=100, metricas=None, opcoes_extracao=None, subpastas=0, catalogo=False,
+):
+    """
+    Modo contínuo: observa a pasta de PDFs (por varredura periódica) e extrai
+    cada PDF novo ou alterado poucos segundos depois de ele chegar.
+
+    Um PDF só entra na fila depois que tamanho e data de modificação ficam
+    iguais entre duas varreduras (cópia concluída). A fila é limitada: quando
+    está cheia, os PDFs restantes esperam a próxima varredura. Os workers
+    usam o mesmo manifesto do modo em lote; PDFs removidos da pasta têm suas
+    imagens apagadas. Encerra com Ctrl+C.
+
+    Args:
+        pasta_pdfs (str): Caminho para a pasta observada.
+        pasta_saida (str): Caminho para a pasta onde as imagens serão salvas.
+        num_processos (int): Quantidade de PDFs extraídos ao mesmo tempo.
+        paginas_em_paralelo (int): Processos por PDF (ver `extrair_imagens_de_pdfs`).
+        dedup_conteudo (bool): Deduplicação por conteúdo entre PDFs; a primeira
+            imagem a ser registrada é a mantida.
+        cache (ExtractionCache | None): Cache de extrações já feitas.
+        intervalo (float): Segundos entre varreduras da pasta.
+        tamanho_fila (int): Máximo de PDFs aguardando na fila.
+        metricas (file | None): Arquivo aberto que recebe uma linha JSON de
+            métricas por PDF extraído.
+        opcoes_extracao (dict | None): Opções adicionais de `iter_images`.
+        subpastas (int): Níveis de subpastas da saída.
+        catalogo (bool): Mantém o catálogo SQLite da pasta de saída.
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+
+    # Processa o que já está na pasta e não foi registrado (ou mudou)
+    extrair_imagens_de_pdfs(
+        pasta_pdfs, pasta_saida, num_processos, paginas_em_paralelo, dedup_conteudo, cache,
+        metricas=metricas, opcoes_extracao=opcoes_extracao, subpastas=subpastas, catalogo=catalogo,
+    )
+
+    manifesto = _abrir_manifesto(pasta_saida, dedup_conteudo, opcoes_extracao, subpastas, catalogo)
+    content_index = _indice_do_manifesto(manifesto) if dedup_conteudo else None
+    worker_index = {} if dedup_conteudo else None
+    lock = threading.Lock()
+    fila = queue.Queue(maxsize=tamanho_fila)
+    em_andamento = set()  # PDFs na fila ou sendo extraídos
+    conhecidos = {}  # nome -> (tamanho, mtime) já tratado (processado ou com erro)
+    candidatos = {}  # nome -> (tamanho, mtime) da última varredura, aguardando estabilizar
+    parar = threading.Event()
+    alterado = threading.Event()  # duplicatas.json precisa ser regravado
+    em_conflito = set()  # PDFs recusados por repetirem o nome de outro (já informados)
 
+    for nome, entrada in manifesto.entries.items():
+        conhecidos[nome] = (entrada["size"], entrada["mtime"])
+
+    def _worker(executor):
+        while not parar.is_set():
+            try:
+                nome_arquivo, info = fila.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            caminho_pdf = os.path.join(pasta_pdfs, nome_arquivo)
+            try:
+                with lock:
+                    # Versão anterior do mesmo PDF: as imagens antigas dão lugar às novas
+                    if nome_arquivo in manifesto.entries:
+                        _descartar_pdf(manifesto, nome_arquivo, pasta_saida)
+                        _esquecer_orfaos()
+                futuro = executor.submit(
+                    _processar_pdf, caminho_pdf, pasta_saida, paginas_em_paralelo, worker_index, cache,
+                    opcoes_extracao, subpastas, catalogo,
+                )
+                resultado = futuro.result()
+                with lock:
+                    logs = _concluir_pdf(
+                        manifesto, nome_arquivo, info, resultado, pasta_saida, content_index, metricas,
+                    )
             except Exception as e:
-                print(f"ERRO FATAL ao processar {nome_arquivo}: {e}\n")
+                logs = [f"ERRO FATAL ao processar {nome_arquivo}: {e}\n"]
+            with lock:
+                print("\n".join(logs), flush=True)
+                conhecidos[nome_arquivo] = (info.st_size, info.st_mtime)
+                em_andamento.discard(nome_arquivo)
+            alterado.set()
+            fila.task_done()
+
+    def _esquecer_orfaos():
+        # Chamado com o lock, depois de apagar as imagens de um PDF
+        if dedup_conteudo:
+            # PDFs que apontavam para as imagens apagadas voltam a ser extraídos
+            for orfao in _descartar_orfaos(manifesto, pasta_saida):
+                conhecidos.pop(orfao, None)
+            content_index.clear()
+            content_index.update(_indice_do_manifesto(manifesto))
+
+    def _varrer():
+        try:
+            nomes = {n for n in os.listdir(pasta_pdfs) if n.lower().endswith(".pdf")}
+        except OSError as e:
+            # Pasta indisponível no momento (ex.: disco de rede): nada é tratado como removido
+            print(f"Não foi possível listar {pasta_pdfs}: {e} (nova tentativa na próxima varredura)", flush=True)
+            return
+        with lock:
+            nomes = set(_recusar_conflitos(nomes, set(manifesto.entries) | em_andamento, em_conflito))
+            # PDFs removidos da pasta: apaga as imagens (e reprocessa quem dependia delas)
+            for nome in sorted(set(manifesto.entries) - nomes - em_andamento):
+                _descartar_pdf(manifesto, nome, pasta_saida)
+                conhecidos.pop(nome, None)
+                print(f"PDF removido da pasta: {nome} (imagens apagadas)", flush=True)
+                _esquecer_orfaos()
+                alterado.set()
+            for nome in list(candidatos):
+                if nome not in nomes:
+                    del candidatos[nome]
+
+        for nome in sorted(nomes):
+            with lock:
+                if nome in em_andamento:
+                    continue
+            try:
+                info = os.stat(os.path.join(pasta_pdfs, nome))
+            except OSError:
+                # Removido ou renomeado depois da listagem: a próxima varredura decide
+                candidatos.pop(nome, None)
+                continue
+            assinatura = (info.st_size, info.st_mtime)
+            with lock:
+                if conhecidos.get(nome) == assinatura:
+                    continue
+            if candidatos.get(nome) != assinatura:
+                # Ainda sendo gravado (ou visto pela primeira vez): confere na próxima varredura
+                candidatos[nome] = assinatura
+                continue
+            try:
+                with lock:
+                    inalterado = manifesto.is_unchanged(nome, os.path.join(pasta_pdfs, nome))
+                    if inalterado:
+                        conhecidos[nome] = assinatura
+            except OSError as e:
+                # Removido, renomeado ou bloqueado durante o hash: tenta de novo na próxima varredura
+                del candidatos[nome]
+                if not isinstance(e, FileNotFoundError):
+                    print(f"Não foi possível ler {nome}: {e} (nova tentativa na próxima varredura)", flush=True)
+                continue
+            if inalterado:
+                del candidatos[nome]
+                continue
+            try:
+                fila.put_nowait((nome, info))
+            except queue.Full:
+                # Fila cheia: o PDF volta a ser considerado na próxima varredura
+                break
+            del candidatos[nome]
+            with lock:
+                em_andamento.add(nome)
+
+    print(f"Observando {pasta_pdfs} (Ctrl+C para encerrar)...", flush=True)
+    # Ctrl+C é tratado só no processo principal, que encerra os workers
+    executor = ProcessPoolExecutor(max_workers=max(1, num_processos), initializer=signal.signal,
+                                   initargs=(signal.SIGINT, signal.SIG_IGN))
+    workers = [
+        threading.Thread(target=_worker, args=(executor,), daemon=True)
+        for _ in range(max(1, num_processos))
+    ]
+    for t in workers:
+        t.start()
+    try:
+        while True:
+            _varrer()
+            if fila.unfinished_tasks == 0 and alterado.is_set():
+                # Fila vazia: grava o mapa de repetições e enxuga o manifesto
+                with lock:
+                    alterado.clear()
+                    manifesto.compact()
+                    _gravar_duplicatas(manifesto, pasta_saida, dedup_conteudo)
+            time.sleep(intervalo)
+    except KeyboardInterrupt:
+        print("Encerrando...", flush=True)
+    finally:
+        parar.set()
+        for t in workers:
+            t.join()
+        executor.shutdown(cancel_futures=True)
+        manifesto.compact()
+        _gravar_duplicatas(manifesto, pasta_saida, dedup_conteudo)
+        if manifesto.catalog is not None:
+            manifesto.catalog.close()
 
 # --- Configurações ---
 # Usa as pastas do próprio projeto, ao lado deste script
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PASTA_DOS_PDFS = os.path.join(BASE_DIR, "PASTA_DOS_PDFS")
 PASTA_DE_SAIDA = os.path.join(BASE_DIR, "PASTA_DE_SAIDA")
+# Quantidade de processos usados no modo em lote (padrão: todos os núcleos)
+NUM_PROCESSOS = os.cpu_count() or 1
+# Cache de extrações entre execuções (tamanho máximo em MB)
+PASTA_DO_CACHE = os.path.join(BASE_DIR, ".cache_extracao")
+CACHE_MAX_MB = 1024
+
+
+def adicionar_opcoes_de_cache(parser):
+    """Opções --cache, --cache-max-mb e --sem-cache (as mesmas no server.py)."""
+    parser.add_argument("--cache", default=PASTA_DO_CACHE, help="Pasta do cache de extrações")
+    parser.add_argument("--cache-max-mb", type=int, default=CACHE_MAX_MB, help="Tamanho máximo do cache em MB")
+    parser.add_argument("--sem-cache", action="store_true", help="Não usa o cache de extrações")
+
+
+def abrir_cache(parser, args):
+    """Cache pedido pelas opções de `adicionar_opcoes_de_cache` (None com --sem-cache)."""
+    if args.sem_cache:
+        return None
+    try:
+        return ExtractionCache(args.cache, max_bytes=args.cache_max_mb * 1024 * 1024)
+    except PermissionError as e:
+        parser.error(f"{e} (use outro --cache ou --sem-cache)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extrai imagens de PDFs de uma pasta.")
+    parser.add_argument("--entrada", default=PASTA_DOS_PDFS, help="Pasta com os arquivos PDF")
+    parser.add_argument("--saida", default=PASTA_DE_SAIDA, help="Pasta onde as imagens serão salvas")
+    parser.add_argument(
+        "-p", "--processos", type=int, default=NUM_PROCESSOS,
+        help="Quantidade de PDFs processados em paralelo (1 = sequencial)",
+    )
+    parser.add_argument(
+        "--paginas-em-paralelo", type=int, default=1,
+        help="Divide as páginas de cada PDF entre N processos (para documentos muito grandes)",
+    )
+    parser.add_argument(
+        "--dedup-conteudo", action="store_true",
+        help="Ignora imagens de conteúdo idêntico em qualquer PDF do lote (mapa em duplicatas.json)",
+    )
+    adicionar_opcoes_de_cache(parser)
+    parser.add_argument(
+        "--completo", action="store_true",
+        help="Reprocessa todos os PDFs, ignorando o manifesto de execuções anteriores",
+    )
+    parser.add_argument(
+        "--observar", action="store_true",
+        help="Fica em execução observando a pasta de entrada e extrai cada PDF novo assim que termina de chegar",
+    )
+    parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre varreduras no modo --observar")
+    parser.add_argument("--fila", type=int, default=100, help="Tamanho máximo da fila de PDFs no modo --observar")
+    parser.add_argument(
+        "--metricas", metavar="ARQUIVO",
+        help="Acrescenta ao ARQUIVO (JSON Lines) o tempo e os bytes de cada etapa por PDF; '-' = saída de erro",
+    )
+    parser.add_argument(
+        "--varredura", choices=list(VARREDURAS), default="paginas",
+        help="Como as imagens são encontradas: página a página (padrão), pela tabela de xrefs com os "
+             "nomes por página, ou pela tabela de xrefs com nomes pelo xref (mais rápido)",
+    )
+    parser.add_argument(
+        "--subpastas", type=int, default=0, choices=range(0, 4), metavar="{0-3}",
+        help="Divide a saída em subpastas com N níveis (256 por nível) para pastas com milhões de imagens",
+    )
+    parser.add_argument(
+        "--catalogo", action="store_true",
+        help=f"Mantém {CATALOG_NAME} na pasta de saída com os dados de cada imagem (consulte com query.py)",
+    )
+    filtros = parser.add_argument_group(
+        "filtros", "Descartam imagens pelos metadados, antes de extraí-las (ícones, máscaras, fios de 1 pixel...)",
+    )
+    filtros.add_argument("--largura-min", type=int, default=0, help="Largura mínima em pixels")
+    filtros.add_argument("--altura-min", type=int, default=0, help="Altura mínima em pixels")
+    filtros.add_argument("--area-min", type=int, default=0, help="Área mínima (largura x altura) em pixels")
+    filtros.add_argument("--ignorar-mascaras", action="store_true", help="Ignora máscaras (/SMask e de estêncil)")
+    filtros.add_argument(
+        "--espacos-de-cor", help="Espaços de cor aceitos, separados por vírgula (ex.: DeviceRGB,ICCBased)",
+    )
+    filtros.add_argument("--max-por-pagina", type=int, default=0, help="Máximo de imagens extraídas por página")
+    args = parser.parse_args()
+
+    cache = abrir_cache(parser, args)
+    opcoes_extracao = dict(VARREDURAS[args.varredura])
+    filtro = ImageFilter(
+        min_width=args.largura_min,
+        min_height=args.altura_min,
+        min_area=args.area_min,
+        skip_masks=args.ignorar_mascaras,
+        colorspaces=frozenset(c.strip() for c in args.espacos_de_cor.split(",") if c.strip())
+        if args.espacos_de_cor else None,
+        max_per_page=args.max_por_pagina,
+    )
+    if filtro.is_active():
+        opcoes_extracao["image_filter"] = filtro
+    if args.metricas == "-":
+        metricas = sys.stderr
+    elif args.metricas:
+        metricas = open(args.metricas, "a", encoding="utf-8")
+    else:
+        metricas = None
 
-# Executa a função
-extrair_imagens_de_pdfs(PASTA_DOS_PDFS, PASTA_DE_SAIDA)
+    try:
+        # Executa a função
+        if args.observar:
+            observar_pasta(
+                args.entrada, args.saida,
+                num_processos=args.processos,
+                paginas_em_paralelo=args.paginas_em_paralelo,
+                dedup_conteudo=args.dedup_conteudo,
+                cache=cache,
+                intervalo=args.intervalo,
+                tamanho_fila=args.fila,
+                metricas=metricas,
+                opcoes_extracao=opcoes_extracao,
+                subpastas=args.subpastas,
+                catalogo=args.catalogo,
+            )
+        else:
+            extrair_imagens_de_pdfs(
+                args.entrada, args.saida,
+                num_processos=args.processos,
+                paginas_em_paralelo=args.paginas_em_paralelo,
+                dedup_conteudo=args.dedup_conteudo,
+                cache=cache,
+                incremental=not args.completo,
+                metricas=metricas,
+                opcoes_extracao=opcoes_extracao,
+                subpastas=args.subpastas,
+                catalogo=args.catalogo,
+            )
+    finally:
+        if metricas is not None and metricas is not sys.stderr:
+            metricas.close()
 
-print("Processo de extração finalizado.")
\ No newline at end of file
+    print("Processo de extração finalizado.")
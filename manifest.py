@@ -0,0 +1,132 @@
+"""Manifesto das execuções em lote do main.py, para reprocessar só o que mudou."""
+import json
+import os
+import tempfile
+
+from cache import pdf_digest
+
+# Nome do arquivo do manifesto dentro da pasta de saída
+MANIFEST_NAME = ".manifesto.jsonl"
+
+
+class BatchManifest:
+    """
+    Registro, na pasta de saída, dos PDFs já processados: tamanho, data de
+    modificação e hash de cada origem, as opções usadas e as imagens geradas.
+
+    É um diário JSON Lines: cada PDF concluído acrescenta uma linha, de modo
+    que uma execução interrompida retoma a partir do último PDF registrado.
+    `compact` reescreve o arquivo apenas com o estado atual.
+
+    Com `catalog` (`ImageCatalog`), os detalhes das imagens de cada PDF
+    registrado também vão para o catálogo SQLite, que acompanha o manifesto:
+    PDFs esquecidos saem dele, e PDFs ausentes do catálogo são reprocessados.
+    """
+
+    def __init__(self, pasta_saida: str, opcoes: dict, catalog=None):
+        self.path = os.path.join(pasta_saida, MANIFEST_NAME)
+        self.opcoes = opcoes
+        self.entries = {}  # nome do PDF -> registro
+        self.options_changed = False
+        self.catalog = catalog
+        self._fp = None
+        self._load()
+        if catalog is not None:
+            catalog.retain(self.entries)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        opcoes_gravadas = None
+        with open(self.path, encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    # Linha incompleta de uma execução interrompida
+                    continue
+                tipo = registro.get("tipo")
+                if tipo == "opcoes":
+                    opcoes_gravadas = registro["opcoes"]
+                elif tipo == "pdf":
+                    self.entries[registro["nome"]] = registro
+                elif tipo == "removido":
+                    self.entries.pop(registro["nome"], None)
+        self.options_changed = opcoes_gravadas != self.opcoes
+
+    def is_unchanged(self, nome: str, caminho: str) -> bool:
+        """Indica se o PDF já foi processado com as opções atuais e não mudou desde então."""
+        entrada = self.entries.get(nome)
+        if self.options_changed or entrada is None:
+            return False
+        if self.catalog is not None and not self.catalog.has_pdf(nome):
+            # Processado antes de o catálogo ser ativado
+            return False
+        info = os.stat(caminho)
+        if info.st_size != entrada["size"]:
+            return False
+        if info.st_mtime == entrada["mtime"]:
+            return True
+        # Só a data mudou (ex.: arquivo copiado de novo): confere o conteúdo
+        if pdf_digest(caminho) != entrada["sha256"]:
+            return False
+        self.record(nome, size=info.st_size, mtime=info.st_mtime, sha256=entrada["sha256"],
+                    imagens=entrada["imagens"], duplicatas=entrada["duplicatas"])
+        return True
+
+    def _append(self, registro: dict) -> None:
+        if self._fp is None:
+            self._fp = open(self.path, "a", encoding="utf-8")
+            if self._fp.tell() == 0 or self.options_changed:
+                self._fp.write(json.dumps({"tipo": "opcoes", "opcoes": self.opcoes}) + "\n")
+                self.options_changed = False
+        self._fp.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._fp.flush()
+
+    def record(self, nome: str, *, size: int, mtime: float, sha256: str, imagens: dict, duplicatas: dict,
+               detalhes=None) -> None:
+        """
+        Registra um PDF concluído: `imagens` mapeia nome -> hash, `duplicatas`
+        ignorada -> mantida. `detalhes` (pares imagem, bytes gravados) vai
+        para o catálogo, se houver.
+        """
+        registro = {
+            "tipo": "pdf", "nome": nome, "size": size, "mtime": mtime, "sha256": sha256,
+            "imagens": imagens, "duplicatas": duplicatas,
+        }
+        self._append(registro)
+        self.entries[nome] = registro
+        if self.catalog is not None and detalhes is not None:
+            self.catalog.record_pdf(nome, sha256, detalhes)
+
+    def forget(self, nome: str) -> None:
+        """Retira um PDF do manifesto (removido da pasta ou a ser reprocessado)."""
+        if nome in self.entries:
+            self._append({"tipo": "removido", "nome": nome})
+            del self.entries[nome]
+        if self.catalog is not None:
+            self.catalog.forget_pdf(nome)
+
+    def duplicates(self) -> dict:
+        """Mapa ocorrência ignorada -> imagem mantida de todos os PDFs registrados."""
+        mapa = {}
+        for entrada in self.entries.values():
+            mapa.update(entrada["duplicatas"])
+        return mapa
+
+    def compact(self) -> None:
+        """Reescreve o manifesto só com as opções e o estado atual de cada PDF."""
+        self.close()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"tipo": "opcoes", "opcoes": self.opcoes}) + "\n")
+            for nome in sorted(self.entries):
+                f.write(json.dumps(self.entries[nome], ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self.options_changed = False
+
+    def close(self) -> None:
+        """Fecha o diário (reaberto na próxima gravação); o catálogo continua aberto."""
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
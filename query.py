@@ -0,0 +1,114 @@
+"""
+Consulta e exportação do catálogo de imagens (`--catalogo` do main.py), sem
+percorrer a pasta de saída.
+
+    python query.py --saida PASTA_DE_SAIDA --pdf relatorio.pdf
+    python query.py --saida PASTA_DE_SAIDA --mesmo-conteudo foto.png --exportar jsonl
+    python query.py --saida PASTA_DE_SAIDA --largura-min 1000 --formato jpeg --copiar-para selecionadas
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+
+from catalog import CATALOG_NAME, COLUMNS, ImageCatalog
+from extractor import content_digest
+from main import PASTA_DE_SAIDA
+
+EXPORTACOES = ("tabela", "csv", "jsonl", "caminhos")
+
+
+def _exportar(linhas, formato, destino, pasta_saida):
+    """Escreve as linhas selecionadas em `destino` no formato escolhido e retorna quantas foram."""
+    total = 0
+    if formato == "csv":
+        escritor = csv.DictWriter(destino, fieldnames=COLUMNS)
+        escritor.writeheader()
+    for linha in linhas:
+        total += 1
+        if formato == "csv":
+            escritor.writerow(linha)
+        elif formato == "jsonl":
+            destino.write(json.dumps(linha, ensure_ascii=False) + "\n")
+        elif formato == "caminhos":
+            destino.write(os.path.join(pasta_saida, linha["caminho"]) + "\n")
+        else:
+            pagina = linha["pagina"] if linha["pagina"] is not None else "-"
+            extra = f" (repetida de {linha['duplicata_de']})" if linha["duplicata_de"] else ""
+            destino.write(
+                f"{linha['caminho']}\t{linha['pdf']}\tp. {pagina}\t{linha['largura']}x{linha['altura']}\t"
+                f"{linha['formato']}\t{linha['bytes']} B{extra}\n"
+            )
+    return total
+
+
+def _copiar(linhas, pasta_saida, pasta_destino):
+    """Copia as imagens selecionadas para `pasta_destino`, sem subpastas, e retorna quantas foram."""
+    os.makedirs(pasta_destino, exist_ok=True)
+    total = 0
+    for linha in linhas:
+        if linha["duplicata_de"]:
+            continue
+        origem = os.path.join(pasta_saida, linha["caminho"])
+        shutil.copy2(origem, os.path.join(pasta_destino, os.path.basename(linha["caminho"])))
+        total += 1
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta o catálogo de imagens extraídas pelo main.py.")
+    parser.add_argument("--saida", default=PASTA_DE_SAIDA, help="Pasta de saída do main.py (com o catálogo)")
+    parser.add_argument("--pdf", help="Só as imagens deste PDF (nome do arquivo)")
+    parser.add_argument("--sha256", help="Só as imagens com este hash de conteúdo")
+    parser.add_argument(
+        "--mesmo-conteudo", metavar="IMAGEM",
+        help="Só as imagens idênticas a este arquivo (ex.: em quais PDFs uma imagem aparece)",
+    )
+    parser.add_argument("--formato", help="Só as imagens neste formato (ex.: jpeg, png, jpx)")
+    parser.add_argument("--largura-min", type=int, default=0)
+    parser.add_argument("--altura-min", type=int, default=0)
+    parser.add_argument("--bytes-min", type=int, default=0)
+    parser.add_argument(
+        "--com-repetidas", action="store_true",
+        help="Inclui as ocorrências repetidas (deduplicação por conteúdo), que apontam para a imagem mantida",
+    )
+    parser.add_argument("--exportar", choices=EXPORTACOES, default="tabela", help="Formato da listagem")
+    parser.add_argument("--arquivo", help="Grava a listagem neste arquivo em vez da saída padrão")
+    parser.add_argument("--copiar-para", metavar="PASTA", help="Copia as imagens selecionadas para esta pasta")
+    args = parser.parse_args()
+
+    caminho_catalogo = os.path.join(args.saida, CATALOG_NAME)
+    if not os.path.exists(caminho_catalogo):
+        parser.error(f"catálogo não encontrado em {caminho_catalogo} (execute o main.py com --catalogo)")
+    sha256 = args.sha256
+    if args.mesmo_conteudo:
+        with open(args.mesmo_conteudo, "rb") as f:
+            sha256 = content_digest(f.read())
+
+    catalog = ImageCatalog(caminho_catalogo)
+    try:
+        def _linhas():
+            return catalog.query(
+                pdf=args.pdf, sha256=sha256, ext=args.formato, min_width=args.largura_min,
+                min_height=args.altura_min, min_bytes=args.bytes_min, include_duplicates=args.com_repetidas,
+            )
+
+        if args.copiar_para:
+            copiadas = _copiar(_linhas(), args.saida, args.copiar_para)
+            print(f"{copiadas} imagem(ns) copiada(s) para {args.copiar_para}", file=sys.stderr)
+            if args.exportar == "tabela" and not args.arquivo:
+                return
+        if args.arquivo:
+            with open(args.arquivo, "w", encoding="utf-8", newline="") as destino:
+                total = _exportar(_linhas(), args.exportar, destino, args.saida)
+        else:
+            total = _exportar(_linhas(), args.exportar, sys.stdout, args.saida)
+        print(f"{total} imagem(ns) selecionada(s)", file=sys.stderr)
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    main()
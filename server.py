@@ -0,0 +1,460 @@
+"""
+Serviço HTTP local de extração, sem interface, sobre o mesmo núcleo do app
+e do main.py.
+
+    python server.py --porta 8765
+
+    # PDF enviado no corpo da requisição, resposta em ZIP
+    curl --data-binary @doc.pdf "http://127.0.0.1:8765/extrair?nome=doc.pdf" -o imagens.zip
+    # PDF da pasta --raiz, resposta em NDJSON (uma linha por imagem, em base64)
+    curl "http://127.0.0.1:8765/extrair?caminho=doc.pdf&resposta=ndjson&formato=png"
+
+As imagens são enviadas à medida que são extraídas (transferência em
+pedaços). Cada extração roda em um processo próprio (o PyMuPDF não suporta
+várias threads no mesmo processo); acima de `--max-jobs` extrações
+simultâneas, novas requisições recebem 503, e PDFs enviados no corpo acima
+de `--max-mb` recebem 413.
+"""
+import argparse
+import base64
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+from cache import ExtractionCache, iter_images_cached
+from export import iter_zip_chunks
+from extractor import BALANCED, DUPLICATE, ENCODE_PROFILES, ImageFilter, open_document, parse_pages_input
+from jobs import PROCESS_CONTEXT, join_or_kill, worker_process
+from main import PASTA_DOS_PDFS, VARREDURAS, abrir_cache, adicionar_opcoes_de_cache
+from stats import ExtractionStats
+
+RESPOSTAS = {"zip": "application/zip", "ndjson": "application/x-ndjson"}
+FORMATOS = ("auto", "png", "jpeg")
+# Tamanho dos blocos lidos do corpo da requisição ao gravá-lo em disco
+BLOCO = 1024 * 1024
+# Tamanho máximo (MB) do PDF enviado no corpo; acima disso, 413
+MAX_MB = 512
+# Do corpo acima do limite, no máximo isto é lido (e descartado) antes do 413
+DESCARTE_MAX = 64 * 1024 * 1024
+
+
+class ErroDeRequisicao(Exception):
+    """Requisição inválida; `status` é o código HTTP da resposta."""
+
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _inteiro(params, nome, padrao, minimo=0):
+    try:
+        valor = int(params.get(nome, [padrao])[0])
+    except ValueError:
+        raise ErroDeRequisicao(400, f"'{nome}' deve ser um número inteiro")
+    if valor < minimo:
+        raise ErroDeRequisicao(400, f"'{nome}' deve ser no mínimo {minimo}")
+    return valor
+
+
+def _booleano(params, nome, padrao):
+    valor = params.get(nome, [None])[0]
+    if valor is None:
+        return padrao
+    return valor.lower() in ("1", "true", "sim", "s", "yes")
+
+
+def _escolha(params, nome, padrao, validas):
+    valor = params.get(nome, [padrao])[0]
+    if valor not in validas:
+        raise ErroDeRequisicao(400, f"'{nome}' deve ser um de: {', '.join(validas)}")
+    return valor
+
+
+def _nome_seguro(nome: str) -> str:
+    """
+    Nome de arquivo informado pelo cliente sem pastas, caracteres de controle,
+    aspas e barras invertidas (vai para os nomes das imagens e para os cabeçalhos).
+    """
+    nome = os.path.basename(nome.replace("\\", "/"))
+    nome = "".join(c for c in nome if c.isprintable() and c not in '"\\')
+    return nome.strip() or "documento.pdf"
+
+
+def _content_disposition(nome_arquivo: str) -> str:
+    """Cabeçalho de anexo com o nome em ASCII e, para os demais caracteres, em `filename*` (RFC 5987)."""
+    ascii_ = nome_arquivo.encode("ascii", "replace").decode("ascii").replace("?", "_")
+    return f"attachment; filename=\"{ascii_}\"; filename*=UTF-8''{quote(nome_arquivo, safe='')}"
+
+
+def ler_opcoes(params) -> dict:
+    """
+    Converte os parâmetros da URL nas opções da extração. Os nomes seguem a
+    barra lateral do app e as opções do main.py: formato, qualidade, dedup,
+    dedup_conteudo, paginas ("1-3,5"), perfil, varredura e os filtros
+    (largura_min, altura_min, area_min, ignorar_mascaras, espacos_de_cor,
+    max_por_pagina).
+    """
+    espacos = params.get("espacos_de_cor", [""])[0]
+    filtro = ImageFilter(
+        min_width=_inteiro(params, "largura_min", 0),
+        min_height=_inteiro(params, "altura_min", 0),
+        min_area=_inteiro(params, "area_min", 0),
+        skip_masks=_booleano(params, "ignorar_mascaras", False),
+        colorspaces=frozenset(c.strip() for c in espacos.split(",") if c.strip()) or None,
+        max_per_page=_inteiro(params, "max_por_pagina", 0),
+    )
+    opcoes = {
+        "output_format": _escolha(params, "formato", "auto", FORMATOS),
+        "jpeg_quality": _inteiro(params, "qualidade", 95, minimo=1),
+        "deduplicate": _booleano(params, "dedup", True),
+        "encode_profile": _escolha(params, "perfil", BALANCED, list(ENCODE_PROFILES)),
+        "image_filter": filtro if filtro.is_active() else None,
+        **VARREDURAS[_escolha(params, "varredura", "paginas", list(VARREDURAS))],
+    }
+    if opcoes["jpeg_quality"] > 100:
+        raise ErroDeRequisicao(400, "'qualidade' deve ser no máximo 100")
+    return opcoes
+
+
+@worker_process
+def _extrair_em_processo(conn, caminho_pdf, nome_base, paginas, dedup_conteudo, cache, opcoes):
+    """
+    Processo de uma extração: envia pela `conn` cada imagem produzida e, ao
+    fim, ("fim", métricas) ou ("erro", mensagem). O envio bloqueia enquanto
+    o cliente não consome, limitando a memória ao que está em trânsito.
+    """
+    stats = ExtractionStats()
+    doc = None
+    try:
+        page_indices = None
+        if paginas:
+            # A seleção depende do total de páginas; o mesmo handle segue para a extração
+            with stats.stage("abrir"):
+                doc = open_document(caminho_pdf)
+            page_indices = parse_pages_input(paginas, len(doc))
+        # Sem seleção, o PDF só é aberto se não estiver no cache
+        for img in iter_images_cached(
+            caminho_pdf if doc is None else doc,
+            cache=cache,
+            nome_base=nome_base,
+            page_indices=page_indices,
+            content_index={} if dedup_conteudo else None,
+            stats=stats,
+            **opcoes,
+        ):
+            conn.send(("imagem", img))
+        conn.send(("fim", stats.as_dict()))
+    except Exception as e:
+        conn.send(("erro", str(e)))
+    finally:
+        if doc is not None:
+            doc.close()
+        conn.close()
+
+
+def _linha_ndjson(tipo: str, img=None, **campos) -> bytes:
+    registro = {"tipo": tipo}
+    if img is not None:
+        registro.update({
+            "nome": img.name,
+            "pagina": img.page + 1 if img.page >= 0 else None,
+            "xref": img.xref,
+            "formato": img.ext,
+            "metodo": img.method,
+        })
+        if img.method == DUPLICATE:
+            registro["duplicata_de"] = img.duplicate_of
+        else:
+            registro["tamanho"] = len(img.data)
+            registro["dados"] = base64.b64encode(img.data).decode("ascii")
+    registro.update(campos)
+    return (json.dumps(registro, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class ServidorDeExtracao(ThreadingHTTPServer):
+    """Servidor HTTP com uma thread por requisição e um limite de extrações simultâneas."""
+
+    daemon_threads = True
+
+    def __init__(
+        self, endereco, *, raiz: str, max_jobs: int = 2, cache: ExtractionCache | None = None,
+        max_bytes: int = MAX_MB * 1024 * 1024,
+    ):
+        super().__init__(endereco, RequisicaoDeExtracao)
+        self.raiz = os.path.realpath(raiz)
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        self.cache = cache
+        self.vagas = threading.BoundedSemaphore(max_jobs)
+        self.em_andamento = 0
+        self._lock = threading.Lock()
+
+    def iniciar_extracao(self, caminho_pdf, nome_base, paginas, dedup_conteudo, opcoes):
+        """Inicia o processo da extração e devolve (processo, conexão de leitura)."""
+        leitura, escrita = PROCESS_CONTEXT.Pipe(duplex=False)
+        processo = PROCESS_CONTEXT.Process(
+            target=_extrair_em_processo,
+            args=(escrita, caminho_pdf, nome_base, paginas, dedup_conteudo, self.cache, opcoes),
+            daemon=True,
+        )
+        processo.start()
+        # A ponta de escrita fica só com o filho: o fim do processo encerra a leitura
+        escrita.close()
+        return processo, leitura
+
+
+class RequisicaoDeExtracao(BaseHTTPRequestHandler):
+    """
+    GET /saude: extrações em andamento e limite.
+    GET /extrair?caminho=...: extrai um PDF da pasta raiz do servidor.
+    POST /extrair: extrai o PDF enviado no corpo (`nome` dá o nome base).
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "extractIMG"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/saude":
+            self._responder_json(200, {"em_andamento": self.server.em_andamento, "limite": self.server.max_jobs})
+        elif url.path == "/extrair":
+            self._extrair(parse_qs(url.query), corpo=False)
+        else:
+            self._responder_json(404, {"erro": "caminho desconhecido"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path == "/extrair":
+            self._extrair(parse_qs(url.query), corpo=True)
+        else:
+            self._responder_json(404, {"erro": "caminho desconhecido"})
+
+    def _responder_json(self, status: int, dados: dict, cabecalhos=None):
+        corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _caminho_na_raiz(self, caminho: str) -> str:
+        """Resolve `caminho` dentro da pasta raiz; recusa caminhos fora dela."""
+        raiz = self.server.raiz
+        completo = os.path.realpath(os.path.join(raiz, caminho))
+        if os.path.commonpath([raiz, completo]) != raiz:
+            raise ErroDeRequisicao(403, "caminho fora da pasta raiz do servidor")
+        if not os.path.isfile(completo):
+            raise ErroDeRequisicao(404, f"arquivo não encontrado: {caminho}")
+        return completo
+
+    def _tamanho_do_corpo(self) -> int:
+        """Content-Length do PDF enviado, dentro do limite do servidor."""
+        try:
+            tamanho = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            raise ErroDeRequisicao(411, "informe o Content-Length com o tamanho do PDF")
+        if tamanho <= 0:
+            raise ErroDeRequisicao(400, "corpo vazio: envie o PDF ou use 'caminho'")
+        if tamanho > self.server.max_bytes:
+            raise ErroDeRequisicao(413, f"PDF maior que o limite de {self.server.max_bytes // (1024 * 1024)} MB")
+        return tamanho
+
+    def handle_expect_100(self):
+        # Com "Expect: 100-continue" (o curl envia para corpos grandes), um
+        # PDF acima do limite é recusado antes de o cliente enviá-lo
+        if self.command == "POST":
+            try:
+                self._tamanho_do_corpo()
+            except ErroDeRequisicao as e:
+                if e.status == 413:
+                    self.close_connection = True
+                    self._responder_json(e.status, {"erro": str(e)})
+                    return False
+        return super().handle_expect_100()
+
+    def _descartar_corpo(self):
+        """Lê e descarta (sem gravar) até DESCARTE_MAX bytes do corpo recusado,
+        para o cliente que já o está enviando conseguir ler a resposta."""
+        try:
+            restante = min(int(self.headers.get("Content-Length", "0")), DESCARTE_MAX)
+        except ValueError:
+            return
+        while restante > 0:
+            bloco = self.rfile.read(min(BLOCO, restante))
+            if not bloco:
+                return
+            restante -= len(bloco)
+
+    def _receber_corpo(self) -> str:
+        """Grava o corpo da requisição em um arquivo temporário, em blocos, e retorna o caminho."""
+        try:
+            restante = self._tamanho_do_corpo()
+        except ErroDeRequisicao as e:
+            if e.status == 413:
+                self._descartar_corpo()
+            raise
+        fd, caminho = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while restante:
+                    bloco = self.rfile.read(min(BLOCO, restante))
+                    if not bloco:
+                        raise ErroDeRequisicao(400, "corpo da requisição incompleto")
+                    f.write(bloco)
+                    restante -= len(bloco)
+        except BaseException:
+            os.remove(caminho)
+            raise
+        return caminho
+
+    def _extrair(self, params, corpo: bool):
+        temporario = None
+        try:
+            resposta = _escolha(params, "resposta", "zip", list(RESPOSTAS))
+            opcoes = ler_opcoes(params)
+            if corpo:
+                nome = _nome_seguro(params.get("nome", ["documento.pdf"])[0])
+            else:
+                if "caminho" not in params:
+                    raise ErroDeRequisicao(400, "informe 'caminho' ou envie o PDF com POST")
+                nome = _nome_seguro(params["caminho"][0])
+                caminho_pdf = self._caminho_na_raiz(params["caminho"][0])
+            if not self.server.vagas.acquire(blocking=False):
+                raise ErroDeRequisicao(503, f"limite de {self.server.max_jobs} extrações simultâneas atingido")
+        except ErroDeRequisicao as e:
+            cabecalhos = {"Retry-After": "5"} if e.status == 503 else None
+            self.close_connection = True
+            self._responder_json(e.status, {"erro": str(e)}, cabecalhos)
+            return
+
+        processo = None
+        try:
+            if corpo:
+                try:
+                    temporario = caminho_pdf = self._receber_corpo()
+                except ErroDeRequisicao as e:
+                    self.close_connection = True
+                    self._responder_json(e.status, {"erro": str(e)})
+                    return
+            with self.server._lock:
+                self.server.em_andamento += 1
+            nome_base = nome[:-4] if nome.lower().endswith(".pdf") else nome
+            processo, conn = self.server.iniciar_extracao(
+                caminho_pdf, nome_base, params.get("paginas", [""])[0],
+                _booleano(params, "dedup_conteudo", False), opcoes,
+            )
+            self._transmitir(resposta, nome_base, conn)
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente desconectou: a extração é interrompida abaixo
+            pass
+        finally:
+            if processo is not None:
+                processo.terminate()
+                join_or_kill(processo)
+                with self.server._lock:
+                    self.server.em_andamento -= 1
+            if temporario is not None:
+                os.remove(temporario)
+            self.server.vagas.release()
+
+    def _mensagens(self, conn):
+        """Gera as mensagens do processo da extração até o fim (ou o fim inesperado do processo)."""
+        while True:
+            try:
+                mensagem = conn.recv()
+            except EOFError:
+                yield "erro", "o processo da extração terminou inesperadamente"
+                return
+            yield mensagem
+            if mensagem[0] != "imagem":
+                return
+
+    def _transmitir(self, resposta: str, nome_base: str, conn):
+        self.send_response(200)
+        self.send_header("Content-Type", RESPOSTAS[resposta])
+        if resposta == "zip":
+            self.send_header("Content-Disposition", _content_disposition(f"{nome_base}_imagens.zip"))
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        if resposta == "ndjson":
+            for tipo, valor in self._mensagens(conn):
+                if tipo == "imagem":
+                    self._enviar_pedaco(_linha_ndjson("duplicata" if valor.method == DUPLICATE else "imagem", valor))
+                elif tipo == "fim":
+                    self._enviar_pedaco(_linha_ndjson("fim", metricas=valor))
+                else:
+                    self._enviar_pedaco(_linha_ndjson("erro", mensagem=valor))
+            self._enviar_pedaco(b"")
+            return
+
+        erro = []
+        duplicatas = {}
+
+        def _itens():
+            for tipo, valor in self._mensagens(conn):
+                if tipo == "imagem":
+                    if valor.method == DUPLICATE:
+                        duplicatas[valor.name] = valor.duplicate_of
+                    else:
+                        yield valor.name, valor.data
+                elif tipo == "erro":
+                    erro.append(valor)
+                    return
+            if duplicatas:
+                yield "duplicatas.json", json.dumps(duplicatas, indent=2, ensure_ascii=False).encode("utf-8")
+
+        for pedaco in iter_zip_chunks(_itens()):
+            if erro:
+                break
+            self._enviar_pedaco(pedaco)
+        if erro:
+            # Sem o pedaço final, o cliente percebe a resposta incompleta
+            self.log_error("extração interrompida: %s", erro[0])
+            return
+        self._enviar_pedaco(b"")
+
+    def _enviar_pedaco(self, dados: bytes):
+        self.wfile.write(f"{len(dados):X}\r\n".encode("ascii") + dados + b"\r\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP local de extração de imagens de PDFs.")
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço de escuta (padrão: só esta máquina)")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--raiz", default=PASTA_DOS_PDFS, help="Pasta de onde 'caminho' pode ler PDFs")
+    parser.add_argument(
+        "--max-jobs", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+        help="Extrações simultâneas; acima disso, a resposta é 503",
+    )
+    parser.add_argument(
+        "--max-mb", type=int, default=MAX_MB,
+        help="Tamanho máximo do PDF enviado no corpo, em MB; acima disso, a resposta é 413",
+    )
+    adicionar_opcoes_de_cache(parser)
+    args = parser.parse_args()
+
+    cache = abrir_cache(parser, args)
+    servidor = ServidorDeExtracao(
+        (args.host, args.porta), raiz=args.raiz, max_jobs=max(1, args.max_jobs), cache=cache,
+        max_bytes=max(1, args.max_mb) * 1024 * 1024,
+    )
+    print(f"Servindo em http://{args.host}:{args.porta} (raiz: {servidor.raiz}, até {servidor.max_jobs} extrações)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("Encerrando...")
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Métricas de desempenho da extração: tempo e bytes por etapa e contadores."""
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Etapas medidas, na ordem em que acontecem
+STAGE_LABELS = {
+    "leitura": "leitura do PDF",
+    "hash_pdf": "hash do PDF",
+    "abrir": "abrir documento (fitz.open)",
+    "listar": "listar imagens (page.get_images)",
+    "extrair": "extrair imagem (doc.extract_image)",
+    "hash": "hash do conteúdo",
+    "converter": "conversão (PIL)",
+    "gravar": "gravação em disco",
+    "miniaturas": "miniaturas da prévia",
+    "zip": "montagem do ZIP",
+}
+
+
+class ExtractionStats:
+    """
+    Acumula, por etapa, o tempo gasto (segundos) e os bytes produzidos, além
+    de contadores livres (páginas, repetições, métodos de conversão...).
+    Pode ser enviado entre processos e somado a outro com `merge`; com
+    páginas divididas entre processos, os tempos das faixas são somados.
+    """
+
+    def __init__(self):
+        self.seconds = Counter()
+        self.bytes = Counter()
+        self.counts = Counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mede o tempo do bloco e o soma à etapa `name`."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - inicio
+
+    def add_seconds(self, name: str, seconds: float) -> None:
+        """Soma um tempo medido fora de `stage` (ex.: em outra thread)."""
+        self.seconds[name] += seconds
+
+    def add_bytes(self, name: str, n: int) -> None:
+        self.bytes[name] += n
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counts[name] += n
+
+    def merge(self, other: "ExtractionStats") -> None:
+        self.seconds.update(other.seconds)
+        self.bytes.update(other.bytes)
+        self.counts.update(other.counts)
+
+    def total_seconds(self) -> float:
+        return sum(self.seconds.values())
+
+    def as_dict(self) -> dict:
+        """Representação serializável em JSON (etapas na ordem de `STAGE_LABELS`)."""
+        ordem = {nome: i for i, nome in enumerate(STAGE_LABELS)}
+        etapas = sorted(self.seconds, key=lambda n: ordem.get(n, len(ordem)))
+        return {
+            "segundos": {n: round(self.seconds[n], 6) for n in etapas},
+            "bytes": {n: self.bytes[n] for n in etapas if self.bytes[n]},
+            "contagens": dict(sorted(self.counts.items())),
+        }
@@ -0,0 +1,139 @@
+"""Armazenamento em disco das imagens extraídas, por sessão do app."""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+
+# Prefixo das pastas de sessão (permite reconhecer e limpar as abandonadas)
+SESSION_PREFIX = "sessao_"
+
+
+class StoreFullError(Exception):
+    """O limite de bytes do armazenamento da sessão foi atingido."""
+
+
+def _remove_directory(directory: str) -> None:
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def sweep_stale_sessions(root: str, max_age: float) -> int:
+    """
+    Apaga as pastas de sessão em `root` sem uso há mais de `max_age`
+    segundos (sessões de um servidor encerrado sem limpeza). Retorna quantas.
+    """
+    try:
+        nomes = os.listdir(root)
+    except FileNotFoundError:
+        return 0
+    limite = time.time() - max_age
+    removidas = 0
+    for nome in nomes:
+        caminho = os.path.join(root, nome)
+        if not nome.startswith(SESSION_PREFIX) or not os.path.isdir(caminho):
+            continue
+        try:
+            if os.path.getmtime(caminho) < limite:
+                _remove_directory(caminho)
+                removidas += 1
+        except OSError:
+            pass
+    return removidas
+
+
+class ImageStore:
+    """
+    Guarda o conteúdo das imagens de uma sessão em uma pasta temporária
+    própria, um arquivo por imagem; a sessão guarda só as chaves
+    ("arquivo.pdf:nome_imagem") e lê os bytes quando precisa (prévia, ZIP).
+    `put` recusa gravações que passariam de `max_bytes` com `StoreFullError`.
+    A pasta é apagada por `close`, quando o objeto deixa de ser referenciado
+    (fim da sessão) ou ao encerrar o interpretador.
+    Uma thread pode gravar enquanto outra lê.
+    """
+
+    def __init__(self, root: str | None = None, max_bytes: int = 1024 * 1024 * 1024):
+        if root is not None:
+            os.makedirs(root, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix=SESSION_PREFIX, dir=root)
+        self.max_bytes = max_bytes
+        self._files = {}  # chave -> (caminho, tamanho)
+        self._used = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._finalizer = weakref.finalize(self, _remove_directory, self.directory)
+
+    @property
+    def used_bytes(self) -> int:
+        return self._used
+
+    @property
+    def closed(self) -> bool:
+        return not self._finalizer.alive
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._files
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def put(self, key: str, data: bytes) -> None:
+        """Grava `data` sob `key` (substituindo o conteúdo anterior, se houver)."""
+        with self._lock:
+            if self.closed:
+                raise ValueError("armazenamento da sessão já foi encerrado")
+            anterior = self._files.get(key)
+            liberado = anterior[1] if anterior else 0
+            if self._used - liberado + len(data) > self.max_bytes:
+                raise StoreFullError(
+                    f"limite de {self.max_bytes // (1024 * 1024)} MB de imagens por sessão atingido"
+                )
+            # Nomes sequenciais: as chaves trazem nomes de PDFs arbitrários
+            self._seq += 1
+            caminho = os.path.join(self.directory, f"{self._seq:08d}.img")
+        with open(caminho, "wb") as f:
+            f.write(data)
+        with self._lock:
+            if self.closed:
+                return
+            self._files[key] = (caminho, len(data))
+            self._used += len(data) - liberado
+        if anterior:
+            self._unlink(anterior[0])
+
+    def get(self, key: str) -> bytes:
+        """Conteúdo guardado sob `key` (KeyError se não houver)."""
+        caminho, _ = self._files[key]
+        with open(caminho, "rb") as f:
+            return f.read()
+
+    def size(self, key: str) -> int:
+        return self._files[key][1]
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            entrada = self._files.pop(key, None)
+            if entrada:
+                self._used -= entrada[1]
+        if entrada:
+            self._unlink(entrada[0])
+
+    def discard_prefix(self, prefix: str) -> None:
+        """Remove todas as imagens cujas chaves começam com `prefix` (ex.: as de um PDF)."""
+        for key in [k for k in list(self._files) if k.startswith(prefix)]:
+            self.discard(key)
+
+    def close(self) -> None:
+        """Apaga a pasta da sessão; gravações posteriores falham."""
+        with self._lock:
+            self._files.clear()
+            self._used = 0
+            self._finalizer()
+
+    @staticmethod
+    def _unlink(caminho: str) -> None:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
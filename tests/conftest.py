@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import gerar_corpus  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory):
+    """Pasta com alguns PDFs pequenos, com imagens repetidas dentro e entre eles."""
+    pasta = tmp_path_factory.mktemp("corpus")
+    gerar_corpus(str(pasta), pdfs=3, paginas=3, imagens_por_pagina=3, tamanho=120, duplicacao=0.4, semente=7)
+    return pasta
+
+
+@pytest.fixture(scope="session")
+def pdf_grande(tmp_path_factory):
+    """PDF de 150 páginas, para interromper uma extração no meio."""
+    pasta = tmp_path_factory.mktemp("grande")
+    gerar_corpus(str(pasta), pdfs=1, paginas=150, imagens_por_pagina=4, tamanho=200, duplicacao=0.0, semente=3)
+    return pasta / "bench_000.pdf"
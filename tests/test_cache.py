@@ -0,0 +1,128 @@
+import argparse
+import os
+import stat
+import time
+
+import pytest
+
+import cache as cache_mod
+from cache import STALE_TMP_SECONDS, ExtractionCache, iter_images_cached
+from jobs import CANCELLED, ExtractionJob
+from main import abrir_cache, adicionar_opcoes_de_cache
+from stats import ExtractionStats
+from store import ImageStore
+
+posix = pytest.mark.skipif(not hasattr(os, "getuid"), reason="permissões POSIX")
+
+
+@posix
+def test_pasta_nova_e_privada(tmp_path):
+    pasta = tmp_path / "cache"
+    ExtractionCache(str(pasta))
+    assert stat.S_IMODE(os.stat(pasta).st_mode) == 0o700
+
+
+@posix
+def test_pasta_existente_do_usuario_fica_privada(tmp_path):
+    pasta = tmp_path / "cache"
+    pasta.mkdir(mode=0o777)
+    os.chmod(pasta, 0o777)
+    ExtractionCache(str(pasta))
+    assert stat.S_IMODE(os.stat(pasta).st_mode) == 0o700
+
+
+@posix
+def test_link_simbolico_e_recusado(tmp_path):
+    (tmp_path / "outra").mkdir()
+    os.symlink(tmp_path / "outra", tmp_path / "cache")
+    with pytest.raises(PermissionError):
+        ExtractionCache(str(tmp_path / "cache"))
+
+
+@pytest.mark.skipif(not hasattr(os, "geteuid") or os.geteuid() != 0, reason="requer root para trocar o dono")
+def test_pasta_de_outro_usuario_e_recusada(tmp_path):
+    pasta = tmp_path / "cache"
+    pasta.mkdir()
+    os.chown(pasta, 65534, 65534)
+    with pytest.raises(PermissionError):
+        ExtractionCache(str(pasta))
+
+
+def test_tmp_abandonado_e_apagado_e_o_recente_conta_no_limite(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=150)
+    antigo = tmp_path / "cache" / "antigo.tmp"
+    antigo.write_bytes(b"x" * 100)
+    os.utime(antigo, (time.time() - STALE_TMP_SECONDS - 1,) * 2)
+    recente = tmp_path / "cache" / "recente.tmp"
+    recente.write_bytes(b"x" * 100)
+    for chave in ("a", "b"):
+        list(cache.record(chave, [b"y" * 40]))
+    restantes = sorted(os.listdir(tmp_path / "cache"))
+    # 100 (.tmp em andamento) + 2 entradas passariam de 150: a mais antiga sai
+    assert "antigo.tmp" not in restantes
+    assert "recente.tmp" in restantes
+    assert restantes == ["b.pkl", "recente.tmp"]
+
+
+def _esperar(condicao, limite=60):
+    fim = time.monotonic() + limite
+    while not condicao():
+        assert time.monotonic() < fim, "tempo esgotado"
+        time.sleep(0.02)
+
+
+def test_limite_do_cache_descarta_a_entrada_usada_ha_mais_tempo(tmp_path):
+    parser = argparse.ArgumentParser()
+    adicionar_opcoes_de_cache(parser)
+    cache = abrir_cache(parser, parser.parse_args(["--cache", str(tmp_path / "cache"), "--cache-max-mb", "1"]))
+    assert cache.max_bytes == 1024 * 1024
+    agora = time.time()
+    # Duas entradas de ~400 KB cabem no limite de 1 MB; a terceira não
+    for idade, chave in ((20, "a"), (10, "b")):
+        list(cache.record(chave, [os.urandom(400 * 1024)]))
+        os.utime(cache._path(chave), (agora - idade,) * 2)
+    # "a" é a mais antiga, mas foi lida agora: "b" passa a ser a usada há mais tempo
+    assert len(list(cache.get("a"))) == 1
+    list(cache.record("c", [os.urandom(400 * 1024)]))
+    assert sorted(os.listdir(tmp_path / "cache")) == ["a.pkl", "c.pkl"]
+
+
+def test_acerto_no_cache_nao_reabre_o_pdf(corpus, tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    pdf = str(corpus / "bench_000.pdf")
+    aberturas = []
+    abrir = cache_mod.open_document
+    monkeypatch.setattr(cache_mod, "open_document", lambda source: aberturas.append(source) or abrir(source))
+
+    primeira = list(iter_images_cached(pdf, cache=cache, nome_base="doc"))
+    assert aberturas == [pdf]
+    stats = ExtractionStats()
+    segunda = list(iter_images_cached(pdf, cache=cache, nome_base="outro", stats=stats))
+    assert aberturas == [pdf]
+    assert stats.counts["cache_acertos"] == 1
+    assert [(i.page, i.index, i.data) for i in segunda] == [(i.page, i.index, i.data) for i in primeira]
+    assert all(i.name.startswith("outro_") for i in segunda)
+
+
+def test_iteracao_interrompida_nao_deixa_entrada_nem_tmp(corpus, tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    imagens = iter_images_cached(str(corpus / "bench_000.pdf"), cache=cache)
+    next(imagens)
+    imagens.close()
+    assert os.listdir(tmp_path / "cache") == []
+
+
+@pytest.mark.parametrize("shards", [1, 2])
+def test_job_cancelado_nao_deixa_entrada_nem_tmp(pdf_grande, tmp_path, shards):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    store = ImageStore(str(tmp_path / "store"))
+    try:
+        job = ExtractionJob([("grande.pdf", str(pdf_grande))], store, cache=cache, shards=shards).start()
+        _esperar(lambda: job.progress["grande.pdf"].images >= 5)
+        assert [n for n in os.listdir(tmp_path / "cache") if n.endswith(".tmp")]
+        job.cancel()
+        assert job.wait(30)
+        assert job.progress["grande.pdf"].status == CANCELLED
+        assert os.listdir(tmp_path / "cache") == []
+    finally:
+        store.close()
@@ -0,0 +1,86 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from export import compression_for, duplicates_for_export, iter_zip_chunks, write_zip_file
+
+ITENS = [
+    ("doc_p1_img1.jpeg", os.urandom(20_000)),
+    ("doc_p1_img2.png", os.urandom(5_000)),
+    ("doc_p2_img1.pam", b"P7\n" + b"\x00" * 50_000),
+    ("duplicatas.json", b'{"doc_p3_img1.png": "doc_p1_img2.png"}'),
+]
+
+
+def test_duplicatas_acompanham_as_imagens_do_zip():
+    por_pdf = {
+        "a.pdf": {"a_p2_img1.png": "a_p1_img1.png"},
+        "b.pdf": {"b_p1_img1.png": "a_p1_img1.png", "b_p1_img2.png": "a_p1_img2.png"},
+    }
+    tudo = {"a_p1_img1.png", "a_p1_img2.png"}
+    assert duplicates_for_export(por_pdf, tudo) == {
+        "a_p2_img1.png": "a_p1_img1.png",
+        "b_p1_img1.png": "a_p1_img1.png",
+        "b_p1_img2.png": "a_p1_img2.png",
+    }
+    # Imagem mantida removida: as repetições dela (de qualquer PDF) saem junto
+    assert duplicates_for_export(por_pdf, {"a_p1_img2.png"}) == {"b_p1_img2.png": "a_p1_img2.png"}
+    # PDF excluído: as repetições encontradas nele não vão para o ZIP
+    assert duplicates_for_export({"a.pdf": por_pdf["a.pdf"]}, tudo) == {"a_p2_img1.png": "a_p1_img1.png"}
+
+
+@pytest.mark.parametrize("nome, metodo", [
+    ("a.jpeg", zipfile.ZIP_STORED),
+    ("a.JPG", zipfile.ZIP_STORED),
+    ("a.png", zipfile.ZIP_STORED),
+    ("a.jp2", zipfile.ZIP_STORED),
+    ("a.jb2", zipfile.ZIP_STORED),
+    ("a.pam", zipfile.ZIP_DEFLATED),
+    ("a.tiff", zipfile.ZIP_DEFLATED),
+    ("duplicatas.json", zipfile.ZIP_DEFLATED),
+    ("sem_extensao", zipfile.ZIP_DEFLATED),
+])
+def test_compressao_por_formato(nome, metodo):
+    assert compression_for(nome) == metodo
+
+
+def _conferir_zip(arquivo):
+    with zipfile.ZipFile(arquivo) as zf:
+        assert zf.testzip() is None
+        assert [(i.filename, i.compress_type) for i in zf.infolist()] == [
+            (nome, compression_for(nome)) for nome, _ in ITENS
+        ]
+        assert {nome: zf.read(nome) for nome in zf.namelist()} == dict(ITENS)
+
+
+def test_zip_em_fluxo_le_uma_entrada_por_vez():
+    lidos = []
+
+    def _itens():
+        for item in ITENS:
+            lidos.append(item[0])
+            yield item
+
+    pedacos = []
+    for pedaco in iter_zip_chunks(_itens()):
+        # Cada pedaço sai antes de a próxima entrada ser pedida
+        pedacos.append((len(lidos), pedaco))
+    assert [n for n, _ in pedacos[:len(ITENS)]] == list(range(1, len(ITENS) + 1))
+    _conferir_zip(io.BytesIO(b"".join(p for _, p in pedacos)))
+
+
+def test_arquivo_zip_completo_ou_apagado_se_a_geracao_falhar(tmp_path):
+    caminho = write_zip_file(iter(ITENS), str(tmp_path))
+    assert os.path.dirname(caminho) == str(tmp_path)
+    _conferir_zip(caminho)
+    os.remove(caminho)
+
+    def _itens():
+        yield ITENS[0]
+        raise OSError("imagem indisponível")
+
+    with pytest.raises(OSError):
+        write_zip_file(_itens(), str(tmp_path))
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,56 @@
+import io
+
+import fitz
+import pytest
+from PIL import Image
+
+from extractor import ImageFilter, iter_images
+from stats import ExtractionStats
+
+
+def _png(cor, lado=40):
+    buf = io.BytesIO()
+    Image.new("RGB", (lado, lado), cor).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="module")
+def pdf_com_repeticoes():
+    """PDF de 4 páginas em que as mesmas imagens (mesmos xrefs) reaparecem em várias páginas."""
+    a, b, c, d = (_png(cor) for cor in ((255, 0, 0), (0, 255, 0), (0, 0, 255), (9, 9, 9)))
+    pequena = _png((128, 128, 128), lado=4)
+    doc = fitz.open()
+    for imagens in ([a, pequena, b], [a, c, b], [a, b, c, d], [d, pequena, c]):
+        page = doc.new_page()
+        for i, stream in enumerate(imagens):
+            page.insert_image(fitz.Rect(10, 10 + i * 100, 90, 90 + i * 100), stream=stream)
+    dados = doc.tobytes()
+    doc.close()
+    return dados
+
+
+def _extrair(pdf, **opcoes):
+    stats = ExtractionStats()
+    imagens = [(img.name, img.data) for img in iter_images(pdf, stats=stats, **opcoes)]
+    return imagens, stats.counts["filtradas"]
+
+
+@pytest.mark.parametrize("filtro", [
+    None,
+    ImageFilter(min_width=10),
+    ImageFilter(min_width=10, max_per_page=1),
+    ImageFilter(max_per_page=2),
+])
+@pytest.mark.parametrize("shards", [2, 3, 4])
+def test_faixas_iguais_a_execucao_serial(pdf_com_repeticoes, filtro, shards):
+    serial = _extrair(pdf_com_repeticoes, image_filter=filtro)
+    assert serial[0]
+    assert _extrair(pdf_com_repeticoes, image_filter=filtro, shards=shards) == serial
+
+
+@pytest.mark.parametrize("shards", [1, 3])
+def test_varredura_de_xrefs_igual_a_leitura_por_paginas(pdf_com_repeticoes, shards):
+    filtro = ImageFilter(min_width=10, max_per_page=1)
+    assert _extrair(pdf_com_repeticoes, image_filter=filtro, xref_scan=True, shards=shards) == _extrair(
+        pdf_com_repeticoes, image_filter=filtro,
+    )
@@ -0,0 +1,90 @@
+import io
+import os
+import time
+
+import pytest
+
+import jobs
+from jobs import CANCELLED, DONE, FAILED, ExtractionJob, ingest_upload
+from store import ImageStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ImageStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+def _esperar(condicao, limite=60):
+    fim = time.monotonic() + limite
+    while not condicao():
+        assert time.monotonic() < fim, "tempo esgotado"
+        time.sleep(0.02)
+
+
+def test_job_conclui_os_pdfs(corpus, store):
+    arquivos = [(p.name, p.read_bytes()) for p in sorted(corpus.glob("bench_*.pdf"))]
+    job = ExtractionJob(arquivos, store, thumbnailer=lambda dados: (dados[:8], "image/png")).start()
+    assert job.wait(60)
+    assert all(p.status == DONE for p in job.progress.values())
+    chaves = {f"{nome}:{img}" for nome, imgs in job.results.items() for img in imgs}
+    assert chaves and chaves == set(store._files) == set(job.thumbnails)
+
+
+def test_cancelamento_descarta_as_imagens_do_pdf_interrompido(pdf_grande, store):
+    miniaturas = []
+    job = ExtractionJob([("grande.pdf", str(pdf_grande))], store, thumbnailer=lambda d: miniaturas.append(1)).start()
+    _esperar(lambda: job.progress["grande.pdf"].images >= 5)
+    job.cancel()
+    assert job.wait(30)
+    assert job.progress["grande.pdf"].status == CANCELLED
+    assert "grande.pdf" not in job.results
+    assert len(store) == 0 and store.used_bytes == 0
+    assert job.thumbnails == {} and miniaturas
+
+
+def test_armazenamento_cheio_interrompe_so_o_pdf(pdf_grande, corpus, tmp_path):
+    store = ImageStore(str(tmp_path), max_bytes=200 * 1024)
+    try:
+        job = ExtractionJob(
+            [("grande.pdf", str(pdf_grande)), ("pequeno.pdf", str(corpus / "bench_000.pdf"))], store,
+        ).start()
+        assert job.wait(60)
+        grande = job.progress["grande.pdf"]
+        assert grande.status == FAILED and "limite" in grande.error
+        # O restante do PDF é pulado, e o job segue para o próximo
+        assert grande.images == len(job.results["grande.pdf"]) < 600
+        assert job.progress["pequeno.pdf"].status in (DONE, FAILED)
+        assert store.used_bytes <= store.max_bytes
+    finally:
+        store.close()
+
+
+class _Envio(io.BytesIO):
+    """Arquivo enviado, como o do `st.file_uploader`."""
+
+    def __init__(self, dados: bytes):
+        super().__init__(dados)
+        self.size = len(dados)
+
+
+def test_envio_grande_vai_para_o_disco_e_e_apagado_ao_fim(corpus, tmp_path, monkeypatch):
+    dados = (corpus / "bench_000.pdf").read_bytes()
+    assert ingest_upload(_Envio(dados), str(tmp_path)) == dados
+    monkeypatch.setattr(jobs, "UPLOAD_SPOOL_BYTES", len(dados) - 1)
+    envio = _Envio(dados)
+    envio.read()
+    caminho = ingest_upload(envio, str(tmp_path))
+    assert os.path.dirname(caminho) == str(tmp_path)
+    with open(caminho, "rb") as f:
+        assert f.read() == dados
+
+    store = ImageStore(str(tmp_path / "store"))
+    try:
+        job = ExtractionJob([("doc.pdf", caminho)], store, delete_sources=True).start()
+        assert job.wait(60)
+        assert job.progress["doc.pdf"].status == DONE and job.results["doc.pdf"]
+        assert not os.path.exists(caminho)
+    finally:
+        store.close()
@@ -0,0 +1,243 @@
+import json
+import os
+
+import pytest
+
+from main import extrair_imagens_de_pdfs
+
+
+def _conteudo(pasta):
+    """Arquivos de imagem da saída (caminho relativo -> bytes) e o mapa de repetições."""
+    arquivos = {}
+    for raiz, _, nomes in os.walk(pasta):
+        for nome in nomes:
+            if nome.startswith(".") or nome == "duplicatas.json":
+                continue
+            caminho = os.path.join(raiz, nome)
+            with open(caminho, "rb") as f:
+                arquivos[os.path.relpath(caminho, pasta)] = f.read()
+    duplicatas = {}
+    if os.path.exists(os.path.join(pasta, "duplicatas.json")):
+        with open(os.path.join(pasta, "duplicatas.json"), encoding="utf-8") as f:
+            duplicatas = json.load(f)
+    return arquivos, duplicatas
+
+
+@pytest.mark.parametrize("subpastas", [0, 1, 2])
+def test_sequencial_e_paralelo_geram_a_mesma_saida(corpus, tmp_path, subpastas):
+    saidas = {}
+    for processos in (1, 2):
+        pasta_saida = tmp_path / f"saida_{processos}"
+        extrair_imagens_de_pdfs(
+            str(corpus), str(pasta_saida), num_processos=processos, dedup_conteudo=True, subpastas=subpastas,
+        )
+        saidas[processos] = _conteudo(pasta_saida)
+
+    arquivos, duplicatas = saidas[1]
+    assert arquivos
+    assert duplicatas
+    assert saidas[2] == saidas[1]
+    # Toda repetição aponta para uma imagem gravada
+    assert set(duplicatas.values()) <= set(arquivos)
+
+
+def test_incremental_com_subpastas_nao_reprocessa(corpus, tmp_path, capsys):
+    pasta_saida = tmp_path / "saida"
+    for _ in range(2):
+        extrair_imagens_de_pdfs(str(corpus), str(pasta_saida), dedup_conteudo=True, subpastas=1)
+    assert "3 PDF(s) sem alterações" in capsys.readouterr().out
+
+
+def test_observar_pasta_sobrevive_a_arquivos_e_pastas_indisponiveis(corpus, tmp_path, monkeypatch, capsys):
+    import shutil
+
+    import main
+    from manifest import BatchManifest
+
+    pasta = tmp_path / "pdfs"
+    shutil.copytree(corpus, pasta)
+    pdf = pasta / "bench_000.pdf"
+    is_unchanged = BatchManifest.is_unchanged
+    chamadas = []
+
+    def _is_unchanged(self, nome, caminho):
+        if not varreduras:
+            # Lote inicial, antes da observação
+            return is_unchanged(self, nome, caminho)
+        chamadas.append(nome)
+        if len(chamadas) == 1:
+            raise PermissionError("arquivo bloqueado")
+        return is_unchanged(self, nome, caminho)
+
+    varreduras = []
+
+    def _sleep(segundos):
+        varreduras.append(segundos)
+        n = len(varreduras)
+        if n == 1:
+            # Só a data muda: vira candidato e é conferido pelo hash
+            os.utime(pdf, (os.stat(pdf).st_atime, os.stat(pdf).st_mtime + 10))
+        elif n == 4:
+            pasta.rename(tmp_path / "fora")
+        elif n == 5:
+            (tmp_path / "fora").rename(pasta)
+        elif n == 6:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(BatchManifest, "is_unchanged", _is_unchanged)
+    monkeypatch.setattr(main.time, "sleep", _sleep)
+    main.observar_pasta(str(pasta), str(tmp_path / "saida"), intervalo=0)
+
+    saida = capsys.readouterr().out
+    assert "Não foi possível ler bench_000.pdf: arquivo bloqueado" in saida
+    assert "Não foi possível listar" in saida
+    assert "Encerrando..." in saida
+    # Depois da falha, o PDF é conferido de novo e reconhecido como inalterado
+    assert chamadas == ["bench_000.pdf", "bench_000.pdf"]
+
+
+def test_pdf_removido_depois_da_listagem_so_falha_ele_no_modo_paralelo(corpus, tmp_path, monkeypatch, capsys):
+    import shutil
+
+    import main
+
+    pasta = tmp_path / "pdfs"
+    shutil.copytree(corpus, pasta)
+    preparar = main._preparar_incremental
+
+    def _preparar_e_remover(*args, **kwargs):
+        nomes = preparar(*args, **kwargs)
+        (pasta / "bench_001.pdf").unlink()
+        return nomes
+
+    monkeypatch.setattr(main, "_preparar_incremental", _preparar_e_remover)
+    extrair_imagens_de_pdfs(str(pasta), str(tmp_path / "saida"), num_processos=2)
+
+    saida = capsys.readouterr().out
+    assert "ERRO FATAL ao processar bench_001.pdf" in saida
+    arquivos, _ = _conteudo(tmp_path / "saida")
+    assert any(n.startswith("bench_000_") for n in arquivos)
+    assert any(n.startswith("bench_002_") for n in arquivos)
+
+
+def _contar_processados(monkeypatch):
+    """Passa a registrar, em ordem, os PDFs extraídos pelo `main`."""
+    import main
+
+    processados = []
+    processar = main._processar_pdf
+
+    def _processar(caminho_pdf, *args):
+        processados.append(os.path.basename(caminho_pdf))
+        return processar(caminho_pdf, *args)
+
+    monkeypatch.setattr(main, "_processar_pdf", _processar)
+    return processados
+
+
+def test_execucao_interrompida_retoma_depois_do_ultimo_pdf_concluido(corpus, tmp_path, monkeypatch):
+    import main
+    from manifest import MANIFEST_NAME
+
+    pasta_saida = tmp_path / "saida"
+    processar = main._processar_pdf
+
+    def _interromper(caminho_pdf, *args):
+        if caminho_pdf.endswith("bench_001.pdf"):
+            raise KeyboardInterrupt
+        return processar(caminho_pdf, *args)
+
+    monkeypatch.setattr(main, "_processar_pdf", _interromper)
+    with pytest.raises(KeyboardInterrupt):
+        extrair_imagens_de_pdfs(str(corpus), str(pasta_saida), dedup_conteudo=True)
+    # Linha cortada pelo fim abrupto do processo
+    with open(pasta_saida / MANIFEST_NAME, "a", encoding="utf-8") as f:
+        f.write('{"tipo": "pdf", "nome": "bench_0')
+
+    monkeypatch.setattr(main, "_processar_pdf", processar)
+    processados = _contar_processados(monkeypatch)
+    extrair_imagens_de_pdfs(str(corpus), str(pasta_saida), dedup_conteudo=True)
+    assert processados == ["bench_001.pdf", "bench_002.pdf"]
+
+    extrair_imagens_de_pdfs(str(corpus), str(tmp_path / "referencia"), dedup_conteudo=True)
+    assert _conteudo(pasta_saida) == _conteudo(tmp_path / "referencia")
+
+
+def test_opcoes_diferentes_refazem_toda_a_saida(corpus, tmp_path, monkeypatch):
+    pasta_saida = tmp_path / "saida"
+    extrair_imagens_de_pdfs(str(corpus), str(pasta_saida))
+
+    processados = _contar_processados(monkeypatch)
+    extrair_imagens_de_pdfs(str(corpus), str(pasta_saida), dedup_conteudo=True)
+    assert processados == ["bench_000.pdf", "bench_001.pdf", "bench_002.pdf"]
+
+    # As repetições gravadas na primeira execução não ficam para trás
+    extrair_imagens_de_pdfs(str(corpus), str(tmp_path / "referencia"), dedup_conteudo=True)
+    assert _conteudo(pasta_saida) == _conteudo(tmp_path / "referencia")
+
+
+def test_pdf_removido_apaga_as_imagens_e_reprocessa_quem_o_repetia(corpus, tmp_path, monkeypatch, capsys):
+    import shutil
+
+    pasta = tmp_path / "pdfs"
+    shutil.copytree(corpus, pasta)
+    pasta_saida = tmp_path / "saida"
+    duplicatas = extrair_imagens_de_pdfs(str(pasta), str(pasta_saida), dedup_conteudo=True)
+    dependentes = {
+        "_".join(ocorrencia.split("_")[:2]) + ".pdf"
+        for ocorrencia, mantida in duplicatas.items()
+        if mantida.startswith("bench_000_") and not ocorrencia.startswith("bench_000_")
+    }
+    assert dependentes, "o corpus deve ter repetições de imagens do bench_000 em outros PDFs"
+
+    (pasta / "bench_000.pdf").unlink()
+    processados = _contar_processados(monkeypatch)
+    duplicatas = extrair_imagens_de_pdfs(str(pasta), str(pasta_saida), dedup_conteudo=True)
+
+    assert "PDF removido da pasta: bench_000.pdf (imagens apagadas)" in capsys.readouterr().out
+    assert set(processados) == dependentes
+    arquivos, _ = _conteudo(pasta_saida)
+    assert not any(n.startswith("bench_000_") for n in arquivos)
+    assert not any(n.startswith("bench_000_") for par in duplicatas.items() for n in par)
+    extrair_imagens_de_pdfs(str(pasta), str(tmp_path / "referencia"), dedup_conteudo=True)
+    assert _conteudo(pasta_saida) == _conteudo(tmp_path / "referencia")
+
+
+def test_pdfs_com_o_mesmo_nome_base_nao_se_sobrescrevem(corpus, tmp_path, capsys):
+    import sqlite3
+
+    from catalog import CATALOG_NAME, ImageCatalog
+    from extractor import ExtractedImage
+
+    pasta = tmp_path / "pdfs"
+    pasta.mkdir()
+    (pasta / "a.pdf").write_bytes((corpus / "bench_000.pdf").read_bytes())
+    (pasta / "a.PDF").write_bytes((corpus / "bench_001.pdf").read_bytes())
+    pasta_saida = tmp_path / "saida"
+    extrair_imagens_de_pdfs(str(pasta), str(pasta_saida), catalogo=True)
+    assert "ERRO: a.pdf ignorado: as imagens teriam os mesmos nomes que as de a.PDF" in capsys.readouterr().out
+
+    # Já registrado, a.PDF continua sendo o mantido mesmo que outro conflito apareça
+    (pasta / "A.pdf").write_bytes((corpus / "bench_002.pdf").read_bytes())
+    extrair_imagens_de_pdfs(str(pasta), str(pasta_saida), catalogo=True)
+    saida = capsys.readouterr().out
+    assert "ERRO: A.pdf ignorado" in saida and "ERRO: a.pdf ignorado" in saida
+
+    referencia = tmp_path / "referencia"
+    (referencia / "pdfs").mkdir(parents=True)
+    (referencia / "pdfs" / "a.PDF").write_bytes((corpus / "bench_001.pdf").read_bytes())
+    extrair_imagens_de_pdfs(str(referencia / "pdfs"), str(referencia / "saida"))
+    assert _conteudo(pasta_saida) == _conteudo(referencia / "saida")
+
+    catalogo = ImageCatalog(str(pasta_saida / CATALOG_NAME))
+    try:
+        linhas = list(catalogo.query(include_duplicates=True))
+        assert linhas and {linha["pdf"] for linha in linhas} == {"a.PDF"}
+        # O catálogo também não deixa outro PDF tomar as linhas de a.PDF
+        colidente = ExtractedImage(linhas[0]["caminho"], 0, 0, 1, "png", b"", digest="0" * 64)
+        with pytest.raises(sqlite3.IntegrityError):
+            catalogo.record_pdf("a.pdf", "0" * 64, [(colidente, 1)])
+        assert not catalogo.has_pdf("a.pdf")
+        assert list(catalogo.query(include_duplicates=True)) == linhas
+    finally:
+        catalogo.close()
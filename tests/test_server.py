@@ -0,0 +1,149 @@
+import base64
+import http.client
+import io
+import json
+import shutil
+import threading
+import time
+import zipfile
+
+import pytest
+
+from cache import iter_images_cached
+from extractor import DUPLICATE
+from server import ServidorDeExtracao, _content_disposition, _nome_seguro, ler_opcoes
+
+
+@pytest.fixture
+def servidor(corpus, pdf_grande, tmp_path):
+    raiz = tmp_path / "raiz"
+    shutil.copytree(corpus, raiz)
+    shutil.copy(pdf_grande, raiz / "grande.pdf")
+    (tmp_path / "fora.pdf").write_bytes((corpus / "bench_000.pdf").read_bytes())
+    servidor = ServidorDeExtracao(("127.0.0.1", 0), raiz=str(raiz), max_jobs=1)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _conexao(servidor):
+    return http.client.HTTPConnection(*servidor.server_address, timeout=60)
+
+
+def _requisitar(servidor, metodo, caminho, corpo=None, cabecalhos=None):
+    conexao = _conexao(servidor)
+    conexao.request(metodo, caminho, body=corpo, headers=cabecalhos or {})
+    resposta = conexao.getresponse()
+    return resposta, resposta.read()
+
+
+def _esperadas(pdf):
+    """Imagens mantidas (nome -> bytes) e repetições de `pdf` com as opções padrão do servidor."""
+    imagens, duplicatas = {}, {}
+    for img in iter_images_cached(str(pdf), nome_base=pdf.stem, **ler_opcoes({})):
+        if img.method == DUPLICATE:
+            duplicatas[img.name] = img.duplicate_of
+        else:
+            imagens[img.name] = img.data
+    return imagens, duplicatas
+
+
+@pytest.mark.parametrize("nome, esperado", [
+    ("x\r\nSet-Cookie: pwn=1\r\ny.pdf", "xSet-Cookie: pwn=1y.pdf"),
+    ('a"b.pdf', "ab.pdf"),
+    ("../../etc/passwd", "passwd"),
+    ("c:\\pasta\\doc.pdf", "doc.pdf"),
+    ("\r\n", "documento.pdf"),
+])
+def test_nome_seguro(nome, esperado):
+    assert _nome_seguro(nome) == esperado
+
+
+def test_content_disposition_em_uma_linha_e_latin1():
+    cabecalho = _content_disposition("relatório €_imagens.zip")
+    assert "\r" not in cabecalho and "\n" not in cabecalho
+    cabecalho.encode("latin-1")
+    assert "filename*=UTF-8''relat%C3%B3rio%20%E2%82%AC_imagens.zip" in cabecalho
+
+
+def test_ndjson_traz_as_imagens_em_base64_e_as_metricas(servidor, corpus):
+    resposta, corpo = _requisitar(servidor, "GET", "/extrair?caminho=bench_000.pdf&resposta=ndjson")
+    assert resposta.status == 200
+    assert resposta.getheader("Transfer-Encoding") == "chunked"
+    linhas = [json.loads(linha) for linha in corpo.decode("utf-8").splitlines()]
+    assert linhas[-1]["tipo"] == "fim" and "contagens" in linhas[-1]["metricas"]
+    imagens = {r["nome"]: base64.b64decode(r["dados"]) for r in linhas if r["tipo"] == "imagem"}
+    duplicatas = {r["nome"]: r["duplicata_de"] for r in linhas if r["tipo"] == "duplicata"}
+    assert (imagens, duplicatas) == _esperadas(corpus / "bench_000.pdf")
+
+
+def test_zip_do_pdf_enviado_no_corpo(servidor, corpus):
+    dados = (corpus / "bench_001.pdf").read_bytes()
+    resposta, corpo = _requisitar(servidor, "POST", "/extrair?nome=relatorio.pdf", dados)
+    assert resposta.status == 200
+    assert 'filename="relatorio_imagens.zip"' in resposta.getheader("Content-Disposition")
+    imagens, duplicatas = _esperadas(corpus / "bench_001.pdf")
+
+    def renomear(nome):
+        return nome.replace("bench_001", "relatorio")
+
+    with zipfile.ZipFile(io.BytesIO(corpo)) as zf:
+        assert zf.testzip() is None
+        conteudo = {nome: zf.read(nome) for nome in zf.namelist()}
+    if duplicatas:
+        assert json.loads(conteudo.pop("duplicatas.json")) == {
+            renomear(o): renomear(m) for o, m in duplicatas.items()
+        }
+    assert conteudo == {renomear(nome): img for nome, img in imagens.items()}
+
+
+@pytest.mark.parametrize("caminho", ["../fora.pdf", "/etc/passwd", "sub/../../fora.pdf"])
+def test_caminho_fora_da_raiz_e_recusado(servidor, caminho):
+    resposta, corpo = _requisitar(servidor, "GET", f"/extrair?caminho={caminho}")
+    assert resposta.status == 403
+    assert json.loads(corpo) == {"erro": "caminho fora da pasta raiz do servidor"}
+
+
+def test_limite_de_extracoes_responde_503_com_retry_after(servidor):
+    ocupada = _conexao(servidor)
+    ocupada.request("GET", "/extrair?caminho=grande.pdf&resposta=ndjson")
+    # A extração começou: a única vaga fica ocupada enquanto a resposta não é lida
+    assert ocupada.getresponse().status == 200
+
+    resposta, corpo = _requisitar(servidor, "GET", "/extrair?caminho=bench_000.pdf")
+    assert resposta.status == 503
+    assert resposta.getheader("Retry-After") == "5"
+    assert "limite de 1" in json.loads(corpo)["erro"]
+    _, saude = _requisitar(servidor, "GET", "/saude")
+    assert json.loads(saude) == {"em_andamento": 1, "limite": 1}
+
+    # O cliente desistiu: a extração é interrompida e a vaga, liberada
+    ocupada.close()
+    fim = time.monotonic() + 30
+    while json.loads(_requisitar(servidor, "GET", "/saude")[1])["em_andamento"]:
+        assert time.monotonic() < fim, "a extração abandonada não foi encerrada"
+        time.sleep(0.05)
+    resposta, _ = _requisitar(servidor, "GET", "/extrair?caminho=bench_000.pdf")
+    assert resposta.status == 200
+
+
+def test_corpo_acima_do_limite_responde_413(servidor, corpus):
+    dados = (corpus / "bench_000.pdf").read_bytes()
+    servidor.max_bytes = len(dados) - 1
+    resposta, corpo = _requisitar(servidor, "POST", "/extrair", dados)
+    assert resposta.status == 413
+    assert "limite" in json.loads(corpo)["erro"]
+
+    # Com "Expect: 100-continue", a recusa vem antes do envio do corpo
+    conexao = _conexao(servidor)
+    conexao.putrequest("POST", "/extrair")
+    conexao.putheader("Content-Length", str(len(dados)))
+    conexao.putheader("Expect", "100-continue")
+    conexao.endheaders()
+    assert conexao.getresponse().status == 413
+
+    servidor.max_bytes = len(dados)
+    resposta, _ = _requisitar(servidor, "POST", "/extrair", dados)
+    assert resposta.status == 200
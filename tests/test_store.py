@@ -0,0 +1,59 @@
+import gc
+import os
+import time
+
+import pytest
+
+from store import SESSION_PREFIX, ImageStore, StoreFullError, sweep_stale_sessions
+
+
+def test_limite_de_bytes_recusa_a_gravacao_e_mantem_o_estado(tmp_path):
+    store = ImageStore(str(tmp_path), max_bytes=100)
+    try:
+        store.put("a.pdf:1", b"x" * 60)
+        with pytest.raises(StoreFullError):
+            store.put("a.pdf:2", b"y" * 41)
+        assert "a.pdf:2" not in store and store.used_bytes == 60
+        assert len(os.listdir(store.directory)) == 1
+        # Substituir uma chave só conta a diferença
+        store.put("a.pdf:1", b"z" * 100)
+        assert store.get("a.pdf:1") == b"z" * 100 and store.used_bytes == 100
+        store.discard_prefix("a.pdf:")
+        assert len(store) == 0 and store.used_bytes == 0
+        assert os.listdir(store.directory) == []
+    finally:
+        store.close()
+
+
+def test_close_apaga_a_pasta_e_recusa_novas_gravacoes(tmp_path):
+    store = ImageStore(str(tmp_path))
+    store.put("a.pdf:1", b"x")
+    store.close()
+    assert not os.path.exists(store.directory)
+    with pytest.raises(ValueError):
+        store.put("a.pdf:2", b"y")
+
+
+def test_pasta_e_apagada_quando_o_armazenamento_deixa_de_ser_usado(tmp_path):
+    store = ImageStore(str(tmp_path))
+    store.put("a.pdf:1", b"x")
+    pasta = store.directory
+    del store
+    gc.collect()
+    assert not os.path.exists(pasta)
+
+
+def test_varredura_apaga_so_sessoes_abandonadas(tmp_path):
+    antiga = tmp_path / f"{SESSION_PREFIX}antiga"
+    recente = tmp_path / f"{SESSION_PREFIX}recente"
+    outra = tmp_path / "outra_pasta"
+    for pasta in (antiga, recente, outra):
+        pasta.mkdir()
+        (pasta / "00000001.img").write_bytes(b"x")
+    velho = time.time() - 3600
+    os.utime(antiga, (velho, velho))
+    os.utime(outra, (velho, velho))
+
+    assert sweep_stale_sessions(str(tmp_path), max_age=60) == 1
+    assert sorted(os.listdir(tmp_path)) == ["outra_pasta", f"{SESSION_PREFIX}recente"]
+    assert sweep_stale_sessions(str(tmp_path / "inexistente"), max_age=60) == 0